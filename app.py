@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file, abort
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 import os
 import sys
@@ -8,15 +8,13 @@ from services.auth import carregar_usuarios, salvar_usuario, autenticar
 from components.dashboard import get_dashboard_data
 from components.segmentacao import get_segmentacao_data
 from components.metas_funil import get_metas_funil_data
-from components.churn import get_churn_data
+from components.churn import get_churn_data, get_churn_data_streaming, caminho_pontuado
 from components.valuation_web import get_valuation_data
 from components.tamsamsom_web import get_tamsamsom_data
-
-app = Flask(__name__)
-app.secret_key = 'your_secret_key_here'  # Change to a secure key
+from core.aquecimento import aquecer, relatorio_aquecimento
+from services.churn_model import registro_modelos
 
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 
 class User(UserMixin):
@@ -30,12 +28,10 @@ def load_user(user_id):
         return User(user_id)
     return None
 
-@app.route('/')
 @login_required
 def index():
     return redirect(url_for('dashboard'))
 
-@app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         usuario = request.form['usuario']
@@ -48,13 +44,11 @@ def login():
         flash('Usuário ou senha inválidos.')
     return render_template('login.html')
 
-@app.route('/logout')
 @login_required
 def logout():
     logout_user()
     return redirect(url_for('login'))
 
-@app.route('/dashboard', methods=['GET', 'POST'])
 @login_required
 def dashboard():
     data = None
@@ -66,7 +60,6 @@ def dashboard():
             data = {'error': 'Nenhum arquivo enviado. Por favor, envie um arquivo Excel (.xlsx).'}
     return render_template('dashboard.html', data=data, user=current_user.id)
 
-@app.route('/segmentacao', methods=['GET', 'POST'])
 @login_required
 def segmentacao():
     data = None
@@ -96,7 +89,6 @@ def segmentacao():
             data = {'error': 'Nenhum arquivo enviado. Por favor, envie um arquivo Excel (.xlsx).'}
     return render_template('segmentacao.html', data=data, user=current_user.id)
 
-@app.route('/metas_funil', methods=['GET', 'POST'])
 @login_required
 def metas_funil():
     data = None
@@ -125,19 +117,27 @@ def metas_funil():
         data = get_metas_funil_data(segmento, tipo_obj, val_obj, ticket_medio, n_vend)
     return render_template('metas_funil.html', data=data, user=current_user.id)
 
-@app.route('/churn', methods=['GET', 'POST'])
 @login_required
 def churn():
     data = None
     if request.method == 'POST':
         arquivo = request.files.get('file')
         if arquivo and arquivo.filename:
-            data = get_churn_data(arquivo)
+            if request.form.get('modo') == 'lotes':
+                data = get_churn_data_streaming(arquivo)
+            else:
+                data = get_churn_data(arquivo)
         else:
             data = {'error': 'Nenhum arquivo enviado. Por favor, envie um arquivo CSV.'}
     return render_template('churn.html', data=data, user=current_user.id)
 
-@app.route('/valuation', methods=['GET', 'POST'])
+@login_required
+def churn_download(token):
+    caminho = caminho_pontuado(token)
+    if caminho is None:
+        abort(404)
+    return send_file(caminho, mimetype='text/csv', as_attachment=True, download_name='churn_pontuado.csv')
+
 @login_required
 def valuation():
     data = None
@@ -145,13 +145,11 @@ def valuation():
         data = get_valuation_data(request.form)
     return render_template('valuation.html', data=data, user=current_user.id)
 
-@app.route('/tamsamsom')
 @login_required
 def tamsamsom():
     data = get_tamsamsom_data()
     return render_template('tamsamsom.html', data=data, user=current_user.id)
 
-@app.route('/admin', methods=['GET', 'POST'])
 @login_required
 def admin():
     if current_user.id != 'admin':
@@ -167,6 +165,45 @@ def admin():
         flash('Preencha todos os campos.')
     return render_template('admin.html', usuarios=usuarios, user=current_user.id)
 
+def pronto():
+    """Readiness: o que foi pré-carregado, quanto tempo levou e em qual processo."""
+    relatorio = relatorio_aquecimento()
+    relatorio['modelos'] = registro_modelos.metricas()
+    return jsonify(relatorio), (200 if relatorio['pronto'] else 503)
+
+ROTAS = [
+    ('/', index, ['GET']),
+    ('/login', login, ['GET', 'POST']),
+    ('/logout', logout, ['GET']),
+    ('/dashboard', dashboard, ['GET', 'POST']),
+    ('/segmentacao', segmentacao, ['GET', 'POST']),
+    ('/metas_funil', metas_funil, ['GET', 'POST']),
+    ('/churn', churn, ['GET', 'POST']),
+    ('/churn/download/<token>', churn_download, ['GET']),
+    ('/valuation', valuation, ['GET', 'POST']),
+    ('/tamsamsom', tamsamsom, ['GET']),
+    ('/admin', admin, ['GET', 'POST']),
+    ('/pronto', pronto, ['GET']),
+]
+
+def criar_app(pre_carregar: bool = True) -> Flask:
+    """
+    Cria a aplicação Flask.
+
+    Com pre_carregar, modelos de churn, tabelas, índices de mercado e usuários são
+    carregados antes de retornar (ver core/aquecimento.py). Com o preload_app do
+    gunicorn (gunicorn.conf.py) isso acontece uma vez no processo mestre e os
+    workers herdam tudo pelo fork.
+    """
+    app = Flask(__name__)
+    app.secret_key = 'your_secret_key_here'  # Change to a secure key
+    login_manager.init_app(app)
+    for regra, view, metodos in ROTAS:
+        app.add_url_rule(regra, view_func=view, methods=metodos)
+    if pre_carregar:
+        aquecer()
+    return app
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    criar_app().run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,15 @@
+"""
+Configuração do gunicorn (ver Procfile).
+
+Com preload_app a aplicação é criada uma vez no processo mestre, que faz o
+pré-carregamento (core/aquecimento.py) antes do fork; os workers herdam modelo,
+tabelas e bases mapeadas sem recarregar nada. O estado pode ser consultado em /pronto.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+wsgi_app = "app:criar_app()"
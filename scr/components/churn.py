@@ -2,76 +2,151 @@
 
 Loads a pre-trained Weibull AFT model (lifelines) and predicts time-to-churn
 based on input data.
+
+Large uploads can be scored in streaming mode (get_churn_data_streaming): the
+CSV is read in chunks, each chunk is scored and appended to a downloadable
+file, and the summary statistics are accumulated in constant memory.
+
+Survival curves (curvas_sobrevivencia) give, for every customer, the
+probability of still being a customer at a grid of horizons (30/90/180/365
+days), computed as one customers x horizons float32 matrix in chunks, plus the
+average curve of each cohort (perfil, canal_aquisicao, regiao). Both the
+in-memory and the streaming paths return the cohort curves.
 """
 
 import pandas as pd
 import numpy as np
-import pickle
 import os
+import re
+import time
+import uuid
+import tempfile
+from typing import Optional
+
+from services.churn_model import CAMINHO_FEATURES, CAMINHO_MODELO, MODELO_PADRAO, registro_modelos
+from services.pontuacao_churn import EsbocoQuantis
+
+# Arquivos pontuados disponíveis para download (compartilhado entre workers)
+DIRETORIO_PONTUADOS = os.path.join(tempfile.gettempdir(), 'salesniper_churn')
+HORAS_RETENCAO_PONTUADOS = 24
+LINHAS_POR_LOTE = 100000
+LINHAS_PREVIEW = 20
+
+# Horizontes (dias) das curvas de sobrevivência e colunas que definem as coortes
+HORIZONTES_SOBREVIVENCIA = (30, 90, 180, 365)
+COLUNAS_COORTE = ('perfil', 'canal_aquisicao', 'regiao')
 
 # Base features expected by the model (saved naively no guarantee order)
-FEATURE_COLUMNS_PATH = os.path.join(os.path.dirname(__file__), '../data/features_weibull.pkl')
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '../data/modelo_final.pkl')
+FEATURE_COLUMNS_PATH = CAMINHO_FEATURES
+MODEL_PATH = CAMINHO_MODELO
+
+
+def _load_model(nome: str = MODELO_PADRAO):
+    return registro_modelos.obter(nome).modelo
+
+
+def _load_feature_cols(nome: str = MODELO_PADRAO):
+    return registro_modelos.obter(nome).features
+
 
+def _coluna_sobrevivencia(horizonte) -> str:
+    return f'sobrevivencia_{horizonte:g}d'
 
-def _load_model():
-    with open(MODEL_PATH, 'rb') as f:
-        return pickle.load(f)
 
+def matriz_sobrevivencia(df: pd.DataFrame, modelo: str = MODELO_PADRAO,
+                         horizontes=HORIZONTES_SOBREVIVENCIA,
+                         tamanho_lote: int = LINHAS_POR_LOTE) -> np.ndarray:
+    """
+    Probabilidade de cada cliente continuar ativo em cada horizonte.
 
-def _load_feature_cols():
-    with open(FEATURE_COLUMNS_PATH, 'rb') as f:
-        return pickle.load(f)
+    Modelos com motor vetorizado calculam a matriz inteira de uma vez, em lotes
+    e em float32; os demais fazem uma única chamada de predict_survival_function
+    com todos os horizontes.
 
+    Args:
+        df: Clientes (colunas brutas)
+        modelo: Nome do modelo registrado
+        horizontes: Horizontes em dias
+        tamanho_lote: Linhas por lote
 
-def _prepare_features(df: pd.DataFrame, feature_cols: list) -> pd.DataFrame:
-    """Cria um DataFrame com as colunas exatas que o modelo espera."""
-    df_proc = df.copy()
+    Returns:
+        Matriz float32 (clientes, horizontes)
+    """
+    if registro_modelos.obter(modelo).motor is not None:
+        return registro_modelos.prever(df, 'sobrevivencia', modelo, tempos=list(horizontes),
+                                       tamanho_lote=tamanho_lote, dtype=np.float32)
+    curvas = registro_modelos.prever(df, 'predict_survival_function', modelo, times=list(horizontes))
+    return np.asarray(curvas, dtype=np.float32).T
 
-    # Garantir colunas numéricas
-    for col in ['idade', 'tempo_casa', 'score_engajamento']:
-        if col not in df_proc.columns:
-            df_proc[col] = 0
-        df_proc[col] = pd.to_numeric(df_proc[col], errors='coerce').fillna(0)
 
-    # One-hot para categorias usadas no modelo
-    # As colunas já vêm no formato 'perfil_X', 'canal_aquisicao_Y', 'regiao_Z'
-    for cat in ['perfil', 'canal_aquisicao', 'regiao']:
-        if cat in df_proc.columns:
-            dummies = pd.get_dummies(df_proc[cat], prefix=cat)
-            df_proc = pd.concat([df_proc, dummies], axis=1)
+def _somar_coortes(df: pd.DataFrame, matriz: np.ndarray, horizontes,
+                   colunas=COLUNAS_COORTE) -> dict:
+    """Soma das probabilidades e quantidade de clientes por valor de cada coluna de coorte."""
+    nomes = [_coluna_sobrevivencia(h) for h in horizontes]
+    # Soma em float64 para não perder precisão ao acumular muitos lotes
+    probabilidades = pd.DataFrame(matriz, columns=nomes, index=df.index, dtype=np.float64)
+    probabilidades['clientes'] = 1
+    somas = {'geral': probabilidades.sum().to_frame('todos').T}
+    for coluna in colunas:
+        if coluna in df.columns:
+            somas[coluna] = probabilidades.groupby(df[coluna].fillna('(vazio)'), sort=True).sum()
+    return somas
 
-    # Garantir todas as colunas necessárias
-    for col in feature_cols:
-        if col not in df_proc.columns:
-            df_proc[col] = 0
 
-    # Somente retorna as colunas na ordem esperada
-    return df_proc[feature_cols]
+def _acumular_coortes(total: Optional[dict], somas: dict) -> dict:
+    if total is None:
+        return somas
+    return {chave: total[chave].add(somas[chave], fill_value=0) if chave in total else somas[chave]
+            for chave in list(total) + [c for c in somas if c not in total]}
 
 
-def get_churn_data(arquivo) -> dict:
-    """Processa arquivo CSV e retorna predições de churn."""
+def _medias_coortes(somas: dict) -> dict:
+    """Curva média de cada coorte: {coluna: [{valor, clientes, sobrevivencia_30d, ...}]}."""
+    coortes = {}
+    for chave, tabela in somas.items():
+        medias = tabela.drop(columns='clientes').div(tabela['clientes'], axis=0)
+        medias.insert(0, 'clientes', tabela['clientes'].astype(int))
+        coortes[chave] = medias.rename_axis('valor').reset_index().to_dict(orient='records')
+    return coortes
+
+
+def curvas_sobrevivencia(df: pd.DataFrame, modelo: str = MODELO_PADRAO,
+                         horizontes=HORIZONTES_SOBREVIVENCIA,
+                         colunas_coorte=COLUNAS_COORTE,
+                         tamanho_lote: int = LINHAS_POR_LOTE) -> dict:
+    """
+    Curvas de sobrevivência por cliente e médias por coorte.
+
+    Returns:
+        {'horizontes': [...], 'matriz': float32 (clientes, horizontes),
+         'coortes': {'geral': [...], 'perfil': [...], 'canal_aquisicao': [...], 'regiao': [...]}}
+    """
+    matriz = matriz_sobrevivencia(df, modelo, horizontes, tamanho_lote)
+    return {
+        'horizontes': list(horizontes),
+        'matriz': matriz,
+        'coortes': _medias_coortes(_somar_coortes(df, matriz, horizontes, colunas_coorte)),
+    }
+
+
+def get_churn_data(arquivo, modelo: str = MODELO_PADRAO) -> dict:
+    """Processa arquivo CSV e retorna predições de churn do modelo registrado com esse nome."""
     try:
         df = pd.read_csv(arquivo)
     except Exception as e:
         return {'error': f'Erro ao ler CSV: {e}'}
 
     try:
-        feature_cols = _load_feature_cols()
-        model = _load_model()
+        registro_modelos.obter(modelo)
     except Exception as e:
         return {'error': f'Erro ao carregar modelo: {e}'}
 
     try:
-        df_features = _prepare_features(df, feature_cols)
-    except Exception as e:
-        return {'error': f'Erro ao preparar features: {e}'}
-
-    try:
-        # Previsão do tempo até churn (mediana)
-        pred = model.predict_median(df_features)
+        # Previsão do tempo até churn (mediana); o codificador do modelo monta as
+        # features (one-hot + padronização do treino) a partir das colunas brutas
+        pred = registro_modelos.prever(df, 'predict_median', modelo)
         df['tempo_ate_churn'] = pred
+        curvas = curvas_sobrevivencia(df, modelo)
 
         # Ajustes: se quiser interpretar como meses ou dias, depende do modelo (normalmente em dias)
         # Aqui assumimos em dias (padrão lifelines usa mesma unidade do tempo usado no treino)
@@ -85,18 +160,102 @@ def get_churn_data(arquivo) -> dict:
             'count': int(len(pred))
         }
 
-        # Mostrar apenas primeiras linhas com a predição
-        preview = df.copy()
-        if 'nome' in preview.columns:
-            preview = preview[['nome', 'tempo_ate_churn']]
-        else:
-            preview = preview[['tempo_ate_churn']]
-        preview = preview.head(20).to_dict(orient='records')
-
         return {
             'stats': medias,
-            'preview': preview
+            'preview': _preview(df, LINHAS_PREVIEW),
+            'horizontes': curvas['horizontes'],
+            'coortes': curvas['coortes']
         }
 
     except Exception as e:
         return {'error': f'Erro ao gerar predições: {e}'}
+
+
+def _preview(df: pd.DataFrame, linhas: int) -> list:
+    """Primeiras linhas com a predição (e o nome do cliente, se houver)."""
+    colunas = ['nome', 'tempo_ate_churn'] if 'nome' in df.columns else ['tempo_ate_churn']
+    return df[colunas].head(linhas).to_dict(orient='records')
+
+
+def _limpar_pontuados():
+    """Remove arquivos pontuados mais antigos que o período de retenção."""
+    limite = time.time() - HORAS_RETENCAO_PONTUADOS * 3600
+    for nome in os.listdir(DIRETORIO_PONTUADOS):
+        caminho = os.path.join(DIRETORIO_PONTUADOS, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+
+def caminho_pontuado(token: str) -> Optional[str]:
+    """Arquivo pontuado de um token de download (None se inválido ou expirado)."""
+    if not re.fullmatch(r'[0-9a-f]{32}', token or ''):
+        return None
+    caminho = os.path.join(DIRETORIO_PONTUADOS, f'churn_{token}.csv')
+    return caminho if os.path.exists(caminho) else None
+
+
+def get_churn_data_streaming(arquivo, modelo: str = MODELO_PADRAO,
+                             linhas_por_lote: int = LINHAS_POR_LOTE) -> dict:
+    """
+    Pontua o CSV em lotes, com memória constante independente do tamanho do arquivo.
+
+    Cada lote é codificado com o vocabulário fixo do modelo, pontuado e
+    anexado a um CSV de saída (colunas originais + tempo_ate_churn + sobrevivência
+    em cada horizonte). Média, mínimo e máximo são exatos; a mediana vem de um
+    esboço de quantis (erro < 1%). As curvas por coorte são acumuladas lote a lote.
+
+    Returns:
+        Mesmo formato de get_churn_data, mais 'download' (token do arquivo
+        pontuado, ver caminho_pontuado) e 'lotes'
+    """
+    try:
+        registro_modelos.obter(modelo)
+    except Exception as e:
+        return {'error': f'Erro ao carregar modelo: {e}'}
+
+    os.makedirs(DIRETORIO_PONTUADOS, exist_ok=True)
+    _limpar_pontuados()
+    token = uuid.uuid4().hex
+    destino = os.path.join(DIRETORIO_PONTUADOS, f'churn_{token}.csv')
+    esboco = EsbocoQuantis()
+    linhas, lotes, preview, somas = 0, 0, [], None
+
+    try:
+        for lote in pd.read_csv(arquivo, chunksize=linhas_por_lote):
+            pred = registro_modelos.prever(lote, 'predict_median', modelo)
+            lote['tempo_ate_churn'] = pred
+            matriz = matriz_sobrevivencia(lote, modelo, HORIZONTES_SOBREVIVENCIA, linhas_por_lote)
+            somas = _acumular_coortes(somas, _somar_coortes(lote, matriz, HORIZONTES_SOBREVIVENCIA))
+            for j, horizonte in enumerate(HORIZONTES_SOBREVIVENCIA):
+                lote[_coluna_sobrevivencia(horizonte)] = matriz[:, j]
+            lote.to_csv(destino, mode='a' if lotes else 'w', header=not lotes, index=False)
+            esboco.adicionar(pred)
+            if len(preview) < LINHAS_PREVIEW:
+                preview += _preview(lote, LINHAS_PREVIEW - len(preview))
+            linhas += len(lote)
+            lotes += 1
+    except Exception as e:
+        if os.path.exists(destino):
+            os.remove(destino)
+        return {'error': f'Erro ao pontuar CSV em lotes: {e}'}
+
+    if linhas == 0:
+        return {'error': 'CSV sem linhas para pontuar.'}
+
+    return {
+        'stats': {
+            'media_dias': esboco.media(),
+            'mediana_dias': esboco.quantil(0.5),
+            'min_dias': esboco.minimo,
+            'max_dias': esboco.maximo,
+            'count': linhas
+        },
+        'preview': preview,
+        'horizontes': list(HORIZONTES_SOBREVIVENCIA),
+        'coortes': _medias_coortes(somas),
+        'download': token,
+        'lotes': lotes
+    }
@@ -40,15 +40,17 @@ def get_tamsamsom_data():
     
     with st.spinner("🔄 Carregando dados da Receita Federal..."):
         # Carregar dados reais da Receita Federal
-        from domain.servicos.dados_mercado import DadosMercado
+        from domain.servicos.dados_mercado import DadosMercado, COLUNAS_TAM_SAM_SOM
         dados_mercado = DadosMercado()
+        usando_exemplo = False
         
         try:
-            df_mercado = dados_mercado.carregar_dados_receita_federal()
+            df_mercado = dados_mercado.carregar_dados_receita_federal(colunas=COLUNAS_TAM_SAM_SOM)
         except Exception as e:
             st.error(f"❌ Erro ao carregar dados da Receita Federal: {str(e)}")
             st.info("📊 Usando dados de exemplo para demonstração...")
             df_mercado = dados_mercado._gerar_dados_exemplo()
+            usando_exemplo = True
     
     # Calcular TAM/SAM/SOM
     with st.spinner("🔄 Calculando TAM/SAM/SOM..."):
@@ -62,17 +64,25 @@ def get_tamsamsom_data():
     st.sidebar.markdown("### 🔍 Debug - Por que SOM é 0?")
     if st.sidebar.button("🔍 Verificar Cruzamento de CNPJs"):
         # Verificar CNPJs dos clientes
+        from domain.servicos.indice_cnpj import IndiceCNPJ, obter_indice_mercado
+        from domain.servicos.esquema_mercado import digitos_cnpj
         cnpjs_clientes = df_clientes['cnpj'].astype(str).unique()
-        cnpjs_mercado = df_mercado['cnpj'].astype(str).unique()
+        # Índice persistido (aberto uma vez por processo); os dados de exemplo não estão nele
+        indice_mercado = None if usando_exemplo else obter_indice_mercado(
+            dados_mercado.caminho_indice_cnpj, dados_mercado.caminho_receita, dados_mercado.caminho_base_colunar
+        )
+        if indice_mercado is None:
+            # Sem índice para a versão atual da base: monta a partir do mercado carregado
+            indice_mercado = IndiceCNPJ.construir(df_mercado['cnpj'], digitos_cnpj(df_mercado))
         
-        # Verificar quantos CNPJs dos clientes estão no mercado
-        cnpjs_encontrados = set(cnpjs_clientes) & set(cnpjs_mercado)
+        # Verificar quantos CNPJs dos clientes estão no mercado (busca binária no índice)
+        cnpjs_encontrados = int(indice_mercado.contem(pd.Series(cnpjs_clientes)).sum())
         
         st.sidebar.write(f"📊 CNPJs dos clientes: {len(cnpjs_clientes)}")
-        st.sidebar.write(f"📊 CNPJs no mercado: {len(cnpjs_mercado)}")
-        st.sidebar.write(f"✅ CNPJs encontrados: {len(cnpjs_encontrados)}")
+        st.sidebar.write(f"📊 CNPJs no mercado: {len(indice_mercado)}")
+        st.sidebar.write(f"✅ CNPJs encontrados: {cnpjs_encontrados}")
         
-        if len(cnpjs_encontrados) == 0:
+        if cnpjs_encontrados == 0:
             st.sidebar.error("❌ Nenhum CNPJ dos clientes foi encontrado na base da Receita Federal!")
             st.sidebar.write("**Possíveis causas:**")
             st.sidebar.write("- Formato diferente dos CNPJs")
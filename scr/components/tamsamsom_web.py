@@ -1,30 +1,58 @@
+from typing import Optional
+
 import pandas as pd
 
 from domain.servicos.dados_mercado import DadosMercado
+from domain.servicos.cubo_mercado import obter_cubo
+
+# Demonstração com dados de exemplo (sem cubo nem clientes), calculada uma vez por processo
+_demonstracao: Optional[dict] = None
+
+
+def _resposta(matriz: pd.DataFrame, fonte: str) -> dict:
+    # Organizar para exibição (limitado aos primeiros 100 registros)
+    matriz_display = matriz.copy().head(100)
+    return {
+        "fonte": fonte,
+        "summary": {f"total_{coluna}": int(matriz[coluna].sum())
+                    for coluna in ("TAM", "SAM", "SOM") if coluna in matriz.columns},
+        "table_columns": list(matriz_display.columns),
+        "table_rows": matriz_display.to_dict(orient="records"),
+    }
+
 
+def get_tamsamsom_data(df_clientes: Optional[pd.DataFrame] = None) -> dict:
+    """
+    Gera uma tabela de TAM/SAM/SOM usando o cubo de mercado ou dados de exemplo.
 
-def get_tamsamsom_data() -> dict:
-    """Gera uma tabela de TAM/SAM/SOM usando dados de exemplo ou da Receita Federal."""
+    Com o cubo pré-agregado (carregado uma vez por processo), o TAM vem dele e
+    SAM/SOM só aparecem quando há base de clientes. Sem cubo, mostra a
+    demonstração com dados de exemplo, calculada uma única vez por processo.
+
+    Args:
+        df_clientes: Base de clientes (coluna 'cnpj'), se houver
+    """
+    global _demonstracao
     try:
         dados_mercado = DadosMercado()
-        # Carrega dados de exemplo (perfeito para demonstração sem grandes arquivos)
-        df_mercado = dados_mercado._gerar_dados_exemplo()
-
-        # Para fins de demonstração, consideramos os primeiros clientes como nossa base de clientes
-        df_clientes = df_mercado.head(50).copy()
-
-        matriz = dados_mercado.calcular_tam_sam_som_por_cnae(df_clientes, df_mercado)
-
-        # Organizar para exibição (limitado aos primeiros 100 registros)
-        matriz_display = matriz.copy().head(100)
-        return {
-            "summary": {
-                "total_TAM": int(matriz['TAM'].sum()),
-                "total_SAM": int(matriz['SAM'].sum()),
-                "total_SOM": int(matriz['SOM'].sum()),
-            },
-            "table_columns": list(matriz_display.columns),
-            "table_rows": matriz_display.to_dict(orient="records"),
-        }
+        if obter_cubo() is not None:
+            if df_clientes is None:
+                matriz = dados_mercado.calcular_tam_sam_som_por_cubo(pd.DataFrame(columns=['cnpj']))
+                return _resposta(matriz.drop(columns=['SAM', 'SOM']), "cubo")
+            return _resposta(dados_mercado.calcular_tam_sam_som_por_cubo(df_clientes), "cubo")
+
+        if df_clientes is not None:
+            # Sem cubo: calcula sobre a base completa
+            return _resposta(dados_mercado.calcular_tam_sam_som_por_cubo(df_clientes), "base")
+
+        if _demonstracao is None:
+            # Carrega dados de exemplo (perfeito para demonstração sem grandes arquivos)
+            df_mercado = dados_mercado._gerar_dados_exemplo()
+
+            # Para fins de demonstração, consideramos os primeiros clientes como nossa base de clientes
+            df_clientes = df_mercado.head(50).copy()
+
+            _demonstracao = _resposta(dados_mercado.calcular_tam_sam_som_por_cnae(df_clientes, df_mercado), "exemplo")
+        return _demonstracao
     except Exception as e:
         return {"error": f"Erro ao calcular TAM/SAM/SOM: {e}"}
@@ -3,6 +3,7 @@ from typing import Tuple, Dict, Any, List
 import numpy as np
 import locale
 from core.sistema import Sistema
+from domain.servicos.matriz_produtos import ATRIBUTO_MATRIZ_PRODUTOS, MatrizProdutos
 
 # Configurar locale para português do Brasil
 try:
@@ -64,18 +65,13 @@ def carregar_e_preprocessar_dados(df: pd.DataFrame) -> pd.DataFrame:
     
     # Tratar coluna de produtos
     if 'produtos' in df.columns:
-        # Garantir que produtos seja string e tratar nulos
-        df['produtos'] = df['produtos'].fillna('')
-        # Normalizar separadores e limpar espaços
-        df['produtos'] = (df['produtos']
-                         .str.replace(',', ';')
-                         .str.replace(';;', ';')
-                         .str.strip()
-                         .str.strip(';'))
-        # Remover produtos vazios e duplicados
-        df['produtos'] = df['produtos'].apply(
-            lambda x: ';'.join(sorted(set(filter(None, map(str.strip, x.split(';'))))))
+        # Separar os produtos uma única vez em uma matriz esparsa clientes x produtos
+        # (vírgula também separa; vazios e duplicados são descartados)
+        matriz_produtos = MatrizProdutos.de_serie(
+            df['produtos'].fillna('').astype(str).str.replace(',', ';'), binaria=True
         )
+        # Texto normalizado (produtos únicos em ordem alfabética) para exibição
+        df['produtos'] = matriz_produtos.como_texto()
     
     # Adicionar CNPJ se não existir
     if "cnpj" not in df.columns:
@@ -106,6 +102,10 @@ def carregar_e_preprocessar_dados(df: pd.DataFrame) -> pd.DataFrame:
     
     # Otimizar memória
     df = df.copy()  # Forçar realocação de memória otimizada
+
+    # Matriz de produtos anexada ao dataset (ver obter_matriz_produtos)
+    if 'produtos' in df.columns:
+        df.attrs[ATRIBUTO_MATRIZ_PRODUTOS] = matriz_produtos
     
     return df
 
@@ -0,0 +1,143 @@
+"""
+Pré-carregamento (warm-up) da aplicação web.
+
+Bibliotecas pesadas, os modelos de churn (ver services/churn_model.py), as
+tabelas de CNAE, os artefatos de mercado (cubo, índice de CNPJs, base mapeada)
+e os usuários são carregados uma vez antes de atender requisições. Com o preload_app do gunicorn isso roda no
+processo mestre e os workers herdam os objetos pelo fork (copy-on-write), então
+nenhum worker paga o custo na primeira requisição.
+
+Cada etapa é cronometrada; o resultado fica em relatorio_aquecimento(), exposto
+pelo endpoint /pronto. Etapas opcionais cujo artefato não existe (ex: cubo ainda não
+gerado) ficam como 'indisponivel' e não impedem a aplicação de ficar pronta.
+Etapas obrigatórias (ETAPAS_OBRIGATORIAS: modelos de churn e usuários) com
+erro ou sem artefato (ex: modelo_final.pkl ausente em um deploy novo) deixam a
+aplicação como não pronta (/pronto responde 503).
+"""
+
+import os
+import time
+import importlib
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Bibliotecas importadas sob demanda pelos fluxos de churn, mercado e insights.
+# lifelines fica de fora: com o artefato leve do churn ela não é usada para
+# servir, e um modelo em pickle a importa ao ser carregado.
+BIBLIOTECAS = ["numpy", "pandas", "pyarrow", "huggingface_hub"]
+
+_estado: Dict = {"pronto": False, "etapas": {}}
+
+
+def _importar_bibliotecas() -> str:
+    ausentes = []
+    for nome in BIBLIOTECAS:
+        try:
+            importlib.import_module(nome)
+        except ImportError:
+            ausentes.append(nome)
+    carregadas = len(BIBLIOTECAS) - len(ausentes)
+    return f"{carregadas} importadas" + (f", ausentes: {', '.join(ausentes)}" if ausentes else "")
+
+
+def _modelos_churn() -> Optional[str]:
+    from services.churn_model import registro_modelos
+    carregados = []
+    for nome in registro_modelos.nomes():
+        try:
+            registrado = registro_modelos.obter(nome)
+        except FileNotFoundError:
+            continue
+        features = f", {len(registrado.features)} features" if registrado.features is not None else ""
+        carregados.append(f"{nome} ({type(registrado.modelo).__name__}{features})")
+    return ", ".join(carregados) or None
+
+
+def _tabelas_cnae() -> str:
+    from domain.servicos.tabelas_mercado import DESCRICAO_POR_DIVISAO_CNAE, REGIAO_POR_UF
+    return f"{len(DESCRICAO_POR_DIVISAO_CNAE)} divisões CNAE, {len(REGIAO_POR_UF)} UFs"
+
+
+def _cubo_mercado() -> Optional[str]:
+    from domain.servicos.cubo_mercado import obter_cubo
+    cubo = obter_cubo()
+    return None if cubo is None else f"{len(cubo.cubo):,} células"
+
+
+def _indice_cnpj() -> Optional[str]:
+    from domain.servicos.indice_cnpj import obter_indice_mercado
+    indice = obter_indice_mercado()
+    return None if indice is None else f"{len(indice):,} CNPJs"
+
+
+def _base_mapeada() -> Optional[str]:
+    from domain.servicos.base_mapeada import obter_base_mapeada
+    base = obter_base_mapeada()
+    return None if base is None else f"{len(base):,} estabelecimentos"
+
+
+def _usuarios() -> str:
+    from services.auth import carregar_usuarios
+    return f"{len(carregar_usuarios())} usuários"
+
+
+# Ordem de execução: (nome, função). A função retorna um detalhe para o
+# relatório, ou None se o artefato não estiver disponível.
+ETAPAS: List[Tuple[str, Callable[[], Optional[str]]]] = [
+    ("bibliotecas", _importar_bibliotecas),
+    ("modelos_churn", _modelos_churn),
+    ("tabelas_cnae", _tabelas_cnae),
+    ("cubo_mercado", _cubo_mercado),
+    ("indice_cnpj", _indice_cnpj),
+    ("base_mapeada", _base_mapeada),
+    ("usuarios", _usuarios),
+]
+
+# Etapas sem as quais a aplicação não atende: erro ou indisponibilidade impedem o 'pronto'
+ETAPAS_OBRIGATORIAS = ("modelos_churn", "usuarios")
+
+
+def aquecer(etapas: Optional[List[Tuple[str, Callable[[], Optional[str]]]]] = None) -> Dict:
+    """
+    Executa as etapas de pré-carregamento, cronometrando cada uma.
+    Erros são registrados no relatório e não interrompem as demais etapas.
+
+    Returns:
+        Relatório do aquecimento (ver relatorio_aquecimento)
+    """
+    inicio = time.perf_counter()
+    print("🔥 Pré-carregando a aplicação...")
+    resultados = {}
+    for nome, funcao in (etapas or ETAPAS):
+        t0 = time.perf_counter()
+        try:
+            detalhe = funcao()
+            status = "ok" if detalhe is not None else "indisponivel"
+        except Exception as e:
+            detalhe, status = f"{type(e).__name__}: {e}", "erro"
+        resultados[nome] = {"status": status, "segundos": round(time.perf_counter() - t0, 3), "detalhe": detalhe}
+        print(f"   {'✅' if status == 'ok' else '⚠️'} {nome}: {status} ({resultados[nome]['segundos']:.3f}s)")
+
+    falhas = [nome for nome in ETAPAS_OBRIGATORIAS
+              if resultados.get(nome, {}).get("status") in ("erro", "indisponivel")]
+    _estado.update({
+        "pronto": not falhas,
+        "falhas": falhas,
+        "pid_aquecimento": os.getpid(),
+        "aquecido_em": datetime.now().isoformat(timespec="seconds"),
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "etapas": resultados
+    })
+    if falhas:
+        print(f"❌ Aplicação não pronta: falha em {', '.join(falhas)} ({_estado['segundos']:.2f}s)")
+    else:
+        print(f"✅ Aplicação pronta em {_estado['segundos']:.2f}s")
+    return relatorio_aquecimento()
+
+
+def relatorio_aquecimento() -> Dict:
+    """
+    Estado do pré-carregamento visto pelo processo atual. Em um worker do
+    gunicorn com preload_app, 'pid_aquecimento' é o do mestre (herdado no fork).
+    """
+    return {**_estado, "pid": os.getpid(), "etapas": dict(_estado["etapas"])}
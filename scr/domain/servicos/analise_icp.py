@@ -3,6 +3,8 @@ import numpy as np
 from typing import List, Dict, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from domain.servicos.matriz_produtos import obter_matriz_produtos
+
 class AnaliseICP:
     def __init__(self):
         self.capitao_america = pd.DataFrame()
@@ -143,8 +145,9 @@ class AnaliseICP:
             if cache_key in self._cache:
                 return self._cache[cache_key]
             
-            # Verificar se existe coluna de produtos
-            if "produtos" not in df.columns:
+            # Matriz clientes x produtos (CSR), normalmente já montada no pré-processamento
+            produtos = obter_matriz_produtos(df)
+            if produtos is None or not produtos.vocabulario:
                 return []
             
             # Calcular meses ativos se não existir
@@ -159,59 +162,38 @@ class AnaliseICP:
             # Calcular LTV automaticamente
             df_temp['ltv'] = df_temp['ticket_medio'] * df_temp['meses_ativo']
             
-            # Criar DataFrame com produtos já separados
-            produtos_series = df_temp["produtos"].fillna("").astype(str)
-            produtos_df = pd.DataFrame()
-            
-            # Processar produtos de forma segura
-            for idx, produtos in produtos_series.items():
-                if produtos:
-                    for produto in produtos.split(";"):
-                        produto = produto.strip()
-                        if produto:
-                            novo_registro = pd.DataFrame({
-                                "produto": [produto],
-                                "ltv": [df_temp.at[idx, "ltv"]],
-                                "ticket_medio": [df_temp.at[idx, "ticket_medio"]]
-                            })
-                            produtos_df = pd.concat([produtos_df, novo_registro], ignore_index=True)
-            
-            if produtos_df.empty:
-                return []
-            
-            # Converter para numérico
-            produtos_df["ltv"] = pd.to_numeric(produtos_df["ltv"], errors='coerce').fillna(0).astype('float32')
-            produtos_df["ticket_medio"] = pd.to_numeric(produtos_df["ticket_medio"], errors='coerce').fillna(0).astype('float32')
-            
-            # Criar dummies de forma otimizada
-            produtos_dummies = pd.get_dummies(produtos_df["produto"], prefix="", prefix_sep="")
-            
-            # Calcular correlações
-            correlacoes = []
-            ltv_values = produtos_df["ltv"].values
-            ticket_values = produtos_df["ticket_medio"].values
-            
-            for produto in produtos_dummies.columns:
-                try:
-                    produto_values = produtos_dummies[produto].values
-                    
-                    # Calcular correlações usando numpy
-                    corr_ltv = float(np.corrcoef(ltv_values, produto_values)[0,1])
-                    corr_ticket = float(np.corrcoef(ticket_values, produto_values)[0,1])
-                    
-                    correlacoes.append({
-                        "variavel": produto,
-                        "correlacao_com_ltv": corr_ltv if not np.isnan(corr_ltv) else 0.0,
-                        "correlacao_com_ticket": corr_ticket if not np.isnan(corr_ticket) else 0.0
-                    })
-                except Exception as e:
-                    print(f"Erro ao processar correlação para produto {produto}: {str(e)}")
-                    correlacoes.append({
-                        "variavel": produto,
-                        "correlacao_com_ltv": 0.0,
-                        "correlacao_com_ticket": 0.0
-                    })
-            
+            # A[i, p] = vezes que o cliente i cita o produto p
+            matriz, vocabulario = produtos.matriz, produtos.vocabulario
+
+            valores = np.column_stack([
+                pd.to_numeric(df_temp[col], errors='coerce').fillna(0).astype('float32').to_numpy(dtype=np.float64)
+                for col in ("ltv", "ticket_medio")
+            ])
+
+            # Mesma correlação de antes (Pearson sobre as menções de produto, cada
+            # menção com o ltv/ticket do seu cliente), calculada por agregados:
+            # cada cliente pesa pelo número de menções e um único produto A^T·y
+            # dá as somas de todos os produtos de uma vez
+            mencoes_cliente = produtos.mencoes_por_cliente()
+            mencoes_produto = produtos.mencoes_por_produto()
+            total = mencoes_cliente.sum()
+            centrados = valores - (mencoes_cliente @ valores) / total
+            with np.errstate(divide='ignore', invalid='ignore'):
+                covariancia = (matriz.T @ centrados) / total
+                frequencia = mencoes_produto / total
+                variancia_valores = (mencoes_cliente @ centrados ** 2) / total
+                corr = covariancia / np.sqrt((frequencia * (1 - frequencia))[:, None] * variancia_valores)
+            corr = np.nan_to_num(corr, nan=0.0, posinf=0.0, neginf=0.0)
+
+            correlacoes = [
+                {
+                    "variavel": produto,
+                    "correlacao_com_ltv": float(corr[j, 0]),
+                    "correlacao_com_ticket": float(corr[j, 1])
+                }
+                for j, produto in enumerate(vocabulario)
+            ]
+
             self._cache[cache_key] = correlacoes
             return correlacoes
         except Exception as e:
@@ -0,0 +1,266 @@
+"""
+Atualização incremental da base colunar com um novo dump da Receita Federal.
+
+De um mês para o outro só uma pequena parte dos estabelecimentos muda. Em vez
+de regenerar a base, o novo dump é comparado com a base atual por
+estabelecimento (id_estabelecimento = CNPJ de 14 dígitos) e hash do conteúdo
+das colunas mantidas (hash_linha):
+
+    - id novo                    -> linha acrescentada
+    - id existente, hash diferente -> linha acrescentada + versão antiga removida
+    - id ausente no novo dump    -> removida
+
+Só as linhas acrescentadas são gravadas, em arquivos novos (v<N>-part-*.parquet)
+nas mesmas partições; as remoções vão para _remocoes-v<N>.npz e o manifesto
+passa para a versão N apontando para elas (ver base_colunar): até a troca do
+manifesto, leitores continuam vendo a versão anterior inteira. O cubo de TAM é atualizado com os agregados
+do delta e o índice de CNPJs é regravado a partir das chaves vistas no dump.
+Caches de consultas usam a versão na chave, então resultados antigos deixam de
+ser usados sem precisar limpar nada.
+
+Exige uma base ingerida dos ZIPs (ver ingestao_receita), que tem o id do
+estabelecimento.
+"""
+
+import os
+import glob
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from domain.servicos.base_colunar import (
+    ARQUIVO_REMOCOES,
+    CAMINHO_CSV_RECEITA,
+    DIRETORIO_BASE_COLUNAR,
+    PARTICIONAMENTO,
+    SCHEMA_BASE,
+    carregar_base_colunar,
+    expressao_vigentes,
+    filtrar_vigentes,
+    fingerprint_arquivo,
+    fingerprint_fonte,
+    gravar_manifesto,
+    gravar_remocoes,
+    ler_manifesto,
+    ler_remocoes,
+    limpar_remocoes
+)
+from domain.servicos.cubo_mercado import (
+    CAMINHO_CUBO,
+    agregar_estabelecimentos,
+    aplicar_delta_cubo,
+    construir_cubo_mercado,
+    cubo_valido,
+    salvar_cubo
+)
+from domain.servicos.indice_cnpj import CAMINHO_INDICE_CNPJ, IndiceCNPJ, inferir_digitos, normalizar_cnpj
+from domain.servicos.ingestao_receita import (
+    DIRETORIO_ORIGEM,
+    PADRAO_ARQUIVOS,
+    TAMANHO_BLOCO_BYTES,
+    MonitorMemoria,
+    listar_arquivos,
+    ler_estabelecimentos,
+    novas_estatisticas_ingestao
+)
+
+
+def carregar_estado_atual(diretorio: str = DIRETORIO_BASE_COLUNAR) -> pd.DataFrame:
+    """
+    Retorna id_estabelecimento e hash_linha das linhas vigentes, ordenados por id.
+    """
+    df, _ = carregar_base_colunar(diretorio=diretorio, colunas=["id_estabelecimento", "hash_linha"])
+    if "id_estabelecimento" not in df.columns or df["id_estabelecimento"].isna().any():
+        raise ValueError("A atualização incremental exige uma base ingerida dos ZIPs da Receita "
+                         "(com id_estabelecimento); gere a base completa com ingestao_receita")
+    df = df.astype({"id_estabelecimento": np.uint64, "hash_linha": np.uint64})
+    return df.sort_values("id_estabelecimento", ignore_index=True)
+
+
+def _remover_orfaos(diretorio: str, versao: int):
+    """Apaga arquivos de uma atualização anterior interrompida para a mesma versão."""
+    for caminho in glob.glob(os.path.join(diretorio, "**", f"v{versao}-*.parquet"), recursive=True):
+        os.remove(caminho)
+
+
+def _linhas_removidas(diretorio: str, ids: np.ndarray, chunk_size: int = 1000000) -> List[pd.DataFrame]:
+    """
+    Agrega (no grão do cubo) as linhas vigentes dos estabelecimentos removidos ou alterados.
+    Deve ser chamado antes de publicar a nova versão.
+    """
+    if len(ids) == 0:
+        return []
+    dataset = ds.dataset(diretorio, format="parquet", partitioning=PARTICIONAMENTO)
+    manifesto = ler_manifesto(diretorio)
+    remocoes = ler_remocoes(diretorio, manifesto or {})
+    extras = ["versao"] if remocoes is not None else []
+    filtro = ds.field("id_estabelecimento").isin(pa.array(ids, type=pa.uint64()))
+    filtro_versao = expressao_vigentes(manifesto, dataset.schema.names)
+    if filtro_versao is not None:
+        filtro = filtro & filtro_versao
+    colunas = ["uf", "municipio", "cnae", "id_estabelecimento"] + extras
+    parciais = []
+    for lote in dataset.to_batches(columns=colunas, filter=filtro, batch_size=chunk_size):
+        tabela = filtrar_vigentes(pa.Table.from_batches([lote]), remocoes, extras)
+        parciais.append(agregar_estabelecimentos(tabela.to_pandas()))
+    return parciais
+
+
+def atualizar_base(arquivos: Optional[List[str]] = None,
+                   diretorio_origem: str = DIRETORIO_ORIGEM,
+                   diretorio: str = DIRETORIO_BASE_COLUNAR,
+                   caminho_cubo: str = CAMINHO_CUBO,
+                   caminho_indice: str = CAMINHO_INDICE_CNPJ,
+                   tamanho_bloco: int = TAMANHO_BLOCO_BYTES,
+                   derivados: bool = True) -> Dict:
+    """
+    Aplica um novo dump (Estabelecimentos*.zip) à base colunar existente como uma nova versão.
+
+    Args:
+        arquivos: ZIPs do novo dump (None = todos os Estabelecimentos*.zip de diretorio_origem)
+        diretorio_origem: Diretório onde os ZIPs foram baixados
+        diretorio: Base colunar a atualizar
+        caminho_cubo: Cubo de TAM a atualizar
+        caminho_indice: Índice de CNPJs a regravar
+        tamanho_bloco: Bytes de CSV lidos por lote
+        derivados: Atualizar o cubo e regravar o índice de CNPJs (False = só a base;
+            os derivados antigos passam a ser vistos como desatualizados)
+
+    Returns:
+        Manifesto da nova versão (o resumo da atualização fica em manifesto['historico'][-1])
+    """
+    manifesto = ler_manifesto(diretorio)
+    if manifesto is None:
+        raise FileNotFoundError(f"Base colunar não encontrada em {diretorio}; faça a ingestão completa primeiro")
+    arquivos = arquivos or listar_arquivos(diretorio_origem)
+    if not arquivos:
+        raise FileNotFoundError(f"Nenhum arquivo {PADRAO_ARQUIVOS} encontrado em {diretorio_origem}")
+
+    versao = manifesto.get("versao", 0) + 1
+    print(f"🔄 Atualizando {diretorio} para a versão {versao} com {len(arquivos)} arquivo(s)...")
+    inicio = time.time()
+    cubo_atualizavel = derivados and cubo_valido(caminho_cubo, CAMINHO_CSV_RECEITA, diretorio)
+
+    estado = carregar_estado_atual(diretorio)
+    ids_atuais = estado["id_estabelecimento"].to_numpy()
+    hashes_atuais = estado["hash_linha"].to_numpy()
+    vistos = np.zeros(len(ids_atuais), dtype=bool)
+    print(f"📋 Base atual: {len(ids_atuais):,} estabelecimentos vigentes")
+
+    estatisticas = novas_estatisticas_ingestao()
+    resumo = {"versao": versao, "novos": 0, "alterados": 0, "removidos": 0, "inalterados": 0}
+    ids_alterados, chaves_cnpj, cubo_adicionadas = [], [], []
+    digitos = None
+    monitor = MonitorMemoria()
+
+    def gerar_delta():
+        nonlocal digitos
+        for caminho in arquivos:
+            print(f"📦 Comparando {caminho}...")
+            for lote in ler_estabelecimentos(caminho, estatisticas, tamanho_bloco, versao):
+                ids = lote.column("id_estabelecimento").fill_null(0).to_numpy()
+                hashes = lote.column("hash_linha").to_numpy()
+
+                existe = np.zeros(len(ids), dtype=bool)
+                alterado = np.zeros(len(ids), dtype=bool)
+                if len(ids_atuais) > 0:
+                    posicoes = np.minimum(np.searchsorted(ids_atuais, ids), len(ids_atuais) - 1)
+                    existe = ids_atuais[posicoes] == ids
+                    vistos[posicoes[existe]] = True
+                    alterado = existe & (hashes_atuais[posicoes] != hashes)
+                novo = ~existe
+                ids_alterados.append(ids[alterado])
+                resumo["novos"] += int(novo.sum())
+                resumo["alterados"] += int(alterado.sum())
+                resumo["inalterados"] += int((existe & ~alterado).sum())
+
+                if derivados:
+                    cnpjs = lote.column("cnpj").to_pandas()
+                    digitos = digitos or inferir_digitos(cnpjs)
+                    chaves, validos = normalizar_cnpj(cnpjs, digitos)
+                    chaves_cnpj.append(np.unique(chaves[validos]))
+
+                gravar = novo | alterado
+                monitor.amostrar()
+                if gravar.any():
+                    delta = lote.filter(pa.array(gravar))
+                    if cubo_atualizavel:
+                        cubo_adicionadas.append(agregar_estabelecimentos(
+                            delta.select(["uf", "municipio", "cnae"]).to_pandas()
+                        ))
+                    yield delta
+
+    _remover_orfaos(diretorio, versao)
+    ds.write_dataset(
+        gerar_delta(),
+        diretorio,
+        schema=SCHEMA_BASE,
+        format="parquet",
+        partitioning=PARTICIONAMENTO,
+        basename_template=f"v{versao}-part-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_partitions=4096
+    )
+
+    ids_removidos = ids_atuais[~vistos]
+    resumo["removidos"] = int(len(ids_removidos))
+    ids_substituidos = np.union1d(np.concatenate(ids_alterados) if ids_alterados else np.array([], np.uint64),
+                                  ids_removidos).astype(np.uint64)
+
+    # Agregados das linhas que deixam de valer (lidos antes de publicar a versão)
+    cubo_removidas = _linhas_removidas(diretorio, ids_substituidos) if cubo_atualizavel else []
+
+    # Remoções: mantém a versão mais recente de cada estabelecimento
+    remocoes = ler_remocoes(diretorio, manifesto)
+    if remocoes is not None:
+        anteriores = ~np.isin(remocoes[0], ids_substituidos)
+        ids_rem = np.concatenate([remocoes[0][anteriores], ids_substituidos])
+        versoes_rem = np.concatenate([remocoes[1][anteriores], np.full(len(ids_substituidos), versao, np.uint16)])
+    else:
+        ids_rem, versoes_rem = ids_substituidos, np.full(len(ids_substituidos), versao, np.uint16)
+    ordem = np.argsort(ids_rem, kind="stable")
+    # Ainda invisível: só vale quando o manifesto da versão apontar para ele
+    arquivo_remocoes = gravar_remocoes(diretorio, ids_rem[ordem], versoes_rem[ordem], versao)
+
+    resumo["segundos"] = round(time.time() - inicio, 1)
+    resumo["pico_rss_bytes"] = monitor.pico_bytes
+    resumo["atualizado_em"] = datetime.now().isoformat(timespec="seconds")
+    remocoes_anteriores = manifesto.get("remocoes", ARQUIVO_REMOCOES)
+    manifesto = {
+        **manifesto,
+        "versao": versao,
+        "remocoes": arquivo_remocoes,
+        "origem": [os.path.basename(a) for a in arquivos],
+        "fingerprint": {os.path.basename(a): fingerprint_arquivo(a) for a in arquivos},
+        "linhas": len(ids_atuais) + resumo["novos"] - resumo["removidos"],
+        "historico": manifesto.get("historico", []) + [resumo]
+    }
+    gravar_manifesto(diretorio, manifesto)
+    # Mantém o registro da versão anterior para leitores que ainda usam o manifesto antigo
+    limpar_remocoes(diretorio, [arquivo_remocoes, remocoes_anteriores])
+    print(f"✅ Versão {versao}: {resumo['novos']:,} novos, {resumo['alterados']:,} alterados, "
+          f"{resumo['removidos']:,} removidos, {resumo['inalterados']:,} inalterados "
+          f"({resumo['segundos']:,.1f}s, pico RSS {monitor.pico_bytes / 1024 ** 2:,.0f} MB)")
+
+    if not derivados:
+        return manifesto
+
+    # Derivados
+    fonte = fingerprint_fonte(CAMINHO_CSV_RECEITA, diretorio)
+    if cubo_atualizavel:
+        cubo = aplicar_delta_cubo(pd.read_parquet(caminho_cubo), cubo_adicionadas, cubo_removidas)
+        salvar_cubo(cubo, caminho_cubo, fonte)
+        print(f"✅ Cubo atualizado: {len(cubo):,} células, {int(cubo['TAM'].sum()):,} estabelecimentos")
+    else:
+        construir_cubo_mercado(CAMINHO_CSV_RECEITA, diretorio, caminho_cubo)
+
+    chaves = np.unique(np.concatenate(chaves_cnpj)) if chaves_cnpj else np.array([], dtype=np.uint64)
+    indice = IndiceCNPJ(chaves, digitos or 14)
+    indice.salvar(caminho_indice, fonte)
+    print(f"✅ Índice de CNPJs regravado: {len(indice):,} CNPJs")
+    return manifesto
@@ -0,0 +1,434 @@
+"""
+Base colunar particionada da Receita Federal.
+
+Converte uma única vez o CSV de estabelecimentos em um diretório Parquet
+particionado por UF e divisão CNAE (2 dígitos), permitindo que consultas com
+filtros leiam apenas as partições necessárias.
+
+Layout gerado:
+    scr/data/cnpjs_receita_colunar/
+        _manifesto.json
+        _remocoes-v1.npz                       (só após atualizações incrementais)
+        uf=SP/cnae_divisao=62/part-0.parquet
+        uf=SP/cnae_divisao=62/v1-part-0.parquet (linhas novas/alteradas da versão 1)
+        ...
+
+Versões: cada linha guarda a versão da base em que foi gravada (coluna
+'versao', 0 na carga completa). Atualizações incrementais (ver
+atualizacao_receita) só acrescentam arquivos com as linhas novas ou alteradas
+e registram em _remocoes-v<N>.npz, por estabelecimento, a última versão em que
+ele foi alterado ou removido. Uma linha é vigente se o seu estabelecimento não
+foi removido em uma versão posterior à dela.
+
+O manifesto aponta o arquivo de remoções da versão publicada ('remocoes'), então
+a troca do manifesto publica de uma vez as linhas novas e as remoções: uma
+atualização interrompida antes dela não esconde nenhuma linha. Leitores usam o
+mesmo manifesto para o filtro de versão e para as remoções.
+"""
+
+import os
+import glob
+import json
+import shutil
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple, Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from domain.servicos.leitura_receita import (
+    como_lista,
+    colunas_necessarias,
+    expressao_filtros,
+    finalizar_estatisticas,
+    novas_estatisticas
+)
+
+CAMINHO_CSV_RECEITA = "scr/data/cnpjs_receita_final.csv"
+DIRETORIO_BASE_COLUNAR = "scr/data/cnpjs_receita_colunar"
+ARQUIVO_MANIFESTO = "_manifesto.json"
+# Registro de remoções: o nome versionado fica no manifesto ('remocoes');
+# ARQUIVO_REMOCOES é o nome fixo das bases gravadas antes disso
+ARQUIVO_REMOCOES = "_remocoes.npz"
+MODELO_ARQUIVO_REMOCOES = "_remocoes-v{versao}.npz"
+
+# Colunas de partição (ficam no caminho do arquivo, não dentro do Parquet)
+COLUNAS_PARTICAO = ["uf", "cnae_divisao"]
+
+# Colunas com poucos valores distintos são gravadas com dictionary encoding
+COLUNAS_DICIONARIO = ["municipio", "situacao"]
+
+SCHEMA_BASE = pa.schema([
+    ("cnpj", pa.string()),
+    ("cnae", pa.string()),
+    ("razao_social", pa.string()),
+    ("municipio", pa.dictionary(pa.int32(), pa.string())),
+    ("situacao", pa.dictionary(pa.int8(), pa.string())),
+    ("id_estabelecimento", pa.uint64()),
+    ("hash_linha", pa.uint64()),
+    ("versao", pa.uint16()),
+    ("uf", pa.string()),
+    ("cnae_divisao", pa.string()),
+])
+
+# Colunas de controle: identificação do estabelecimento (CNPJ de 14 dígitos,
+# só disponível na ingestão dos ZIPs), hash do conteúdo e versão da linha
+COLUNAS_CONTROLE = ["id_estabelecimento", "hash_linha", "versao"]
+
+# Colunas cujo conteúdo define se um estabelecimento mudou entre duas bases
+COLUNAS_HASH = ["cnpj", "cnae", "razao_social", "uf", "municipio", "situacao"]
+
+PARTICIONAMENTO = ds.partitioning(
+    pa.schema([("uf", pa.string()), ("cnae_divisao", pa.string())]),
+    flavor="hive"
+)
+
+# Valor usado na partição quando UF/CNAE não está preenchido
+VALOR_NULO = "__nulo__"
+
+# Base ingerida diretamente dos ZIPs da Receita (ver ingestao_receita): o CSV não é a origem
+FORMATO_ORIGEM_ZIP = "zip_receita"
+
+
+def fingerprint_arquivo(caminho: str) -> Dict:
+    """
+    Retorna a "impressão digital" de um arquivo (tamanho e data de modificação).
+    """
+    stat = os.stat(caminho)
+    return {"tamanho": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def ler_manifesto(diretorio: str = DIRETORIO_BASE_COLUNAR) -> Optional[Dict]:
+    """
+    Lê o manifesto da base colunar. Retorna None se não existir ou estiver corrompido.
+    """
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def gravar_manifesto(diretorio: str, manifesto: Dict):
+    """Grava o manifesto de forma atômica (leitores nunca veem um arquivo parcial)."""
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    with open(caminho + ".tmp", "w") as f:
+        json.dump(manifesto, f, indent=2)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def base_colunar_valida(diretorio: str = DIRETORIO_BASE_COLUNAR,
+                        caminho_origem: str = CAMINHO_CSV_RECEITA) -> bool:
+    """
+    Verifica se a base colunar existe e corresponde ao CSV de origem atual.
+
+    Se o CSV de origem não existir, ou se a base foi ingerida direto dos ZIPs
+    da Receita, a base colunar é considerada válida (ela é a fonte de dados).
+    """
+    manifesto = ler_manifesto(diretorio)
+    if manifesto is None:
+        return False
+    if manifesto.get("formato_origem") == FORMATO_ORIGEM_ZIP or not os.path.exists(caminho_origem):
+        return True
+    return manifesto.get("fingerprint") == fingerprint_arquivo(caminho_origem)
+
+
+def fingerprint_fonte(caminho_csv: str = CAMINHO_CSV_RECEITA,
+                      diretorio: str = DIRETORIO_BASE_COLUNAR) -> Dict:
+    """
+    Identifica a versão da base em uso (colunar, se válida, ou CSV), para que
+    caches e agregados derivados saibam de qual versão foram calculados.
+    """
+    if base_colunar_valida(diretorio, caminho_csv):
+        manifesto = ler_manifesto(diretorio) or {}
+        return {"fonte": "colunar", "fingerprint": manifesto.get("fingerprint"),
+                "criado_em": manifesto.get("criado_em"), "versao": manifesto.get("versao", 0)}
+    return {"fonte": "csv", "fingerprint": fingerprint_arquivo(caminho_csv)}
+
+
+def iterar_lotes(colunas: List[str],
+                 caminho_csv: str = CAMINHO_CSV_RECEITA,
+                 diretorio: str = DIRETORIO_BASE_COLUNAR,
+                 chunk_size: int = 1000000) -> Iterator[pd.DataFrame]:
+    """
+    Percorre a base inteira em lotes lendo apenas as colunas pedidas,
+    a partir da base colunar (se válida) ou do CSV.
+    """
+    if base_colunar_valida(diretorio, caminho_csv):
+        dataset = ds.dataset(diretorio, format="parquet", partitioning=PARTICIONAMENTO)
+        manifesto = ler_manifesto(diretorio)
+        remocoes = ler_remocoes(diretorio, manifesto or {})
+        extras = _colunas_vigencia(colunas, remocoes)
+        filtro = expressao_vigentes(manifesto, dataset.schema.names)
+        for lote in dataset.to_batches(columns=colunas + extras, filter=filtro, batch_size=chunk_size):
+            yield filtrar_vigentes(pa.Table.from_batches([lote]), remocoes, extras).to_pandas()
+    else:
+        for chunk in pd.read_csv(caminho_csv, dtype=str, usecols=colunas, chunksize=chunk_size):
+            yield chunk
+
+
+def hash_linhas(df: pd.DataFrame) -> np.ndarray:
+    """Hash (uint64) do conteúdo de COLUNAS_HASH de cada linha."""
+    return pd.util.hash_pandas_object(df[COLUNAS_HASH].fillna(""), index=False).to_numpy(np.uint64)
+
+
+def preparar_lote(chunk: pd.DataFrame, versao: int = 0) -> pa.RecordBatch:
+    """Normaliza um chunk do CSV/ZIP para o schema da base colunar."""
+    chunk = chunk.reindex(columns=[c.name for c in SCHEMA_BASE if c.name not in ("cnae_divisao", "hash_linha", "versao")])
+    chunk["id_estabelecimento"] = chunk["id_estabelecimento"].astype("UInt64")
+    chunk["hash_linha"] = hash_linhas(chunk)
+    chunk["versao"] = np.uint16(versao)
+    chunk["cnae_divisao"] = chunk["cnae"].str[:2]
+    for col in COLUNAS_PARTICAO:
+        chunk[col] = chunk[col].fillna(VALOR_NULO)
+    for col in COLUNAS_DICIONARIO:
+        chunk[col] = chunk[col].astype("category")
+    return pa.RecordBatch.from_pandas(chunk, schema=SCHEMA_BASE, preserve_index=False)
+
+
+def construir_base_colunar(caminho_csv: str = CAMINHO_CSV_RECEITA,
+                           diretorio: str = DIRETORIO_BASE_COLUNAR,
+                           chunk_size: int = 500000) -> Dict:
+    """
+    Converte o CSV da Receita Federal em uma base Parquet particionada por UF e divisão CNAE.
+
+    A leitura é feita em chunks, então o consumo de memória não depende do tamanho do CSV.
+    A base é escrita em um diretório temporário e só substitui a anterior ao final.
+
+    Args:
+        caminho_csv: CSV de origem (gerado por tests/gerar_base_receita_cnpj.py)
+        diretorio: Diretório de destino da base colunar
+        chunk_size: Quantidade de linhas lidas por vez
+
+    Returns:
+        Manifesto da base gerada
+    """
+    print(f"🔄 Construindo base colunar a partir de {caminho_csv}...")
+    fingerprint = fingerprint_arquivo(caminho_csv)
+    total_linhas = 0
+
+    def gerar_batches():
+        nonlocal total_linhas
+        for i, chunk in enumerate(pd.read_csv(caminho_csv, dtype=str, chunksize=chunk_size), start=1):
+            total_linhas += len(chunk)
+            if i % 10 == 0:
+                print(f"📊 Processados {i} chunks ({total_linhas:,} linhas)...")
+            yield preparar_lote(chunk)
+
+    manifesto = gravar_base_colunar(gerar_batches(), diretorio, {"origem": caminho_csv, "fingerprint": fingerprint})
+    print(f"✅ Base colunar gerada em {diretorio}: {total_linhas:,} linhas")
+    return manifesto
+
+
+def gravar_base_colunar(lotes: Iterator[pa.RecordBatch], diretorio: str, manifesto: Dict) -> Dict:
+    """
+    Grava lotes já no SCHEMA_BASE (ver preparar_lote) como base particionada.
+
+    A base é escrita em um diretório temporário e só substitui a anterior ao
+    final, junto com o manifesto (que recebe a quantidade de linhas gravadas).
+
+    Args:
+        lotes: Iterador de RecordBatch (consumido em streaming)
+        diretorio: Diretório de destino da base colunar
+        manifesto: Origem e fingerprint da fonte (demais campos são preenchidos aqui)
+
+    Returns:
+        Manifesto da base gerada
+    """
+    diretorio_tmp = diretorio + ".tmp"
+    shutil.rmtree(diretorio_tmp, ignore_errors=True)
+
+    linhas = 0
+
+    def contar(lotes_origem):
+        nonlocal linhas
+        for lote in lotes_origem:
+            linhas += lote.num_rows
+            yield lote
+
+    ds.write_dataset(
+        contar(lotes),
+        diretorio_tmp,
+        schema=SCHEMA_BASE,
+        format="parquet",
+        partitioning=PARTICIONAMENTO,
+        basename_template="part-{i}.parquet",
+        max_partitions=4096
+    )
+
+    return publicar_base_colunar(diretorio_tmp, diretorio, {**manifesto, "linhas": linhas})
+
+
+def publicar_base_colunar(diretorio_tmp: str, diretorio: str, manifesto: Dict) -> Dict:
+    """
+    Grava o manifesto em um diretório já preenchido e o coloca no lugar da base atual.
+    A presença do manifesto indica que a base está completa.
+    """
+    manifesto = {
+        **manifesto,
+        "versao": 0,
+        "particionamento": COLUNAS_PARTICAO,
+        "criado_em": datetime.now().isoformat(timespec="seconds")
+    }
+    gravar_manifesto(diretorio_tmp, manifesto)
+
+    shutil.rmtree(diretorio, ignore_errors=True)
+    os.replace(diretorio_tmp, diretorio)
+    return manifesto
+
+
+def ler_remocoes(diretorio: str = DIRETORIO_BASE_COLUNAR,
+                 manifesto: Optional[Dict] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Lê o registro de remoções da versão publicada: ids de estabelecimento
+    (ordenados) e a última versão em que cada um foi alterado ou removido.
+    None se não houver.
+
+    Args:
+        diretorio: Diretório da base colunar
+        manifesto: Manifesto já lido pelo chamador (None = ler agora); passe o
+            mesmo usado em expressao_vigentes para ver uma única versão
+    """
+    if manifesto is None:
+        manifesto = ler_manifesto(diretorio) or {}
+    nome = manifesto.get("remocoes", ARQUIVO_REMOCOES)
+    caminho = os.path.join(diretorio, nome)
+    if not os.path.exists(caminho):
+        return None
+    with np.load(caminho) as dados:
+        return dados["ids"], dados["versoes"]
+
+
+def gravar_remocoes(diretorio: str, ids: np.ndarray, versoes: np.ndarray, versao: int) -> str:
+    """
+    Grava o registro de remoções da versão (ids ordenados e sem repetição).
+    Só passa a valer quando o manifesto da versão apontar para ele.
+
+    Returns:
+        Nome do arquivo, para o campo 'remocoes' do manifesto
+    """
+    nome = MODELO_ARQUIVO_REMOCOES.format(versao=versao)
+    caminho_tmp = os.path.join(diretorio, nome + ".tmp.npz")
+    np.savez(caminho_tmp, ids=ids, versoes=versoes)
+    os.replace(caminho_tmp, os.path.join(diretorio, nome))
+    return nome
+
+
+def limpar_remocoes(diretorio: str, manter: List[Optional[str]]):
+    """Remove registros de remoções que nenhum manifesto recente aponta."""
+    for caminho in glob.glob(os.path.join(diretorio, "_remocoes*.npz")):
+        if os.path.basename(caminho) not in manter:
+            os.remove(caminho)
+
+
+def expressao_vigentes(manifesto: Optional[Dict], colunas_disponiveis: List[str]) -> Optional[ds.Expression]:
+    """
+    Ignora linhas de versões ainda não publicadas no manifesto
+    (ex: arquivos de uma atualização interrompida).
+    """
+    if "versao" not in colunas_disponiveis or manifesto is None:
+        return None
+    return ds.field("versao") <= manifesto.get("versao", 0)
+
+
+def _colunas_vigencia(leitura: List[str], remocoes) -> List[str]:
+    """Colunas que precisam ser lidas a mais para aplicar as remoções."""
+    if remocoes is None:
+        return []
+    return [c for c in ("id_estabelecimento", "versao") if c not in leitura]
+
+
+def filtrar_vigentes(tabela: pa.Table, remocoes, extras: List[str]) -> pa.Table:
+    """
+    Remove as linhas substituídas ou excluídas em versões posteriores
+    e descarta as colunas lidas só para isso.
+    """
+    if remocoes is None or tabela.num_rows == 0:
+        return tabela.drop_columns(extras)
+    ids_removidos, versoes_remocao = remocoes
+    ids = tabela.column("id_estabelecimento").fill_null(0).to_numpy()
+    versoes = tabela.column("versao").to_numpy()
+    vigentes = np.ones(len(ids), dtype=bool)
+    if len(ids_removidos) > 0:
+        posicoes = np.minimum(np.searchsorted(ids_removidos, ids), len(ids_removidos) - 1)
+        removidos = (ids_removidos[posicoes] == ids) & (versoes_remocao[posicoes] > versoes)
+        vigentes = ~removidos
+    return tabela.filter(pa.array(vigentes)).drop_columns(extras)
+
+
+def _expressao_particoes(filtros: Optional[Dict]) -> Optional[ds.Expression]:
+    """
+    Converte os filtros de UF/CNAE em uma expressão sobre as colunas de partição,
+    permitindo que o pyarrow descarte diretórios inteiros sem abri-los.
+    """
+    if not filtros:
+        return None
+    expressao = None
+    if filtros.get("uf"):
+        expressao = ds.field("uf").isin(como_lista(filtros["uf"]))
+    if filtros.get("cnae"):
+        divisoes = sorted({c[:2] for c in como_lista(filtros["cnae"])})
+        expr_cnae = ds.field("cnae_divisao").isin(divisoes)
+        expressao = expr_cnae if expressao is None else expressao & expr_cnae
+    return expressao
+
+
+def carregar_base_colunar(filtros: Optional[Dict] = None,
+                          diretorio: str = DIRETORIO_BASE_COLUNAR,
+                          colunas: Optional[List[str]] = None) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Carrega a base colunar com poda de partições, projeção de colunas e
+    filtros avaliados pelo pyarrow durante a leitura.
+
+    Filtros de 'uf' e 'cnae' eliminam partições inteiras; os valores de 'cnae'
+    são tratados como prefixo (ex: '62' ou '6201').
+
+    Args:
+        filtros: Dicionário com filtros (ex: {'uf': ['SP'], 'cnae': ['62']})
+        diretorio: Diretório da base colunar
+        colunas: Colunas a carregar (None = todas, exceto as de controle)
+
+    Returns:
+        Tupla (DataFrame filtrado, estatísticas da leitura)
+    """
+    dataset = ds.dataset(diretorio, format="parquet", partitioning=PARTICIONAMENTO)
+    nomes = dataset.schema.names
+    if colunas is None:
+        colunas = [n for n in nomes if n not in COLUNAS_CONTROLE]
+    leitura = colunas_necessarias(colunas, filtros, nomes)
+    manifesto = ler_manifesto(diretorio)
+    remocoes = ler_remocoes(diretorio, manifesto or {})
+    extras = _colunas_vigencia(leitura, remocoes)
+
+    expressao_particoes = _expressao_particoes(filtros)
+    expressao = expressao_filtros(filtros, nomes)
+    if expressao_particoes is not None:
+        expressao = expressao_particoes & expressao
+    expressao_versao = expressao_vigentes(manifesto, nomes)
+    if expressao_versao is not None:
+        expressao = expressao_versao if expressao is None else expressao & expressao_versao
+
+    estatisticas = novas_estatisticas("colunar")
+    estatisticas["linhas_lidas"] = dataset.count_rows(filter=expressao_particoes)
+    tabela = filtrar_vigentes(dataset.to_table(columns=leitura + extras, filter=expressao), remocoes, extras)
+    estatisticas["linhas_mantidas"] = tabela.num_rows
+    finalizar_estatisticas(estatisticas)
+
+    df = tabela.to_pandas()
+
+    # Manter o mesmo contrato de tipos do carregamento via CSV
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+
+    df = df[[c for c in colunas if c in df.columns]]
+    return df, estatisticas
+
+
+if __name__ == "__main__":
+    construir_base_colunar()
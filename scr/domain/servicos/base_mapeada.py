@@ -0,0 +1,329 @@
+"""
+Base de mercado mapeada em memória (memory-map), compartilhada entre processos.
+
+Cada worker do gunicorn que calcula TAM/SAM/SOM manteria a sua própria cópia
+do DataFrame de mercado. Aqui o esquema compacto (ver esquema_mercado) é
+exportado uma vez por versão da base para arquivos .npy, um por coluna, que
+são abertos com np.load(mmap_mode="r"): os dados ficam no page cache do
+sistema operacional, uma única cópia física serve todos os workers e abrir a
+base é um mmap, não uma leitura de Parquet/CSV.
+
+Layout gerado:
+    scr/data/cnpjs_receita_mapeada/
+        _manifesto.json     (linhas, dtypes, categorias, versão da fonte)
+        cnpj.npy            uint64
+        cnae.npy            uint32
+        uf.npy, municipio.npy, ...   códigos das colunas category
+
+Os códigos são gravados no dtype que o pandas usaria para a quantidade de
+categorias (int8/int16/int32), então o DataFrame montado sobre os arrays
+(BaseMapeada.dataframe) não copia nada. Os arrays são somente leitura;
+recortes com filtros (BaseMapeada.filtrar) materializam só as linhas mantidas.
+
+A base é regravada por inteiro em um diretório temporário e trocada no final;
+processos que ainda estejam com a versão anterior aberta continuam lendo os
+arquivos antigos até recarregarem (ver obter_base_mapeada).
+"""
+
+import os
+import json
+import shutil
+from datetime import datetime
+from typing import Optional, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from domain.servicos.base_colunar import (
+    CAMINHO_CSV_RECEITA,
+    DIRETORIO_BASE_COLUNAR,
+    fingerprint_fonte,
+    iterar_lotes,
+    ler_manifesto
+)
+from domain.servicos.esquema_mercado import (
+    COLUNAS_CATEGORICAS,
+    VERSAO_ESQUEMA,
+    compactar_mercado,
+    enriquecer_mercado
+)
+from domain.servicos.indice_cnpj import inferir_digitos
+from domain.servicos.leitura_receita import COLUNAS_MERCADO, COLUNAS_PREFIXO, como_lista
+
+DIRETORIO_BASE_MAPEADA = "scr/data/cnpjs_receita_mapeada"
+ARQUIVO_MANIFESTO_MAPEADA = "_manifesto.json"
+
+COLUNAS_NUMERICAS = {"cnpj": np.uint64, "cnae": np.uint32}
+
+# Largura do código CNAE completo (filtros por prefixo viram intervalos)
+DIGITOS_CNAE = 7
+
+# Colunas derivadas incluídas quando a coluna de origem é pedida
+COLUNAS_DERIVADAS = {"uf": ["regiao"], "cnae": ["cnae_divisao", "descricao_cnae"]}
+
+
+def dtype_codigos(quantidade_categorias: int) -> np.dtype:
+    """Dtype dos códigos que o pandas usa para essa quantidade de categorias."""
+    for tipo in (np.int8, np.int16, np.int32):
+        if quantidade_categorias < np.iinfo(tipo).max:
+            return np.dtype(tipo)
+    return np.dtype(np.int64)
+
+
+def ler_manifesto_mapeada(diretorio: str = DIRETORIO_BASE_MAPEADA) -> Optional[Dict]:
+    """Lê o manifesto da base mapeada. Retorna None se não existir ou estiver corrompido."""
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO_MAPEADA)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _converter_codigos(caminho_bin: str, caminho_npy: str, remapeamento: np.ndarray,
+                       dtype: np.dtype, linhas: int, chunk_size: int):
+    """Reescreve os códigos provisórios (int32, ordem de chegada) no dtype e na ordem finais."""
+    provisorios = np.memmap(caminho_bin, dtype=np.int32, mode="r", shape=(linhas,)) if linhas else np.array([], np.int32)
+    destino = np.lib.format.open_memmap(caminho_npy, mode="w+", dtype=dtype, shape=(linhas,))
+    for inicio in range(0, linhas, chunk_size):
+        destino[inicio:inicio + chunk_size] = remapeamento[provisorios[inicio:inicio + chunk_size]]
+    destino.flush()
+    del provisorios, destino
+    os.remove(caminho_bin)
+
+
+def exportar_base_mapeada(caminho_csv: str = CAMINHO_CSV_RECEITA,
+                          diretorio_base: str = DIRETORIO_BASE_COLUNAR,
+                          diretorio: str = DIRETORIO_BASE_MAPEADA,
+                          chunk_size: int = 1000000) -> Dict:
+    """
+    Exporta a base de mercado no esquema compacto para arquivos .npy por coluna.
+    A leitura é feita lote a lote; a memória usada não depende do tamanho da base.
+    Deve ser executado uma vez por versão da base da Receita Federal.
+
+    Args:
+        caminho_csv: CSV da Receita (usado se a base colunar não for válida)
+        diretorio_base: Base colunar de origem
+        diretorio: Diretório de destino da base mapeada
+        chunk_size: Linhas por lote
+
+    Returns:
+        Manifesto da base mapeada
+    """
+    print("🔄 Exportando base de mercado mapeada em memória...")
+    fonte = fingerprint_fonte(caminho_csv, diretorio_base)
+    diretorio_tmp = diretorio + ".tmp"
+    shutil.rmtree(diretorio_tmp, ignore_errors=True)
+    os.makedirs(diretorio_tmp)
+
+    # Códigos provisórios: int32 na ordem em que as categorias aparecem
+    codigos_vistos: Dict[str, Dict] = {coluna: {} for coluna in COLUNAS_CATEGORICAS}
+    arquivos = {coluna: open(os.path.join(diretorio_tmp, coluna + ".bin"), "wb")
+                for coluna in list(COLUNAS_NUMERICAS) + COLUNAS_CATEGORICAS}
+    digitos = None
+    linhas = 0
+    try:
+        for i, lote in enumerate(iterar_lotes(COLUNAS_MERCADO, caminho_csv, diretorio_base, chunk_size), start=1):
+            if len(lote) == 0:
+                continue
+            digitos = digitos or inferir_digitos(lote["cnpj"])
+            lote.attrs["digitos_cnpj"] = digitos
+            df = compactar_mercado(enriquecer_mercado(lote))
+
+            for coluna, tipo in COLUNAS_NUMERICAS.items():
+                df[coluna].to_numpy(dtype=tipo).tofile(arquivos[coluna])
+            for coluna in COLUNAS_CATEGORICAS:
+                vistos = codigos_vistos[coluna]
+                categorias = df[coluna].cat.categories
+                # Último elemento = -1, para onde apontam os códigos nulos (-1)
+                lookup = np.array([vistos.setdefault(v, len(vistos)) for v in categorias] + [-1], dtype=np.int32)
+                lookup[df[coluna].cat.codes.to_numpy()].tofile(arquivos[coluna])
+            linhas += len(df)
+            if i % 10 == 0:
+                print(f"📊 Processados {i} lotes ({linhas:,} linhas)...")
+    finally:
+        for arquivo in arquivos.values():
+            arquivo.close()
+
+    colunas = {}
+    for coluna, tipo in COLUNAS_NUMERICAS.items():
+        caminho = os.path.join(diretorio_tmp, coluna)
+        dados = np.fromfile(caminho + ".bin", dtype=tipo, count=linhas) if linhas else np.array([], tipo)
+        np.save(caminho + ".npy", dados)
+        os.remove(caminho + ".bin")
+        colunas[coluna] = np.dtype(tipo).name
+
+    categorias_finais = {}
+    for coluna, vistos in codigos_vistos.items():
+        # Categorias ordenadas, como em compactar_mercado
+        ordenadas = sorted(vistos)
+        posicao = {valor: p for p, valor in enumerate(ordenadas)}
+        remapeamento = np.array([posicao[v] for v in vistos] + [-1], dtype=np.int64)
+        dtype = dtype_codigos(len(ordenadas))
+        caminho = os.path.join(diretorio_tmp, coluna)
+        _converter_codigos(caminho + ".bin", caminho + ".npy", remapeamento, dtype, linhas, chunk_size)
+        colunas[coluna] = dtype.name
+        categorias_finais[coluna] = ordenadas
+
+    manifesto = {
+        "linhas": linhas,
+        "digitos_cnpj": digitos or 14,
+        "colunas": colunas,
+        "categorias": categorias_finais,
+        "esquema": VERSAO_ESQUEMA,
+        "fonte": fonte,
+        "criado_em": datetime.now().isoformat(timespec="seconds")
+    }
+    with open(os.path.join(diretorio_tmp, ARQUIVO_MANIFESTO_MAPEADA), "w") as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False)
+
+    shutil.rmtree(diretorio, ignore_errors=True)
+    os.replace(diretorio_tmp, diretorio)
+    tamanho = sum(os.path.getsize(os.path.join(diretorio, c + ".npy")) for c in colunas)
+    print(f"✅ Base mapeada gerada em {diretorio}: {linhas:,} linhas, {tamanho / 1024 ** 2:,.1f} MB")
+    return manifesto
+
+
+class BaseMapeada:
+    def __init__(self, diretorio: str = DIRETORIO_BASE_MAPEADA):
+        self.diretorio = diretorio
+        self.manifesto = ler_manifesto_mapeada(diretorio)
+        if self.manifesto is None:
+            raise FileNotFoundError(f"Base mapeada não encontrada em {diretorio}")
+        self._mtime = os.path.getmtime(os.path.join(diretorio, ARQUIVO_MANIFESTO_MAPEADA))
+        self.arrays = {coluna: np.load(os.path.join(diretorio, coluna + ".npy"), mmap_mode="r")
+                       for coluna in self.manifesto["colunas"]}
+        self.categorias = {coluna: pd.Index(valores, dtype=object)
+                           for coluna, valores in self.manifesto["categorias"].items()}
+
+    def __len__(self) -> int:
+        return self.manifesto["linhas"]
+
+    def desatualizado(self) -> bool:
+        """Indica se a base foi regravada depois de aberta."""
+        caminho = os.path.join(self.diretorio, ARQUIVO_MANIFESTO_MAPEADA)
+        return not os.path.exists(caminho) or os.path.getmtime(caminho) != self._mtime
+
+    def colunas_disponiveis(self, colunas: Optional[List[str]] = None) -> Optional[List[str]]:
+        """
+        Colunas da base mapeada para as colunas pedidas (mais as derivadas delas).
+        Retorna None se alguma coluna pedida não estiver na base (ex: razao_social).
+        """
+        if colunas is None:
+            colunas = COLUNAS_MERCADO
+        resultado = []
+        for coluna in colunas:
+            if coluna not in self.arrays:
+                return None
+            for c in [coluna] + COLUNAS_DERIVADAS.get(coluna, []):
+                if c not in resultado:
+                    resultado.append(c)
+        return resultado
+
+    def _serie(self, coluna: str, indices: Optional[np.ndarray] = None):
+        dados = self.arrays[coluna]
+        if indices is not None:
+            dados = dados[indices]
+        if coluna in self.categorias:
+            return pd.Categorical.from_codes(dados, categories=self.categorias[coluna], validate=False)
+        return dados
+
+    def dataframe(self, colunas: Optional[List[str]] = None,
+                  indices: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """
+        Monta o DataFrame de mercado (esquema compacto) sobre os arrays mapeados.
+        Sem 'indices' nenhum dado é copiado: as colunas apontam para o page cache.
+
+        Args:
+            colunas: Colunas do resultado (None = todas)
+            indices: Posições das linhas a materializar (None = todas, sem cópia)
+        """
+        colunas = colunas or list(self.arrays)
+        df = pd.DataFrame({coluna: self._serie(coluna, indices) for coluna in colunas}, copy=False)
+        df.attrs["digitos_cnpj"] = self.manifesto["digitos_cnpj"]
+        return df
+
+    def mascara(self, filtros: Optional[Dict] = None) -> Optional[np.ndarray]:
+        """
+        Converte os filtros (mesma especificação de leitura_receita) em uma máscara de linhas.
+        Colunas category são filtradas pelos códigos; o prefixo do CNAE vira um intervalo.
+        Filtros de colunas inexistentes na base são ignorados. Retorna None sem filtros.
+        """
+        mascara = None
+        for coluna, valores in (filtros or {}).items():
+            if coluna not in self.arrays:
+                continue
+            valores = como_lista(valores)
+            dados = self.arrays[coluna]
+            if coluna in self.categorias:
+                categorias = self.categorias[coluna]
+                if coluna in COLUNAS_PREFIXO:
+                    aceitos = categorias.astype(str).str.startswith(tuple(valores))
+                else:
+                    aceitos = categorias.isin(valores)
+                # Último elemento = False, para os códigos nulos (-1)
+                m = np.append(np.asarray(aceitos, dtype=bool), False)[dados]
+            elif coluna in COLUNAS_PREFIXO:
+                m = np.zeros(len(dados), dtype=bool)
+                for prefixo in valores:
+                    if not prefixo.isdigit() or len(prefixo) > DIGITOS_CNAE:
+                        continue
+                    escala = 10 ** (DIGITOS_CNAE - len(prefixo))
+                    m |= (dados >= int(prefixo) * escala) & (dados < (int(prefixo) + 1) * escala)
+            else:
+                numeros = pd.to_numeric(pd.Series(valores).str.replace(r"\D", "", regex=True), errors="coerce")
+                m = np.isin(dados, numeros.dropna().astype(dados.dtype).to_numpy())
+            mascara = m if mascara is None else mascara & m
+        return mascara
+
+    def filtrar(self, filtros: Optional[Dict] = None, colunas: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Recorte do mercado com os filtros aplicados. Sem filtros, retorna o
+        DataFrame mapeado (sem cópia); com filtros, só as linhas mantidas são copiadas.
+        """
+        mascara = self.mascara(filtros)
+        if mascara is None:
+            return self.dataframe(colunas)
+        return self.dataframe(colunas, np.flatnonzero(mascara))
+
+
+_base_carregada: Optional[BaseMapeada] = None
+
+
+def base_mapeada_valida(diretorio: str = DIRETORIO_BASE_MAPEADA,
+                        caminho_csv: str = CAMINHO_CSV_RECEITA,
+                        diretorio_base: str = DIRETORIO_BASE_COLUNAR) -> bool:
+    """
+    Verifica se a base mapeada existe e foi exportada da versão atual da base
+    e do esquema atual.
+    """
+    manifesto = ler_manifesto_mapeada(diretorio)
+    if manifesto is None or manifesto.get("esquema") != VERSAO_ESQUEMA:
+        return False
+    if not os.path.exists(caminho_csv) and ler_manifesto(diretorio_base) is None:
+        return True  # Sem fonte para comparar: a base mapeada é a única referência disponível
+    return manifesto.get("fonte") == fingerprint_fonte(caminho_csv, diretorio_base)
+
+
+def obter_base_mapeada(diretorio: str = DIRETORIO_BASE_MAPEADA,
+                       caminho_csv: str = CAMINHO_CSV_RECEITA,
+                       diretorio_base: str = DIRETORIO_BASE_COLUNAR) -> Optional[BaseMapeada]:
+    """
+    Retorna a base mapeada aberta uma única vez por processo (reabre se for regravada).
+    Retorna None se não existir ou estiver desatualizada em relação à base.
+    Aberta antes do fork (ex: preload_app do gunicorn) ou em cada worker, as
+    páginas são as mesmas do page cache.
+    """
+    global _base_carregada
+    if not base_mapeada_valida(diretorio, caminho_csv, diretorio_base):
+        return None
+    if (_base_carregada is None or _base_carregada.diretorio != diretorio
+            or _base_carregada.desatualizado()):
+        _base_carregada = BaseMapeada(diretorio)
+    return _base_carregada
+
+
+if __name__ == "__main__":
+    exportar_base_mapeada()
@@ -0,0 +1,196 @@
+"""
+Cache de resultados de consultas à base da Receita Federal.
+
+Dois níveis:
+    - memória: LRU por processo com orçamento em bytes;
+    - disco: arquivos Parquet em scr/data/cache_mercado, compartilhados entre
+      processos (ex: workers do gunicorn) e entre reinícios da aplicação.
+
+A chave é um hash da consulta normalizada (filtros ordenados, valores como
+texto) combinada com a impressão digital da fonte de dados, então uma nova
+versão do CSV/base colunar nunca reaproveita resultados antigos.
+"""
+
+import os
+import json
+import glob
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, List
+
+import pandas as pd
+
+DIRETORIO_CACHE = "scr/data/cache_mercado"
+LIMITE_MEMORIA_BYTES = 512 * 1024 ** 2
+LIMITE_DISCO_BYTES = 4 * 1024 ** 3
+
+
+def normalizar_consulta(filtros: Optional[Dict] = None,
+                        colunas: Optional[List[str]] = None,
+                        **extras) -> Dict:
+    """
+    Gera uma representação canônica da consulta, independente da ordem
+    das chaves/valores e do tipo (lista, tupla, escalar) usado nos filtros.
+    """
+    filtros_norm = {}
+    for coluna, valores in (filtros or {}).items():
+        if isinstance(valores, (list, tuple, set)):
+            filtros_norm[str(coluna)] = sorted(str(v) for v in valores)
+        else:
+            filtros_norm[str(coluna)] = [str(valores)]
+    return {
+        "filtros": dict(sorted(filtros_norm.items())),
+        "colunas": sorted(colunas) if colunas is not None else None,
+        **{k: v for k, v in sorted(extras.items()) if v is not None}
+    }
+
+
+def gerar_chave(consulta: Dict, fingerprint: Dict) -> str:
+    """Hash SHA-256 da consulta normalizada + impressão digital da fonte."""
+    conteudo = json.dumps({"consulta": consulta, "fonte": fingerprint}, sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+class CacheMercado:
+    def __init__(self,
+                 diretorio: str = DIRETORIO_CACHE,
+                 limite_memoria_bytes: int = LIMITE_MEMORIA_BYTES,
+                 limite_disco_bytes: int = LIMITE_DISCO_BYTES):
+        self.diretorio = diretorio
+        self.limite_memoria_bytes = limite_memoria_bytes
+        self.limite_disco_bytes = limite_disco_bytes
+        self._memoria = OrderedDict()  # chave -> (DataFrame, bytes)
+        self._bytes_memoria = 0
+        self._lock = threading.Lock()
+        self.contadores = {"hits_memoria": 0, "hits_disco": 0, "misses": 0, "evictions": 0}
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, f"{chave}.parquet")
+
+    def obter(self, chave: str) -> Optional[pd.DataFrame]:
+        """
+        Busca um resultado no cache (memória e depois disco).
+        Retorna uma cópia rasa, para que alterações de colunas feitas pelo chamador
+        não afetem a entrada armazenada.
+        """
+        with self._lock:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                self.contadores["hits_memoria"] += 1
+                return self._memoria[chave][0].copy(deep=False)
+
+        caminho = self._caminho(chave)
+        if os.path.exists(caminho):
+            try:
+                df = pd.read_parquet(caminho)
+                os.utime(caminho)  # Marca como usado recentemente para a limpeza do disco
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Entrada de cache corrompida, ignorando: {e}")
+            else:
+                with self._lock:
+                    self.contadores["hits_disco"] += 1
+                    self._guardar_memoria(chave, df)
+                return df.copy(deep=False)
+
+        with self._lock:
+            self.contadores["misses"] += 1
+        return None
+
+    def guardar(self, chave: str, df: pd.DataFrame):
+        """
+        Armazena um resultado na memória e no disco. A memória guarda uma cópia
+        rasa, para que o chamador possa continuar alterando as colunas de df.
+        """
+        with self._lock:
+            self._guardar_memoria(chave, df.copy(deep=False))
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = self._caminho(chave)
+        caminho_tmp = f"{caminho}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(caminho_tmp, index=False)
+            os.replace(caminho_tmp, caminho)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Não foi possível gravar o cache em disco: {e}")
+            if os.path.exists(caminho_tmp):
+                os.remove(caminho_tmp)
+            return
+        self._limpar_disco()
+
+    def _guardar_memoria(self, chave: str, df: pd.DataFrame):
+        """Insere na LRU e remove as entradas menos usadas até caber no orçamento."""
+        tamanho = int(df.memory_usage(deep=True).sum())
+        if tamanho > self.limite_memoria_bytes:
+            return
+        if chave in self._memoria:
+            self._bytes_memoria -= self._memoria.pop(chave)[1]
+        self._memoria[chave] = (df, tamanho)
+        self._bytes_memoria += tamanho
+        while self._bytes_memoria > self.limite_memoria_bytes:
+            _, (_, tamanho_removido) = self._memoria.popitem(last=False)
+            self._bytes_memoria -= tamanho_removido
+            self.contadores["evictions"] += 1
+
+    def _limpar_disco(self):
+        """Remove os arquivos usados há mais tempo até caber no orçamento de disco."""
+        arquivos = []
+        for caminho in glob.glob(os.path.join(self.diretorio, "*.parquet")):
+            try:
+                stat = os.stat(caminho)
+            except OSError:
+                continue  # Removido por outro processo
+            arquivos.append((stat.st_mtime, stat.st_size, caminho))
+
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        removidos = 0
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.limite_disco_bytes:
+                break
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+            total -= tamanho
+            removidos += 1
+        if removidos:
+            with self._lock:
+                self.contadores["evictions"] += removidos
+
+    def invalidar(self, chave: Optional[str] = None):
+        """
+        Remove uma entrada específica ou, sem argumentos, todo o cache (memória e disco).
+        """
+        with self._lock:
+            if chave is not None:
+                entrada = self._memoria.pop(chave, None)
+                if entrada is not None:
+                    self._bytes_memoria -= entrada[1]
+                caminhos = [self._caminho(chave)]
+            else:
+                self._memoria.clear()
+                self._bytes_memoria = 0
+                caminhos = glob.glob(os.path.join(self.diretorio, "*.parquet"))
+
+        for caminho in caminhos:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+    def estatisticas(self) -> Dict:
+        """Retorna contadores de acerto/erro e ocupação do cache."""
+        with self._lock:
+            hits = self.contadores["hits_memoria"] + self.contadores["hits_disco"]
+            total = hits + self.contadores["misses"]
+            return {
+                **self.contadores,
+                "taxa_acerto": hits / total if total else 0.0,
+                "entradas_memoria": len(self._memoria),
+                "bytes_memoria": self._bytes_memoria,
+                "limite_memoria_bytes": self.limite_memoria_bytes
+            }
+
+
+# Instância compartilhada por todo o processo (todas as instâncias de DadosMercado)
+cache_mercado = CacheMercado()
@@ -0,0 +1,194 @@
+"""
+Cubo pré-agregado de TAM (quantidade de estabelecimentos) da Receita Federal.
+
+O tamanho do mercado por localidade e atividade só muda quando uma nova base
+da Receita é publicada, então ele é calculado uma vez na ingestão e gravado ao
+lado da base (scr/data/cubo_mercado.parquet), no grão mais fino:
+
+    regiao > uf > municipio        (hierarquia geográfica)
+    cnae_divisao > cnae_grupo      (hierarquia de atividade, 2 e 3 dígitos)
+
+Consultas de TAM viram roll-ups (groupby + soma) sobre o cubo, que tem ordens
+de grandeza menos linhas que a base de estabelecimentos.
+"""
+
+import os
+import json
+from datetime import datetime
+from typing import Optional, Dict, List
+
+import pandas as pd
+
+from domain.servicos.base_colunar import (
+    CAMINHO_CSV_RECEITA,
+    DIRETORIO_BASE_COLUNAR,
+    fingerprint_fonte,
+    iterar_lotes,
+    ler_manifesto
+)
+from domain.servicos.leitura_receita import como_lista
+from domain.servicos.tabelas_mercado import REGIAO_POR_UF
+
+CAMINHO_CUBO = "scr/data/cubo_mercado.parquet"
+
+NIVEIS_GEOGRAFICOS = ["regiao", "uf", "municipio"]
+NIVEIS_ATIVIDADE = ["cnae_divisao", "cnae_grupo"]
+NIVEIS_CUBO = NIVEIS_GEOGRAFICOS + NIVEIS_ATIVIDADE
+
+
+def agregar_estabelecimentos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Conta estabelecimentos no grão do cubo a partir de linhas com uf, municipio e cnae.
+    """
+    cnae = df["cnae"].astype(str)
+    chaves = pd.DataFrame({
+        "uf": df["uf"].astype(object),
+        "municipio": df["municipio"].astype(object),
+        "cnae_divisao": cnae.str[:2],
+        "cnae_grupo": cnae.str[:3],
+    })
+    return chaves.groupby(list(chaves.columns), dropna=False).size().rename("TAM").reset_index()
+
+
+def construir_cubo_mercado(caminho_csv: str = CAMINHO_CSV_RECEITA,
+                           diretorio_base: str = DIRETORIO_BASE_COLUNAR,
+                           caminho_cubo: str = CAMINHO_CUBO,
+                           chunk_size: int = 1000000) -> pd.DataFrame:
+    """
+    Agrega a base de estabelecimentos no cubo e grava em Parquet.
+    A agregação é feita lote a lote, então a memória usada é proporcional ao
+    tamanho do cubo, não ao da base.
+    """
+    print("🔄 Construindo cubo de mercado...")
+    fingerprint = fingerprint_fonte(caminho_csv, diretorio_base)
+
+    parciais = []
+    for i, lote in enumerate(iterar_lotes(["uf", "municipio", "cnae"], caminho_csv, diretorio_base, chunk_size), start=1):
+        parciais.append(agregar_estabelecimentos(lote))
+        # Compacta periodicamente para limitar a memória
+        if len(parciais) >= 20:
+            parciais = [somar_cubos(parciais)]
+        if i % 10 == 0:
+            print(f"📊 Processados {i} lotes...")
+
+    cubo = somar_cubos(parciais) if parciais else pd.DataFrame(columns=NIVEIS_CUBO + ["TAM"])
+    cubo["regiao"] = cubo["uf"].map(REGIAO_POR_UF)
+    cubo = cubo[NIVEIS_CUBO + ["TAM"]]
+
+    salvar_cubo(cubo, caminho_cubo, fingerprint)
+    print(f"✅ Cubo gerado em {caminho_cubo}: {len(cubo):,} células, {int(cubo['TAM'].sum()):,} estabelecimentos")
+    return cubo
+
+
+def somar_cubos(cubos: List[pd.DataFrame]) -> pd.DataFrame:
+    """Soma cubos parciais (mesmas chaves são consolidadas)."""
+    chaves = ["uf", "municipio", "cnae_divisao", "cnae_grupo"]
+    return (pd.concat(cubos, ignore_index=True)
+            .groupby(chaves, dropna=False, observed=True)["TAM"].sum()
+            .reset_index())
+
+
+def aplicar_delta_cubo(cubo: pd.DataFrame,
+                       adicionadas: List[pd.DataFrame],
+                       removidas: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Atualiza o cubo com agregados (ver agregar_estabelecimentos) das linhas
+    acrescentadas e removidas da base, sem reler a base inteira.
+    """
+    negativas = [r.assign(TAM=-r["TAM"]) for r in removidas]
+    chaves = ["uf", "municipio", "cnae_divisao", "cnae_grupo"]
+    cubo = somar_cubos([cubo[chaves + ["TAM"]]] + adicionadas + negativas)
+    cubo = cubo[cubo["TAM"] != 0].reset_index(drop=True)
+    cubo["regiao"] = cubo["uf"].map(REGIAO_POR_UF)
+    return cubo[NIVEIS_CUBO + ["TAM"]]
+
+
+def salvar_cubo(cubo: pd.DataFrame, caminho_cubo: str, fingerprint: Dict):
+    """Grava o cubo e a versão da fonte de onde ele foi calculado."""
+    os.makedirs(os.path.dirname(caminho_cubo) or ".", exist_ok=True)
+    caminho_tmp = caminho_cubo + ".tmp"
+    cubo.to_parquet(caminho_tmp, index=False)
+    os.replace(caminho_tmp, caminho_cubo)
+    with open(caminho_cubo + ".json", "w") as f:
+        json.dump({"fonte": fingerprint, "criado_em": datetime.now().isoformat(timespec="seconds")}, f, indent=2)
+
+
+def cubo_valido(caminho_cubo: str = CAMINHO_CUBO,
+                caminho_csv: str = CAMINHO_CSV_RECEITA,
+                diretorio_base: str = DIRETORIO_BASE_COLUNAR) -> bool:
+    """
+    Verifica se o cubo existe e foi calculado a partir da versão atual da base.
+    """
+    if not os.path.exists(caminho_cubo) or not os.path.exists(caminho_cubo + ".json"):
+        return False
+    if not os.path.exists(caminho_csv) and ler_manifesto(diretorio_base) is None:
+        return True  # Sem fonte para comparar: o cubo é a única referência disponível
+    with open(caminho_cubo + ".json", "r") as f:
+        metadados = json.load(f)
+    return metadados.get("fonte") == fingerprint_fonte(caminho_csv, diretorio_base)
+
+
+class CuboMercado:
+    def __init__(self, caminho_cubo: str = CAMINHO_CUBO):
+        self.caminho_cubo = caminho_cubo
+        self.cubo = pd.read_parquet(caminho_cubo)
+        self._mtime = os.path.getmtime(caminho_cubo)
+
+    def desatualizado(self) -> bool:
+        """Indica se o arquivo do cubo foi regravado depois de carregado."""
+        return os.path.getmtime(self.caminho_cubo) != self._mtime
+
+    def filtrar(self, filtros: Optional[Dict] = None) -> pd.DataFrame:
+        """
+        Restringe o cubo a valores de qualquer nível (ex: {'regiao': ['Sul'], 'cnae_divisao': ['62']}).
+        """
+        cubo = self.cubo
+        for nivel, valores in (filtros or {}).items():
+            if nivel not in NIVEIS_CUBO:
+                raise ValueError(f"Nível inexistente no cubo: {nivel}")
+            cubo = cubo[cubo[nivel].isin(como_lista(valores))]
+        return cubo
+
+    def agregar(self, niveis: List[str], filtros: Optional[Dict] = None) -> pd.DataFrame:
+        """
+        Roll-up do TAM para os níveis pedidos.
+
+        Drill-down é a mesma operação com um nível a mais e o nível pai nos filtros,
+        ex: agregar(['uf']) -> agregar(['uf', 'municipio'], {'uf': ['SP']}).
+
+        Args:
+            niveis: Níveis do resultado (subconjunto de NIVEIS_CUBO)
+            filtros: Restrição por valores de qualquer nível
+        """
+        invalidos = [n for n in niveis if n not in NIVEIS_CUBO]
+        if invalidos:
+            raise ValueError(f"Níveis inexistentes no cubo: {invalidos}")
+        cubo = self.filtrar(filtros)
+        if not niveis:
+            return pd.DataFrame({"TAM": [int(cubo["TAM"].sum())]})
+        return (cubo.groupby(niveis, dropna=False, observed=True)["TAM"].sum()
+                .reset_index()
+                .sort_values("TAM", ascending=False, ignore_index=True))
+
+
+_cubo_carregado: Optional[CuboMercado] = None
+
+
+def obter_cubo(caminho_cubo: str = CAMINHO_CUBO,
+               caminho_csv: str = CAMINHO_CSV_RECEITA,
+               diretorio_base: str = DIRETORIO_BASE_COLUNAR) -> Optional[CuboMercado]:
+    """
+    Retorna o cubo carregado uma única vez por processo (recarrega se o arquivo mudar).
+    Retorna None se o cubo não existir ou estiver desatualizado em relação à base.
+    """
+    global _cubo_carregado
+    if not cubo_valido(caminho_cubo, caminho_csv, diretorio_base):
+        return None
+    if (_cubo_carregado is None or _cubo_carregado.caminho_cubo != caminho_cubo
+            or _cubo_carregado.desatualizado()):
+        _cubo_carregado = CuboMercado(caminho_cubo)
+    return _cubo_carregado
+
+
+if __name__ == "__main__":
+    construir_cubo_mercado()
@@ -4,144 +4,53 @@ import requests
 from typing import Optional, List, Dict
 import numpy as np
 
+from domain.servicos.base_colunar import (
+    DIRETORIO_BASE_COLUNAR,
+    base_colunar_valida,
+    carregar_base_colunar,
+    construir_base_colunar,
+    fingerprint_fonte
+)
+from domain.servicos.tiers import rotulos_padrao, tiers_por_posicao
+from domain.servicos.tamsamsom import contar_por_grupo
+from domain.servicos.tabelas_mercado import DESCRICAO_CNAE_PADRAO, DESCRICAO_POR_DIVISAO_CNAE, UFS_POR_REGIAO
+from domain.servicos.atualizacao_receita import atualizar_base
+from domain.servicos.base_mapeada import DIRETORIO_BASE_MAPEADA, exportar_base_mapeada, obter_base_mapeada
+from domain.servicos.ingestao_receita import DIRETORIO_ORIGEM
+from domain.servicos.cubo_mercado import CAMINHO_CUBO, NIVEIS_CUBO, construir_cubo_mercado, obter_cubo
+from domain.servicos.indice_cnpj import (
+    CAMINHO_INDICE_CNPJ,
+    IndiceCNPJ,
+    construir_indice_mercado,
+    formatar_cnpj,
+    normalizar_cnpj,
+    obter_indice_mercado
+)
+from domain.servicos.cache_mercado import CacheMercado, cache_mercado, gerar_chave, normalizar_consulta
+from domain.servicos.esquema_mercado import (
+    VERSAO_ESQUEMA,
+    compactar_mercado,
+    digitos_cnpj,
+    descricao_cnae,
+    divisao_cnae,
+    enriquecer_mercado,
+    uso_memoria
+)
+from domain.servicos.leitura_receita import COLUNAS_MERCADO, COLUNAS_TAM_SAM_SOM, ler_csv_receita
+
 class DadosMercado:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, cache: Optional[CacheMercado] = None):
         self.api_key = api_key
         self.endpoint = "https://api.econodata.com.br/v1/empresas"  # Exemplo real
         self.caminho_receita = "scr/data/cnpjs_receita_final.csv"
-        self._cache_dados = {}  # Cache para dados já carregados
-        
-        # Descrições completas dos CNAEs (baseada na classificação oficial da Receita Federal)
-        self.descricoes_cnae = {
-            # Seção A - Agricultura, Pecuária e Serviços Relacionados
-            '01': 'Agricultura, Pecuária e Serviços Relacionados',
-            '02': 'Produção Florestal',
-            '03': 'Pesca e Aquicultura',
-            
-            # Seção B - Indústrias Extrativas
-            '05': 'Extração de Carvão Mineral',
-            '06': 'Extração de Petróleo e Gás Natural',
-            '07': 'Extração de Minerais Metálicos',
-            '08': 'Extração de Minerais Não-Metálicos',
-            '09': 'Atividades de Apoio à Extração',
-            
-            # Seção C - Indústrias de Transformação
-            '10': 'Fabricação de Produtos Alimentícios',
-            '11': 'Fabricação de Bebidas',
-            '12': 'Fabricação de Produtos do Fumo',
-            '13': 'Fabricação de Produtos Têxteis',
-            '14': 'Confecção de Artigos do Vestuário',
-            '15': 'Curtimento e Fabricação de Artigos de Couro',
-            '16': 'Fabricação de Produtos de Madeira',
-            '17': 'Fabricação de Papel e Produtos de Papel',
-            '18': 'Impressão e Reprodução de Gravações',
-            '19': 'Fabricação de Produtos de Petróleo',
-            '20': 'Fabricação de Produtos Químicos',
-            '21': 'Fabricação de Produtos Farmacêuticos',
-            '22': 'Fabricação de Produtos de Borracha e Plástico',
-            '23': 'Fabricação de Produtos de Minerais Não-Metálicos',
-            '24': 'Metalurgia',
-            '25': 'Fabricação de Produtos de Metal',
-            '26': 'Fabricação de Equipamentos de Informática',
-            '27': 'Fabricação de Equipamentos Elétricos',
-            '28': 'Fabricação de Máquinas e Equipamentos',
-            '29': 'Fabricação de Veículos Automotores',
-            '30': 'Fabricação de Outros Equipamentos de Transporte',
-            '31': 'Fabricação de Móveis',
-            '32': 'Fabricação de Produtos Diversos',
-            '33': 'Manutenção e Reparação de Máquinas',
-            
-            # Seção D - Eletricidade, Gás e Outras Utilidades
-            '35': 'Eletricidade, Gás e Outras Utilidades',
-            
-            # Seção E - Água, Esgoto e Gestão de Resíduos
-            '36': 'Captação, Tratamento e Distribuição de Água',
-            '37': 'Esgoto',
-            '38': 'Coleta, Tratamento e Disposição de Resíduos',
-            '39': 'Descontaminação e Outros Serviços',
-            
-            # Seção F - Construção
-            '41': 'Construção de Edifícios',
-            '42': 'Obras de Infraestrutura',
-            '43': 'Serviços Especializados para Construção',
-            
-            # Seção G - Comércio e Reparação
-            '45': 'Comércio e Reparação de Veículos',
-            '46': 'Comércio por Atacado',
-            '47': 'Comércio Varejista',
-            
-            # Seção H - Transporte e Armazenagem
-            '49': 'Transporte Terrestre',
-            '50': 'Transporte Aquaviário',
-            '51': 'Transporte Aéreo',
-            '52': 'Armazenagem e Atividades Auxiliares',
-            '53': 'Correio e Outras Atividades de Entrega',
-            
-            # Seção I - Hospedagem e Alimentação
-            '55': 'Hospedagem',
-            '56': 'Alimentação',
-            
-            # Seção J - Informação e Comunicação
-            '58': 'Edição',
-            '59': 'Atividades Cinematográficas',
-            '60': 'Atividades de Rádio e Televisão',
-            '61': 'Telecomunicações',
-            '62': 'Atividades dos Serviços de TI',
-            '63': 'Atividades de Prestação de Serviços de Informação',
-            
-            # Seção K - Atividades Financeiras e Seguros
-            '64': 'Atividades de Serviços Financeiros',
-            '65': 'Seguros, Previdência e Planos de Saúde',
-            '66': 'Atividades Auxiliares dos Serviços Financeiros',
-            
-            # Seção L - Atividades Imobiliárias
-            '68': 'Atividades Imobiliárias',
-            
-            # Seção M - Atividades Profissionais e Técnicas
-            '69': 'Atividades Jurídicas e Contabilidade',
-            '70': 'Atividades de Consultoria em Gestão',
-            '71': 'Serviços de Arquitetura e Engenharia',
-            '72': 'Pesquisa e Desenvolvimento',
-            '73': 'Publicidade e Pesquisa de Mercado',
-            '74': 'Outras Atividades Profissionais',
-            '75': 'Atividades Veterinárias',
-            
-            # Seção N - Atividades Administrativas
-            '77': 'Aluguel de Máquinas e Equipamentos',
-            '78': 'Seleção e Agenciamento de Mão de Obra',
-            '79': 'Agências de Viagens e Organizadores de Eventos',
-            '80': 'Atividades de Vigilância e Segurança',
-            '81': 'Serviços para Edifícios e Paisagismo',
-            '82': 'Serviços de Escritório e Apoio Administrativo',
-            
-            # Seção O - Administração Pública
-            '84': 'Administração Pública',
-            
-            # Seção P - Educação
-            '85': 'Educação',
-            
-            # Seção Q - Saúde Humana e Serviços Sociais
-            '86': 'Atividades de Atenção à Saúde Humana',
-            '87': 'Atividades de Atenção à Saúde Integrada',
-            '88': 'Atividades de Assistência Social',
-            
-            # Seção R - Artes, Cultura e Recreação
-            '90': 'Atividades Criativas, Artísticas e Espetáculos',
-            '91': 'Atividades Culturais',
-            '92': 'Atividades de Lazer e Esporte',
-            '93': 'Atividades Associativas',
-            
-            # Seção S - Outras Atividades de Serviços
-            '94': 'Atividades de Organizações Associativas',
-            '95': 'Reparação de Computadores e Objetos Pessoais',
-            '96': 'Outras Atividades de Serviços Pessoais',
-            
-            # Seção T - Serviços Domésticos
-            '97': 'Serviços Domésticos',
-            
-            # Seção U - Organizações Internacionais
-            '99': 'Organizações Internacionais'
-        }
+        self.caminho_base_colunar = DIRETORIO_BASE_COLUNAR
+        self.caminho_cubo = CAMINHO_CUBO
+        self.caminho_indice_cnpj = CAMINHO_INDICE_CNPJ
+        self.caminho_base_mapeada = DIRETORIO_BASE_MAPEADA
+        self.cache = cache if cache is not None else cache_mercado  # Compartilhado pelo processo
+        self.estatisticas_leitura = {}  # Linhas lidas x mantidas na última leitura
+        
+        self.descricoes_cnae = DESCRICAO_POR_DIVISAO_CNAE
 
     def obter_descricao_cnae(self, cnae) -> str:
         """
@@ -150,86 +59,181 @@ class DadosMercado:
         # Converter para string e garantir que tenha pelo menos 2 dígitos
         cnae_str = str(cnae).zfill(2)
         cnae_2dig = cnae_str[:2]
-        return self.descricoes_cnae.get(cnae_2dig, 'Outros')
+        return self.descricoes_cnae.get(cnae_2dig, DESCRICAO_CNAE_PADRAO)
 
     def carregar_dados_receita_federal(self, 
                                      filtros: Optional[Dict] = None, 
                                      chunk_size: int = 10000,
-                                     max_chunks: Optional[int] = None) -> pd.DataFrame:
+                                     max_chunks: Optional[int] = None,
+                                     colunas: Optional[List[str]] = None) -> pd.DataFrame:
         """
         Carrega dados da Receita Federal de forma otimizada.
         
+        Se a base colunar (ver construir_base_colunar) existir e estiver atualizada
+        em relação ao CSV, lê apenas as partições de UF/CNAE necessárias; caso
+        contrário, faz a leitura do CSV em lotes. Em ambos os casos os filtros são
+        avaliados durante a leitura e apenas as colunas pedidas são materializadas.
+        O resultado usa o esquema compacto (ver esquema_mercado): cnpj/cnae inteiros
+        e colunas de texto como category.
+        Se a base mapeada em memória (ver base_mapeada) estiver atualizada e tiver as
+        colunas pedidas, ela é usada no lugar das anteriores: sem filtros o resultado
+        aponta para os arquivos mapeados (compartilhados entre processos, sem cópia).
+        As estatísticas da última leitura ficam em self.estatisticas_leitura.
+        
         Args:
-            filtros: Dicionário com filtros (ex: {'uf': ['SP', 'RJ'], 'cnae': ['62']})
+            filtros: Dicionário com filtros (ex: {'uf': ['SP', 'RJ'], 'cnae': ['62'], 'situacao': '02'}).
+                Listas viram isin, valores únicos viram igualdade e 'cnae' é filtrado por prefixo.
             chunk_size: Tamanho de cada chunk para processamento
-            max_chunks: Número máximo de chunks a processar (None = todos)
+            max_chunks: Número máximo de chunks lidos do arquivo (None = todos, ignorado na base colunar)
+            colunas: Colunas a carregar (None = COLUNAS_MERCADO, sem razao_social; ex: COLUNAS_TAM_SAM_SOM)
         
         Returns:
             DataFrame com dados filtrados
         """
-        if not os.path.exists(self.caminho_receita):
+        usar_base_colunar = base_colunar_valida(self.caminho_base_colunar, self.caminho_receita)
+        
+        if not usar_base_colunar and not os.path.exists(self.caminho_receita):
             print(f"⚠️ Arquivo da Receita Federal não encontrado: {self.caminho_receita}")
             print("📊 Usando dados de exemplo para demonstração...")
-            # Limpar cache para forçar uso de dados de exemplo
-            self._cache_dados.clear()
             return self._gerar_dados_exemplo()
         
-        print(f"Carregando dados da Receita Federal: {self.caminho_receita}")
-        
-        # Criar chave de cache baseada nos filtros
-        cache_key = str(filtros) + str(chunk_size) + str(max_chunks)
-        if cache_key in self._cache_dados:
+        if colunas is None:
+            colunas = COLUNAS_MERCADO
+        
+        if max_chunks is None:
+            df = self._carregar_base_mapeada(filtros, colunas)
+            if df is not None:
+                return df
+        
+        # Criar chave de cache baseada na consulta normalizada e na versão da fonte
+        # (chunk_size só altera o resultado quando max_chunks limita a leitura)
+        consulta = normalizar_consulta(
+            filtros, colunas,
+            esquema=VERSAO_ESQUEMA,
+            max_chunks=max_chunks if not usar_base_colunar else None,
+            chunk_size=chunk_size if max_chunks and not usar_base_colunar else None
+        )
+        cache_key = gerar_chave(consulta, fingerprint_fonte(self.caminho_receita, self.caminho_base_colunar))
+        df = self.cache.obter(cache_key)
+        if df is not None:
             print("📦 Usando dados do cache...")
-            return self._cache_dados[cache_key]
-        
-        chunks = []
-        chunk_count = 0
-        
-        # Ler arquivo em chunks
-        for chunk in pd.read_csv(self.caminho_receita, dtype=str, chunksize=chunk_size):
-            # Aplicar filtros se especificados
-            if filtros:
-                for coluna, valores in filtros.items():
-                    if coluna in chunk.columns:
-                        chunk = chunk[chunk[coluna].isin(valores)]
-            
-            if len(chunk) > 0:
-                chunks.append(chunk)
-                chunk_count += 1
-                
-                if max_chunks and chunk_count >= max_chunks:
-                    break
-                
-                if chunk_count % 10 == 0:
-                    print(f"📊 Processados {chunk_count} chunks...")
-        
-        if not chunks:
+            return df
+        
+        if usar_base_colunar:
+            print(f"Carregando dados da base colunar: {self.caminho_base_colunar}")
+            df, self.estatisticas_leitura = carregar_base_colunar(filtros, self.caminho_base_colunar, colunas)
+        else:
+            print(f"Carregando dados da Receita Federal: {self.caminho_receita}")
+            df, self.estatisticas_leitura = ler_csv_receita(
+                self.caminho_receita, filtros, colunas, chunk_size, max_chunks
+            )
+        
+        if df.empty:
             print("⚠️ Nenhum dado encontrado com os filtros especificados")
             return pd.DataFrame()
         
-        # Concatenar chunks
-        df = pd.concat(chunks, ignore_index=True)
-        
-        # Adicionar coluna regiao baseada na UF
-        regioes = {
-            'SP': 'Sudeste', 'RJ': 'Sudeste', 'MG': 'Sudeste', 'ES': 'Sudeste',
-            'RS': 'Sul', 'SC': 'Sul', 'PR': 'Sul',
-            'GO': 'Centro-Oeste', 'MT': 'Centro-Oeste', 'MS': 'Centro-Oeste', 'DF': 'Centro-Oeste',
-            'BA': 'Nordeste', 'PE': 'Nordeste', 'CE': 'Nordeste', 'MA': 'Nordeste', 
-            'PB': 'Nordeste', 'RN': 'Nordeste', 'AL': 'Nordeste', 'SE': 'Nordeste', 'PI': 'Nordeste',
-            'AM': 'Norte', 'PA': 'Norte', 'AC': 'Norte', 'RO': 'Norte', 'RR': 'Norte', 'AP': 'Norte', 'TO': 'Norte'
-        }
-        df['regiao'] = df['uf'].map(regioes)
-        
-        # Adicionar descrição do CNAE
-        df['descricao_cnae'] = df['cnae'].apply(self.obter_descricao_cnae)
+        memoria_antes = uso_memoria(df)
+        df = compactar_mercado(self._enriquecer_dados(df))
+        self.estatisticas_leitura['memoria_bytes_texto'] = memoria_antes
+        self.estatisticas_leitura['memoria_bytes'] = uso_memoria(df)
+        print(f"💾 Memória: {memoria_antes / 1024 ** 2:,.1f} MB -> {self.estatisticas_leitura['memoria_bytes'] / 1024 ** 2:,.1f} MB")
         
         # Salvar no cache
-        self._cache_dados[cache_key] = df
+        self.cache.guardar(cache_key, df)
         
-        print(f"✅ Dados carregados: {len(df):,} estabelecimentos (de {chunk_count} chunks)")
+        print(f"✅ Dados carregados: {len(df):,} estabelecimentos ({self.estatisticas_leitura['origem']})")
         return df
 
+    def _carregar_base_mapeada(self, filtros: Optional[Dict], colunas: List[str]) -> Optional[pd.DataFrame]:
+        """
+        Lê o recorte pedido da base mapeada em memória. Retorna None se a base não
+        estiver disponível para a versão atual ou não tiver alguma das colunas.
+        O resultado não vai para o cache: a base já é compartilhada pelo page cache
+        e recortar pelos códigos das categorias custa menos que uma cópia por processo.
+        """
+        base = obter_base_mapeada(self.caminho_base_mapeada, self.caminho_receita, self.caminho_base_colunar)
+        if base is None:
+            return None
+        colunas_base = base.colunas_disponiveis(colunas)
+        if colunas_base is None:
+            return None
+        
+        print(f"Carregando dados da base mapeada: {self.caminho_base_mapeada}")
+        df = base.filtrar(filtros, colunas_base)
+        self.estatisticas_leitura = {
+            'origem': 'mapeada',
+            'linhas_lidas': len(base),
+            'linhas_mantidas': len(df),
+            'lotes_lidos': 0,
+            'seletividade': len(df) / len(base) if len(base) else 0.0
+        }
+        if df.empty:
+            print("⚠️ Nenhum dado encontrado com os filtros especificados")
+            return pd.DataFrame()
+        self.estatisticas_leitura['memoria_bytes'] = uso_memoria(df)
+        print(f"✅ Dados carregados: {len(df):,} estabelecimentos (mapeada)")
+        return df
+
+    def _enriquecer_dados(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Adiciona as colunas derivadas 'regiao', 'cnae_divisao' e 'descricao_cnae'
+        (quando 'uf' e 'cnae' foram carregadas). O mapeamento é feito sobre os
+        valores distintos (ver esquema_mercado.mapear_distintos).
+        """
+        return enriquecer_mercado(df)
+
+    def construir_base_colunar(self, chunk_size: int = 500000) -> Dict:
+        """
+        Gera (ou regenera) a base colunar particionada a partir do CSV da Receita Federal.
+        Deve ser executado uma vez após cada atualização do CSV.
+        """
+        manifesto = construir_base_colunar(self.caminho_receita, self.caminho_base_colunar, chunk_size)
+        self.construir_cubo()
+        self.construir_indice_cnpj()
+        self.construir_base_mapeada()
+        return manifesto
+
+    def atualizar_base_incremental(self, diretorio_origem: str = DIRETORIO_ORIGEM) -> Dict:
+        """
+        Aplica um novo dump da Receita (Estabelecimentos*.zip) à base colunar como uma
+        nova versão, gravando só as linhas alteradas (ver atualizacao_receita).
+        Cubo, índice de CNPJs e base mapeada são atualizados; consultas em cache da versão anterior
+        deixam de ser usadas porque a versão faz parte da chave.
+        """
+        manifesto = atualizar_base(diretorio_origem=diretorio_origem, diretorio=self.caminho_base_colunar,
+                                   caminho_cubo=self.caminho_cubo, caminho_indice=self.caminho_indice_cnpj)
+        self.construir_base_mapeada()
+        return manifesto
+
+    def construir_cubo(self) -> pd.DataFrame:
+        """
+        Gera o cubo pré-agregado de TAM (ver cubo_mercado) a partir da base atual.
+        """
+        return construir_cubo_mercado(self.caminho_receita, self.caminho_base_colunar, self.caminho_cubo)
+
+    def construir_indice_cnpj(self) -> IndiceCNPJ:
+        """
+        Gera o índice de CNPJs do mercado (ver indice_cnpj) a partir da base atual.
+        """
+        return construir_indice_mercado(self.caminho_receita, self.caminho_base_colunar, self.caminho_indice_cnpj)
+
+    def construir_base_mapeada(self) -> Dict:
+        """
+        Exporta a base atual para arquivos mapeados em memória (ver base_mapeada),
+        compartilhados entre os workers do servidor.
+        """
+        return exportar_base_mapeada(self.caminho_receita, self.caminho_base_colunar, self.caminho_base_mapeada)
+
+    def clientes_no_mercado(self, df_clientes: pd.DataFrame) -> Optional[np.ndarray]:
+        """
+        Indica quais clientes existem na base de mercado, consultando o índice persistido.
+        Retorna None se o índice não estiver disponível para a versão atual da base.
+        """
+        indice = obter_indice_mercado(self.caminho_indice_cnpj, self.caminho_receita, self.caminho_base_colunar)
+        if indice is None:
+            return None
+        return indice.contem(df_clientes['cnpj'])
+
     def _gerar_dados_exemplo(self) -> pd.DataFrame:
         """
         Gera dados de exemplo para demonstração quando o arquivo da Receita Federal não está disponível.
@@ -246,57 +250,56 @@ class DadosMercado:
             'situacao': ['ATIVA'] * 1000
         }
         
-        df = pd.DataFrame(dados_exemplo)
-        
-        # Adicionar coluna regiao baseada na UF
-        regioes = {
-            'SP': 'Sudeste', 'RJ': 'Sudeste', 'MG': 'Sudeste', 'ES': 'Sudeste',
-            'RS': 'Sul', 'SC': 'Sul', 'PR': 'Sul',
-            'GO': 'Centro-Oeste', 'MT': 'Centro-Oeste', 'MS': 'Centro-Oeste', 'DF': 'Centro-Oeste',
-            'BA': 'Nordeste', 'PE': 'Nordeste', 'CE': 'Nordeste', 'MA': 'Nordeste', 
-            'PB': 'Nordeste', 'RN': 'Nordeste', 'AL': 'Nordeste', 'SE': 'Nordeste', 'PI': 'Nordeste',
-            'AM': 'Norte', 'PA': 'Norte', 'AC': 'Norte', 'RO': 'Norte', 'RR': 'Norte', 'AP': 'Norte', 'TO': 'Norte'
-        }
-        df['regiao'] = df['uf'].map(regioes)
-        
-        # Adicionar descrição do CNAE
-        df['descricao_cnae'] = df['cnae'].apply(self.obter_descricao_cnae)
+        df = compactar_mercado(self._enriquecer_dados(pd.DataFrame(dados_exemplo)))
         
         print(f"✅ Dados de exemplo gerados: {len(df):,} estabelecimentos")
         return df
 
-    def carregar_dados_por_regiao(self, regioes: List[str], chunk_size: int = 10000) -> pd.DataFrame:
+    def carregar_dados_por_regiao(self, regioes: List[str], chunk_size: int = 10000,
+                                  colunas: Optional[List[str]] = None) -> pd.DataFrame:
         """
         Carrega dados apenas para regiões específicas.
         """
         # Mapear regiões para UFs
-        regiao_uf = {
-            'Sudeste': ['SP', 'RJ', 'MG', 'ES'],
-            'Sul': ['RS', 'SC', 'PR'],
-            'Centro-Oeste': ['GO', 'MT', 'MS', 'DF'],
-            'Nordeste': ['BA', 'PE', 'CE', 'MA', 'PB', 'RN', 'AL', 'SE', 'PI'],
-            'Norte': ['AM', 'PA', 'AC', 'RO', 'RR', 'AP', 'TO']
-        }
-        
         ufs = []
         for regiao in regioes:
-            if regiao in regiao_uf:
-                ufs.extend(regiao_uf[regiao])
+            if regiao in UFS_POR_REGIAO:
+                ufs.extend(UFS_POR_REGIAO[regiao])
         
         return self.carregar_dados_receita_federal(
             filtros={'uf': ufs},
-            chunk_size=chunk_size
+            chunk_size=chunk_size,
+            colunas=colunas
         )
 
-    def carregar_dados_por_cnae(self, cnaes: List[str], chunk_size: int = 10000) -> pd.DataFrame:
+    def carregar_dados_por_cnae(self, cnaes: List[str], chunk_size: int = 10000,
+                                colunas: Optional[List[str]] = None) -> pd.DataFrame:
         """
-        Carrega dados apenas para CNAEs específicos.
+        Carrega dados apenas para CNAEs específicos (filtrados por prefixo).
         """
         return self.carregar_dados_receita_federal(
             filtros={'cnae': cnaes},
-            chunk_size=chunk_size
+            chunk_size=chunk_size,
+            colunas=colunas
         )
 
+    def carregar_razao_social(self, df_mercado: pd.DataFrame) -> pd.Series:
+        """
+        Carrega sob demanda a razão social dos estabelecimentos de um recorte do mercado
+        (a coluna não faz parte do DataFrame de mercado padrão).
+        
+        Returns:
+            Série alinhada ao índice de df_mercado
+        """
+        digitos = digitos_cnpj(df_mercado)
+        chaves, _ = normalizar_cnpj(df_mercado['cnpj'], digitos)
+        cnpjs = formatar_cnpj(np.unique(chaves), digitos).tolist()
+        df = self.carregar_dados_receita_federal(filtros={'cnpj': cnpjs}, colunas=['cnpj', 'razao_social'])
+        if df.empty or 'razao_social' not in df.columns:
+            return pd.Series(None, index=df_mercado.index, dtype=object, name='razao_social')
+        razoes = df.drop_duplicates('cnpj').set_index('cnpj')['razao_social']
+        return pd.Series(razoes.reindex(chaves).to_numpy(), index=df_mercado.index, name='razao_social')
+
     def carregar_dados_econodata(self, params: dict) -> pd.DataFrame:
         """
         Método legado - agora usa dados da Receita Federal
@@ -306,53 +309,41 @@ class DadosMercado:
     def cruzar_dados_mercado(self, df_mercado: pd.DataFrame, df_clientes: pd.DataFrame) -> pd.DataFrame:
         """
         Cruza dados do mercado com base de clientes.
-        Adiciona coluna 'é_cliente' indicando se o CNPJ está na base de clientes.
+        Retorna uma cópia do mercado com a coluna 'é_cliente' indicando se o CNPJ está
+        na base de clientes; os DataFrames recebidos não são alterados.
+        
+        Os CNPJs são normalizados (pontuação, zeros à esquerda) na granularidade do
+        mercado (14 ou 8 dígitos) e comparados por busca binária (ver indice_cnpj).
         """
-        # Garantir que CNPJ seja string em ambos os DataFrames
-        df_mercado['cnpj'] = df_mercado['cnpj'].astype(str)
-        df_clientes['cnpj'] = df_clientes['cnpj'].astype(str)
+        digitos = digitos_cnpj(df_mercado)
+        indice_clientes = IndiceCNPJ.construir(df_clientes['cnpj'], digitos)
         
         # Marcar quais CNPJs são clientes
-        df_mercado["é_cliente"] = df_mercado["cnpj"].isin(df_clientes["cnpj"])
+        df_mercado = df_mercado.copy(deep=False)
+        df_mercado["é_cliente"] = indice_clientes.contem(df_mercado["cnpj"])
         
         print(f"Cruzamento realizado: {df_mercado['é_cliente'].sum():,} clientes encontrados no mercado")
         return df_mercado
 
-    def aplicar_segmentacao_20_30_30_20(self, df: pd.DataFrame, campo: str) -> pd.DataFrame:
-        df = df.sort_values(by=campo, ascending=False).copy()
-        total = len(df)
-        limites = [
-            int(0.2 * total),
-            int(0.5 * total),
-            int(0.8 * total),
-            total
-        ]
-        tiers = []
-        for i, idx in enumerate(df.index):
-            if i < limites[0]:
-                tiers.append("Tier 1")
-            elif i < limites[1]:
-                tiers.append("Tier 2")
-            elif i < limites[2]:
-                tiers.append("Tier 3")
-            else:
-                tiers.append("Tier 4")
-        df["tier"] = tiers
+    def aplicar_segmentacao_20_30_30_20(self, df: pd.DataFrame, campo: str,
+                                        percentuais: list = [20, 30, 30, 20]) -> pd.DataFrame:
+        df = df.sort_values(by=campo, ascending=False)
+        df["tier"] = tiers_por_posicao(len(df), percentuais)
         return df
 
     def gerar_matriz_tam_sam_som(self, df: pd.DataFrame, agrupadores=["regiao", "descricao_cnae"]) -> pd.DataFrame:
         """
         Gera matriz TAM/SAM/SOM agrupada por região e descrição do CNAE.
+        Todas as contagens (incluindo a quantidade por tier) são feitas em uma única passada.
         """
-        matriz = df.groupby(agrupadores).agg(
-            TAM=("cnpj", "count"),
-            SAM=("é_cliente", lambda x: (~x).sum()),
-            SOM=("é_cliente", "sum"),
-            Tier_1=("tier", lambda x: (x == "Tier 1").sum()),
-            Tier_2=("tier", lambda x: (x == "Tier 2").sum()),
-            Tier_3=("tier", lambda x: (x == "Tier 3").sum()),
-            Tier_4=("tier", lambda x: (x == "Tier 4").sum())
-        ).reset_index()
+        rotulos = rotulos_padrao(4)
+        contagens = contar_por_grupo(df, list(agrupadores), "é_cliente", "tier", rotulos)
+        matriz = contagens[list(agrupadores)].assign(
+            TAM=contagens["total"],
+            SAM=contagens["cliente_preenchido"] - contagens["clientes"],
+            SOM=contagens["clientes"],
+            **{rotulo.replace(" ", "_"): contagens[rotulo] for rotulo in rotulos}
+        )
         
         return matriz
     
@@ -363,9 +354,9 @@ class DadosMercado:
         df["é_potencial"] = ~df["é_cliente"]
 
         resultado = {
-            "TAM": df.groupby("tier")["cnpj"].count(),
-            "SAM": df[df["é_potencial"]].groupby("tier")["cnpj"].count(),
-            "SOM": df[df["é_cliente"]].groupby("tier")["cnpj"].count(),
+            "TAM": df.groupby("tier", observed=False)["cnpj"].count(),
+            "SAM": df[df["é_potencial"]].groupby("tier", observed=False)["cnpj"].count(),
+            "SOM": df[df["é_cliente"]].groupby("tier", observed=False)["cnpj"].count(),
         }
 
         matriz = pd.DataFrame(resultado).T.fillna(0).astype(int)
@@ -377,13 +368,13 @@ class DadosMercado:
         Retorna DataFrame com descrição do CNAE, quantidade de empresas e região.
         """
         # Extrai os CNAEs dos clientes
-        cnaes_clientes = df_clientes['cnae'].astype(str).str[:2].unique()
+        cnaes_clientes = divisao_cnae(df_clientes).unique()
         
         # Filtra CNAEs do mercado que não estão nos clientes
-        df_novos = df_mercado[~df_mercado['cnae'].astype(str).str[:2].isin(cnaes_clientes)]
+        df_novos = df_mercado[~divisao_cnae(df_mercado).isin(cnaes_clientes)]
         
         # Agrupa por descrição do CNAE e região
-        oportunidades = df_novos.groupby(['descricao_cnae', 'regiao']).agg(
+        oportunidades = df_novos.groupby(['descricao_cnae', 'regiao'], observed=True).agg(
             qtd_empresas=('cnpj', 'count')
         ).reset_index()
         
@@ -395,7 +386,7 @@ class DadosMercado:
         Calcula TAM/SAM/SOM por descrição do CNAE e região.
         """
         # Preparar dados dos clientes
-        df_clientes['descricao_cnae'] = df_clientes['cnae'].apply(self.obter_descricao_cnae)
+        df_clientes = df_clientes.assign(descricao_cnae=descricao_cnae(df_clientes))
         
         # Cruzar dados
         df_cruzado = self.cruzar_dados_mercado(df_mercado, df_clientes)
@@ -408,19 +399,78 @@ class DadosMercado:
         
         return matriz
 
+    def calcular_tam_sam_som_por_cubo(self, df_clientes: pd.DataFrame,
+                                      agrupadores: List[str] = ['regiao', 'descricao_cnae']) -> pd.DataFrame:
+        """
+        Calcula TAM/SAM/SOM usando o cubo pré-agregado para o TAM.
+        Só os estabelecimentos dos clientes (SOM) são lidos linha a linha da base.
+        Se o cubo não estiver disponível, usa o cálculo completo sobre a base.
+        
+        Args:
+            df_clientes: Base de clientes (coluna 'cnpj')
+            agrupadores: Níveis do cubo (regiao, uf, municipio, cnae_divisao, cnae_grupo)
+                e/ou 'descricao_cnae'
+        """
+        cubo = obter_cubo(self.caminho_cubo, self.caminho_receita, self.caminho_base_colunar)
+        if cubo is None:
+            print("⚠️ Cubo de mercado indisponível, calculando a partir da base completa...")
+            df_mercado = self.carregar_dados_receita_federal(colunas=COLUNAS_TAM_SAM_SOM)
+            return self.calcular_tam_sam_som_por_cnae(df_clientes, df_mercado)
+        
+        # Níveis do cubo necessários para os agrupadores pedidos
+        niveis = [a for a in agrupadores if a in NIVEIS_CUBO]
+        if 'descricao_cnae' in agrupadores and 'cnae_divisao' not in niveis:
+            niveis.append('cnae_divisao')
+        
+        tam = cubo.agregar(niveis)
+        if 'descricao_cnae' in agrupadores:
+            tam['descricao_cnae'] = descricao_cnae(tam)
+            tam = tam.groupby(agrupadores, dropna=False, observed=True)['TAM'].sum().reset_index()
+        
+        # SOM: apenas os estabelecimentos que são clientes
+        cnpjs = []
+        if 'cnpj' in df_clientes.columns:
+            indice = obter_indice_mercado(self.caminho_indice_cnpj, self.caminho_receita, self.caminho_base_colunar)
+            if indice is not None:
+                # Descarta quem não está no mercado e usa o formato da base no filtro
+                chaves, validos = normalizar_cnpj(df_clientes['cnpj'], indice.digitos)
+                chaves = chaves[validos & indice.contem_chaves(chaves)]
+                cnpjs = formatar_cnpj(np.unique(chaves), indice.digitos).tolist()
+            else:
+                cnpjs = df_clientes['cnpj'].dropna().astype(str).unique().tolist()
+        if cnpjs:
+            df_som = self.carregar_dados_receita_federal(
+                filtros={'cnpj': cnpjs}, colunas=['cnpj', 'uf', 'municipio', 'cnae']
+            )
+        else:
+            df_som = pd.DataFrame()
+        
+        if len(df_som) > 0:
+            df_som['cnae_grupo'] = df_som['cnae'].astype(str).str.zfill(7).str[:3]
+            som = df_som.groupby(agrupadores, dropna=False, observed=True).size().rename('SOM').reset_index()
+            matriz = tam.merge(som, on=agrupadores, how='left')
+            matriz['SOM'] = matriz['SOM'].fillna(0).astype('int64')
+        else:
+            matriz = tam.assign(SOM=0)
+        
+        matriz['SAM'] = matriz['TAM'] - matriz['SOM']
+        return matriz[list(agrupadores) + ['TAM', 'SAM', 'SOM']]
+
     def gerar_relatorio_similaridade_cnae(self, df_clientes: pd.DataFrame, df_mercado: pd.DataFrame) -> pd.DataFrame:
         """
         Gera relatório detalhado de similaridade entre CNAEs dos clientes e do mercado.
         """
         print("📊 Gerando relatório de similaridade de CNAEs...")
         
-        cnaes_clientes = df_clientes['cnae'].astype(str).str[:2].unique()
+        divisoes_clientes = divisao_cnae(df_clientes)
+        divisoes_mercado = divisao_cnae(df_mercado)
+        cnaes_clientes = divisoes_clientes.unique()
         relatorio = []
         
         for cnae_cliente in cnaes_clientes:
             # Calcular estatísticas
-            qtd_empresas_similares = df_mercado[df_mercado['cnae'].astype(str).str[:2] == cnae_cliente]['cnpj'].count()
-            qtd_clientes_nesse_cnae = df_clientes[df_clientes['cnae'].astype(str).str[:2] == cnae_cliente]['cnpj'].count()
+            qtd_empresas_similares = df_mercado[divisoes_mercado == cnae_cliente]['cnpj'].count()
+            qtd_clientes_nesse_cnae = df_clientes[divisoes_clientes == cnae_cliente]['cnpj'].count()
             
             relatorio.append({
                 'cnae_cliente': cnae_cliente,
@@ -438,8 +488,8 @@ class DadosMercado:
 
     def limpar_cache(self):
         """
-        Limpa o cache de dados carregados.
+        Invalida o cache de consultas (memória e disco, compartilhado pelo processo).
         """
-        self._cache_dados.clear()
+        self.cache.invalidar()
         print("🗑️ Cache limpo")
 
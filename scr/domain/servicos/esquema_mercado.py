@@ -0,0 +1,149 @@
+"""
+Esquema tipado do DataFrame de mercado.
+
+Carregadas como texto, as colunas da Receita Federal viram milhões de objetos
+str do Python. O esquema compacto guarda:
+
+    cnpj          -> uint64 (granularidade em df.attrs['digitos_cnpj'])
+    cnae          -> uint32
+    cnae_divisao  -> category (2 dígitos, derivada do texto original)
+    uf, regiao, situacao, municipio, descricao_cnae -> category
+
+'razao_social' não faz parte das colunas padrão do mercado; quando necessária
+é carregada sob demanda (ver DadosMercado.carregar_razao_social).
+
+As colunas derivadas (regiao, cnae_divisao, descricao_cnae) são calculadas
+sobre os valores distintos e expandidas pelos códigos (mapear_distintos), então
+o custo é proporcional à quantidade de UFs/CNAEs distintos, não de linhas.
+"""
+
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+from domain.servicos.indice_cnpj import inferir_digitos, normalizar_cnpj
+from domain.servicos.tabelas_mercado import DESCRICAO_CNAE_PADRAO, DESCRICAO_POR_DIVISAO_CNAE, REGIAO_POR_UF
+
+# Incrementar quando o esquema mudar (invalida resultados em cache)
+VERSAO_ESQUEMA = 1
+
+COLUNAS_CATEGORICAS = ["uf", "regiao", "situacao", "municipio", "descricao_cnae", "cnae_divisao"]
+
+
+def uso_memoria(df: pd.DataFrame) -> int:
+    """Memória ocupada pelo DataFrame em bytes (incluindo objetos str)."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def mapear_distintos(valores: pd.Series, funcao: Callable[[pd.Index], pd.Index]) -> pd.Series:
+    """
+    Aplica uma transformação aos valores distintos de uma série e expande o
+    resultado para todas as linhas pelos códigos de fatorização.
+
+    Args:
+        valores: Série de entrada (texto, inteiros ou category; nulos são um valor distinto)
+        funcao: Recebe um pd.Index com os valores distintos e retorna o rótulo de cada um
+
+    Returns:
+        Série category alinhada a valores (categorias ordenadas)
+    """
+    codigos, distintos = pd.factorize(valores, use_na_sentinel=False)
+    rotulos = pd.Index(funcao(pd.Index(np.asarray(distintos, dtype=object))), dtype=object)
+    categorias = pd.Index(rotulos.dropna().unique()).sort_values()
+    lookup = categorias.get_indexer(rotulos)
+    return pd.Series(pd.Categorical.from_codes(lookup[codigos], categories=categorias),
+                     index=valores.index, name=valores.name)
+
+
+def regiao_por_uf(uf: pd.Series) -> pd.Series:
+    """Região de cada UF (nulo para UFs desconhecidas)."""
+    return mapear_distintos(uf, lambda ufs: ufs.map(REGIAO_POR_UF)).rename("regiao")
+
+
+def divisao_cnae(df: pd.DataFrame) -> pd.Series:
+    """
+    Retorna a divisão (2 primeiros dígitos) do CNAE, usando a coluna
+    'cnae_divisao' do esquema compacto quando existir.
+    Códigos com 6 ou 7 dígitos são o CNAE completo (inteiros perdem o zero à
+    esquerda: 111301 -> '01'); os demais (ex: divisões de 2 dígitos como 62)
+    seguem a regra original de completar até 2 dígitos.
+
+    Divisões inteiras (como em tests/clientes_teste.xlsx) e CNAEs completos:
+
+    >>> df = pd.DataFrame({"cnae": pd.Series([64, 52, 86, 111301, 6201501], dtype="int64")})
+    >>> divisao_cnae(df).tolist()
+    ['64', '52', '86', '01', '62']
+    >>> divisao_cnae(pd.DataFrame({"cnae": ["62", "0111301", "4751201"]})).tolist()
+    ['62', '01', '47']
+    """
+    if "cnae_divisao" in df.columns:
+        return df["cnae_divisao"]
+
+    def divisoes(cnaes: pd.Index) -> pd.Index:
+        texto = cnaes.astype(str)
+        completo = texto.str.fullmatch(r"\d{6,7}")
+        return pd.Index(np.where(completo, texto.str.zfill(7).str[:2], texto.str.zfill(2).str[:2]), dtype=object)
+
+    return mapear_distintos(df["cnae"], divisoes).rename("cnae_divisao")
+
+
+def descricao_cnae(df: pd.DataFrame) -> pd.Series:
+    """Descrição da divisão do CNAE de cada linha ('Outros' fora da tabela)."""
+    return mapear_distintos(
+        divisao_cnae(df),
+        lambda divisoes: divisoes.map(lambda d: DESCRICAO_POR_DIVISAO_CNAE.get(d, DESCRICAO_CNAE_PADRAO))
+    ).rename("descricao_cnae")
+
+
+def enriquecer_mercado(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adiciona as colunas derivadas 'regiao' (se houver 'uf') e 'cnae_divisao' e
+    'descricao_cnae' (se houver 'cnae'). Altera e retorna o próprio DataFrame.
+    """
+    if "uf" in df.columns:
+        df["regiao"] = regiao_por_uf(df["uf"])
+    if "cnae" in df.columns:
+        df["cnae_divisao"] = divisao_cnae(df)
+        df["descricao_cnae"] = descricao_cnae(df)
+    return df
+
+
+def digitos_cnpj(df: pd.DataFrame) -> int:
+    """Granularidade dos CNPJs do DataFrame (14 = completo, 8 = básico)."""
+    return df.attrs.get("digitos_cnpj") or inferir_digitos(df["cnpj"])
+
+
+def compactar_mercado(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte o DataFrame de mercado para o esquema compacto.
+    Colunas ausentes são ignoradas; colunas já convertidas são mantidas.
+
+    Args:
+        df: DataFrame de mercado (colunas em texto, como lidas da base)
+
+    Returns:
+        Novo DataFrame no esquema compacto (o original não é alterado)
+    """
+    colunas: Dict[str, pd.Series] = {}
+    digitos = None
+
+    if "cnpj" in df.columns:
+        digitos = digitos_cnpj(df)
+        if not pd.api.types.is_unsigned_integer_dtype(df["cnpj"]):
+            chaves, _ = normalizar_cnpj(df["cnpj"], digitos)
+            colunas["cnpj"] = pd.Series(chaves, index=df.index)
+
+    if "cnae" in df.columns and not pd.api.types.is_integer_dtype(df["cnae"]):
+        # A divisão vem do texto original: o inteiro perde os zeros à esquerda
+        colunas["cnae_divisao"] = divisao_cnae(df)
+        colunas["cnae"] = pd.to_numeric(df["cnae"], errors="coerce").fillna(0).astype(np.uint32)
+
+    df = df.assign(**colunas)
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in df.columns and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype("category")
+
+    if digitos is not None:
+        df.attrs["digitos_cnpj"] = digitos
+    return df
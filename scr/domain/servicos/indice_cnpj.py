@@ -0,0 +1,198 @@
+"""
+Índice de pertinência de CNPJs.
+
+Os CNPJs são normalizados uma única vez (remoção de pontuação, preenchimento
+com zeros e corte em 8 ou 14 dígitos) e guardados como um array uint64
+ordenado e sem repetições. A consulta de N CNPJs é uma busca binária
+vetorizada (np.searchsorted), O(N·log n), sem conjuntos Python.
+
+Granularidade:
+    14 dígitos -> CNPJ completo do estabelecimento
+     8 dígitos -> CNPJ básico (raiz da empresa)
+Um CNPJ completo pode ser consultado em um índice de 8 dígitos (usa a raiz);
+CNPJs com 8 dígitos ou menos não podem ser consultados em um índice de 14.
+"""
+
+import os
+import json
+from datetime import datetime
+from typing import Optional, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from domain.servicos.base_colunar import (
+    CAMINHO_CSV_RECEITA,
+    DIRETORIO_BASE_COLUNAR,
+    fingerprint_fonte,
+    iterar_lotes,
+    ler_manifesto
+)
+
+CAMINHO_INDICE_CNPJ = "scr/data/indice_cnpj.npy"
+
+
+def inferir_digitos(cnpjs: pd.Series, amostra: int = 1000) -> int:
+    """
+    Infere se uma série guarda CNPJs completos (14) ou básicos (8)
+    pela quantidade de dígitos de uma amostra.
+    """
+    valores = cnpjs.dropna().head(amostra)
+    if len(valores) == 0:
+        return 14
+    if pd.api.types.is_integer_dtype(valores):
+        return 14 if int(valores.max()) >= 10 ** 8 else 8
+    tamanhos = valores.astype(str).str.replace(r"\D", "", regex=True).str.len()
+    return 14 if tamanhos.max() > 8 else 8
+
+
+def normalizar_cnpj(cnpjs: pd.Series, digitos: int = 14) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converte uma série de CNPJs (texto com ou sem pontuação, ou inteiros) em uint64.
+
+    Args:
+        cnpjs: Série de CNPJs
+        digitos: Granularidade desejada (14 = completo, 8 = básico)
+
+    Returns:
+        Tupla (chaves uint64, máscara de válidos). Chaves inválidas valem 0.
+    """
+    cnpjs = pd.Series(cnpjs)
+    if pd.api.types.is_integer_dtype(cnpjs) and not cnpjs.isna().any():
+        chaves = cnpjs.to_numpy(dtype=np.uint64)
+        validos = np.ones(len(chaves), dtype=bool)
+        if digitos == 8 and inferir_digitos(cnpjs) == 14:
+            chaves = chaves // np.uint64(10 ** 6)
+        return chaves, validos
+
+    texto = cnpjs.astype("string").str.replace(r"\D", "", regex=True).fillna("")
+    tamanhos = texto.str.len().to_numpy()
+    if digitos == 14:
+        validos = (tamanhos > 8) & (tamanhos <= 14)
+        texto = texto.str.zfill(14)
+    else:
+        validos = (tamanhos > 0) & (tamanhos <= 14)
+        texto = texto.where(tamanhos <= 8, texto.str.zfill(14).str[:8])
+
+    texto = texto.where(validos, "0")
+    chaves = texto.astype(np.uint64).to_numpy()
+    return chaves, validos
+
+
+def formatar_cnpj(chaves: np.ndarray, digitos: int = 14) -> pd.Series:
+    """Converte chaves uint64 de volta para texto com zeros à esquerda."""
+    return pd.Series(chaves, dtype="uint64").astype(str).str.zfill(digitos)
+
+
+class IndiceCNPJ:
+    def __init__(self, chaves: np.ndarray, digitos: int = 14):
+        self.chaves = chaves
+        self.digitos = digitos
+
+    @classmethod
+    def construir(cls, cnpjs: pd.Series, digitos: Optional[int] = None) -> "IndiceCNPJ":
+        """Cria o índice a partir de uma série de CNPJs (granularidade inferida se não informada)."""
+        digitos = digitos or inferir_digitos(cnpjs)
+        chaves, validos = normalizar_cnpj(cnpjs, digitos)
+        return cls(np.unique(chaves[validos]), digitos)
+
+    def __len__(self) -> int:
+        return len(self.chaves)
+
+    def contem_chaves(self, chaves: np.ndarray) -> np.ndarray:
+        """Busca binária de chaves já normalizadas na granularidade do índice."""
+        if len(self.chaves) == 0:
+            return np.zeros(len(chaves), dtype=bool)
+        posicoes = np.searchsorted(self.chaves, chaves)
+        posicoes = np.minimum(posicoes, len(self.chaves) - 1)
+        return self.chaves[posicoes] == chaves
+
+    def contem(self, cnpjs: pd.Series) -> np.ndarray:
+        """
+        Retorna uma máscara booleana indicando quais CNPJs estão no índice.
+        CNPJs inválidos para a granularidade do índice retornam False.
+        """
+        chaves, validos = normalizar_cnpj(cnpjs, self.digitos)
+        return self.contem_chaves(chaves) & validos
+
+    def salvar(self, caminho: str = CAMINHO_INDICE_CNPJ, fonte: Optional[Dict] = None):
+        """Grava o array (.npy) e os metadados (.json) do índice."""
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        caminho_tmp = caminho + ".tmp.npy"
+        np.save(caminho_tmp, self.chaves)
+        os.replace(caminho_tmp, caminho)
+        with open(caminho + ".json", "w") as f:
+            json.dump({
+                "digitos": self.digitos,
+                "quantidade": int(len(self.chaves)),
+                "fonte": fonte,
+                "criado_em": datetime.now().isoformat(timespec="seconds")
+            }, f, indent=2)
+
+    @classmethod
+    def carregar(cls, caminho: str = CAMINHO_INDICE_CNPJ) -> "IndiceCNPJ":
+        """Abre o índice em modo memory-map (somente leitura, sem copiar para a memória)."""
+        with open(caminho + ".json", "r") as f:
+            metadados = json.load(f)
+        return cls(np.load(caminho, mmap_mode="r"), metadados["digitos"])
+
+
+def ler_metadados_indice(caminho: str = CAMINHO_INDICE_CNPJ) -> Optional[Dict]:
+    if not os.path.exists(caminho) or not os.path.exists(caminho + ".json"):
+        return None
+    with open(caminho + ".json", "r") as f:
+        return json.load(f)
+
+
+def construir_indice_mercado(caminho_csv: str = CAMINHO_CSV_RECEITA,
+                             diretorio_base: str = DIRETORIO_BASE_COLUNAR,
+                             caminho_indice: str = CAMINHO_INDICE_CNPJ,
+                             chunk_size: int = 1000000) -> IndiceCNPJ:
+    """
+    Constrói e grava o índice de CNPJs da base de mercado, lendo só a coluna 'cnpj'.
+    Deve ser executado uma vez por versão da base da Receita Federal.
+    """
+    print("🔄 Construindo índice de CNPJs do mercado...")
+    fonte = fingerprint_fonte(caminho_csv, diretorio_base)
+    partes = []
+    digitos = None
+    for lote in iterar_lotes(["cnpj"], caminho_csv, diretorio_base, chunk_size):
+        if digitos is None and len(lote) > 0:
+            digitos = inferir_digitos(lote["cnpj"])
+        chaves, validos = normalizar_cnpj(lote["cnpj"], digitos or 14)
+        partes.append(chaves[validos])
+
+    chaves = np.unique(np.concatenate(partes)) if partes else np.array([], dtype=np.uint64)
+    indice = IndiceCNPJ(chaves, digitos or 14)
+    indice.salvar(caminho_indice, fonte)
+    print(f"✅ Índice gerado em {caminho_indice}: {len(indice):,} CNPJs ({indice.digitos} dígitos)")
+    return indice
+
+
+_indice_carregado: Optional[IndiceCNPJ] = None
+_indice_carregado_de: Optional[Tuple[str, float]] = None
+
+
+def obter_indice_mercado(caminho_indice: str = CAMINHO_INDICE_CNPJ,
+                         caminho_csv: str = CAMINHO_CSV_RECEITA,
+                         diretorio_base: str = DIRETORIO_BASE_COLUNAR) -> Optional[IndiceCNPJ]:
+    """
+    Retorna o índice do mercado aberto uma vez por processo (memory-map).
+    Retorna None se não existir ou tiver sido gerado a partir de outra versão da base.
+    """
+    global _indice_carregado, _indice_carregado_de
+    metadados = ler_metadados_indice(caminho_indice)
+    if metadados is None:
+        return None
+    tem_fonte = os.path.exists(caminho_csv) or ler_manifesto(diretorio_base) is not None
+    if tem_fonte and metadados.get("fonte") != fingerprint_fonte(caminho_csv, diretorio_base):
+        return None
+    chave = (caminho_indice, os.path.getmtime(caminho_indice))
+    if _indice_carregado is None or _indice_carregado_de != chave:
+        _indice_carregado = IndiceCNPJ.carregar(caminho_indice)
+        _indice_carregado_de = chave
+    return _indice_carregado
+
+
+if __name__ == "__main__":
+    construir_indice_mercado()
@@ -0,0 +1,367 @@
+"""
+Ingestão dos arquivos de estabelecimentos da Receita Federal (Estabelecimentos*.zip)
+direto para a base colunar particionada consumida por DadosMercado.
+
+Cada ZIP é lido em streaming, em blocos de tamanho fixo, sem extrair o arquivo
+para o disco e sem materializá-lo inteiro em memória. Os estabelecimentos
+ativos (SITUACAO_CADASTRAL == '02') são filtrados e projetados nas colunas de
+interesse durante a leitura, então a memória usada depende do tamanho do
+bloco, não do tamanho dos arquivos.
+
+Os ZIPs (Estabelecimentos0..9) são processados em paralelo, um por processo.
+Cada um gera sua própria base parcial em <destino>.shards/<nome do ZIP>, com
+manifesto e checksum SHA-256 do ZIP de origem; ao final, os arquivos das bases
+parciais são vinculados (hard link) em uma única base, sem regravar dados.
+Se a ingestão for interrompida, a próxima execução reaproveita as bases
+parciais cujo checksum corresponde ao ZIP atual.
+
+Uso (a partir da raiz do projeto):
+    PYTHONPATH=scr python -m domain.servicos.ingestao_receita --origem scr/data
+    PYTHONPATH=scr python -m domain.servicos.ingestao_receita --origem scr/data --incremental
+"""
+
+import os
+import glob
+import time
+import shutil
+import hashlib
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import psutil
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+from domain.servicos.base_colunar import (
+    ARQUIVO_MANIFESTO,
+    DIRETORIO_BASE_COLUNAR,
+    FORMATO_ORIGEM_ZIP,
+    fingerprint_arquivo,
+    gravar_base_colunar,
+    ler_manifesto,
+    preparar_lote,
+    publicar_base_colunar
+)
+
+DIRETORIO_ORIGEM = "scr/data"
+PADRAO_ARQUIVOS = "Estabelecimentos*.zip"
+
+# Tamanho de cada bloco lido do CSV (limita a memória por lote)
+TAMANHO_BLOCO_BYTES = 64 * 1024 ** 2
+
+# Layout oficial do arquivo de estabelecimentos (sem cabeçalho, separado por ';')
+LAYOUT_ESTABELECIMENTOS = [
+    'CNPJ_BASICO',
+    'CNPJ_ORDEM',
+    'CNPJ_DV',
+    'IDENTIFICADOR_MATRIZ_FILIAL',
+    'NOME_FANTASIA',
+    'SITUACAO_CADASTRAL',
+    'DATA_SITUACAO_CADASTRAL',
+    'MOTIVO_SITUACAO_CADASTRAL',
+    'NOME_CIDADE_EXTERIOR',
+    'PAIS',
+    'DATA_INICIO_ATIVIDADE',
+    'CNAE_PRINCIPAL',
+    'CNAE_SECUNDARIO',
+    'TIPO_LOGRADOURO',
+    'LOGRADOURO',
+    'NUMERO',
+    'COMPLEMENTO',
+    'BAIRRO',
+    'CEP',
+    'UF',
+    'MUNICIPIO',
+    'DDD_1',
+    'TELEFONE_1',
+    'DDD_2',
+    'TELEFONE_2',
+    'DDD_FAX',
+    'FAX',
+    'EMAIL',
+    'SITUACAO_ESPECIAL',
+    'DATA_SITUACAO_ESPECIAL'
+]
+
+# Colunas que queremos manter para TAM/SAM/SOM
+COLUNAS_INTERESSE = {
+    'CNPJ_BASICO': 'cnpj',
+    'CNAE_PRINCIPAL': 'cnae',
+    'NOME_FANTASIA': 'razao_social',
+    'UF': 'uf',
+    'MUNICIPIO': 'municipio',
+    'SITUACAO_CADASTRAL': 'situacao'
+}
+
+# Completam o CNPJ básico na identificação do estabelecimento (id_estabelecimento)
+COLUNAS_IDENTIFICACAO = ['CNPJ_ORDEM', 'CNPJ_DV']
+
+SITUACAO_ATIVA = '02'
+
+
+class MonitorMemoria:
+    """Acompanha o pico de memória residente (RSS) do processo."""
+
+    def __init__(self):
+        self._processo = psutil.Process()
+        self.pico_bytes = 0
+
+    def amostrar(self) -> int:
+        rss = self._processo.memory_info().rss
+        self.pico_bytes = max(self.pico_bytes, rss)
+        return rss
+
+
+def listar_arquivos(diretorio_origem: str = DIRETORIO_ORIGEM,
+                    padrao: str = PADRAO_ARQUIVOS) -> List[str]:
+    """Lista os ZIPs de estabelecimentos do diretório (ordem alfabética)."""
+    return sorted(glob.glob(os.path.join(diretorio_origem, padrao)))
+
+
+def novas_estatisticas_ingestao() -> Dict:
+    return {"linhas_lidas": 0, "linhas_mantidas": 0, "linhas_invalidas": 0, "pico_rss_bytes": 0}
+
+
+def ler_estabelecimentos(caminho_zip: str,
+                         estatisticas: Dict,
+                         tamanho_bloco: int = TAMANHO_BLOCO_BYTES,
+                         versao: int = 0) -> Iterator[pa.RecordBatch]:
+    """
+    Lê o arquivo de estabelecimentos de um ZIP em streaming.
+
+    Apenas as colunas de COLUNAS_INTERESSE são convertidas; as linhas são
+    filtradas (ativas, com UF e CNAE de 7 dígitos) e devolvidas no SCHEMA_BASE.
+
+    Args:
+        caminho_zip: ZIP publicado pela Receita (ex: Estabelecimentos0.zip)
+        estatisticas: Contadores atualizados durante a leitura
+        tamanho_bloco: Bytes de CSV lidos por lote
+        versao: Versão da base gravada nas linhas
+    """
+    colunas_lidas = list(COLUNAS_INTERESSE) + COLUNAS_IDENTIFICACAO
+
+    def contar_invalida(_linha) -> str:
+        estatisticas["linhas_invalidas"] += 1
+        return "skip"
+
+    with zipfile.ZipFile(caminho_zip) as z:
+        membro = max(z.infolist(), key=lambda x: x.file_size)
+        with z.open(membro) as arquivo:
+            leitor = pv.open_csv(
+                arquivo,
+                read_options=pv.ReadOptions(column_names=LAYOUT_ESTABELECIMENTOS,
+                                            block_size=tamanho_bloco, encoding="latin1"),
+                parse_options=pv.ParseOptions(delimiter=";", quote_char='"',
+                                              invalid_row_handler=contar_invalida),
+                convert_options=pv.ConvertOptions(include_columns=colunas_lidas,
+                                                  column_types={c: pa.string() for c in colunas_lidas},
+                                                  strings_can_be_null=True)
+            )
+            for lote in leitor:
+                estatisticas["linhas_lidas"] += lote.num_rows
+                mascara = pc.and_(
+                    pc.equal(lote.column("SITUACAO_CADASTRAL"), SITUACAO_ATIVA),
+                    pc.and_(pc.is_valid(lote.column("UF")),
+                            pc.greater_equal(pc.utf8_length(lote.column("CNAE_PRINCIPAL")), 7))
+                )
+                filtrado = lote.filter(mascara)
+                if filtrado.num_rows == 0:
+                    continue
+                estatisticas["linhas_mantidas"] += filtrado.num_rows
+                df = filtrado.to_pandas()
+                df["id_estabelecimento"] = pd.to_numeric(
+                    df["CNPJ_BASICO"] + df.pop("CNPJ_ORDEM") + df.pop("CNPJ_DV"), errors="coerce"
+                ).astype("UInt64")
+                yield preparar_lote(df.rename(columns=COLUNAS_INTERESSE), versao)
+
+
+def checksum_arquivo(caminho: str, tamanho_bloco: int = 8 * 1024 ** 2) -> str:
+    """SHA-256 do arquivo, lido em blocos."""
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def nome_shard(caminho_zip: str) -> str:
+    """Nome da base parcial de um ZIP (ex: Estabelecimentos0)."""
+    return os.path.splitext(os.path.basename(caminho_zip))[0]
+
+
+def ingerir_shard(caminho_zip: str,
+                  diretorio_shard: str,
+                  tamanho_bloco: int = TAMANHO_BLOCO_BYTES) -> Dict:
+    """
+    Converte um único ZIP em uma base parcial (executado em um processo do pool).
+    Se a base parcial já existir com o mesmo checksum, ela é reaproveitada.
+
+    Returns:
+        Manifesto da base parcial ('reaproveitado' indica se foi pulada)
+    """
+    nome = nome_shard(caminho_zip)
+    checksum = checksum_arquivo(caminho_zip)
+    manifesto = ler_manifesto(diretorio_shard)
+    if manifesto is not None and manifesto.get("checksum") == checksum:
+        print(f"⏭️ {nome}: base parcial já gerada para este arquivo, reaproveitando")
+        return {**manifesto, "reaproveitado": True}
+
+    print(f"📦 {nome}: lendo {caminho_zip}...")
+    estatisticas = novas_estatisticas_ingestao()
+    monitor = MonitorMemoria()
+    inicio = time.time()
+
+    def gerar_lotes():
+        for i, lote in enumerate(ler_estabelecimentos(caminho_zip, estatisticas, tamanho_bloco), start=1):
+            yield lote
+            rss = monitor.amostrar()
+            estatisticas["pico_rss_bytes"] = monitor.pico_bytes
+            if i % 10 == 0:
+                print(f"📊 {nome}: {estatisticas['linhas_lidas']:,} linhas lidas, "
+                      f"{estatisticas['linhas_mantidas']:,} ativas | RSS {rss / 1024 ** 2:,.0f} MB")
+        estatisticas["segundos"] = round(time.time() - inicio, 1)
+
+    os.makedirs(os.path.dirname(diretorio_shard), exist_ok=True)
+    manifesto = gravar_base_colunar(gerar_lotes(), diretorio_shard, {
+        "origem": os.path.basename(caminho_zip),
+        "formato_origem": FORMATO_ORIGEM_ZIP,
+        "fingerprint": fingerprint_arquivo(caminho_zip),
+        "checksum": checksum,
+        "ingestao": estatisticas
+    })
+    print(f"✅ {nome}: {estatisticas['linhas_mantidas']:,} ativos de {estatisticas['linhas_lidas']:,} "
+          f"em {estatisticas['segundos']:,.1f}s (pico RSS {monitor.pico_bytes / 1024 ** 2:,.0f} MB)")
+    return {**manifesto, "reaproveitado": False}
+
+
+def _vincular(origem: str, destino: str):
+    """Cria um hard link (sem copiar dados); copia se o sistema de arquivos não suportar."""
+    try:
+        os.link(origem, destino)
+    except OSError:
+        shutil.copy2(origem, destino)
+
+
+def mesclar_shards(manifestos: Dict[str, Dict], diretorio_shards: str, diretorio: str) -> Dict:
+    """
+    Monta a base final a partir das bases parciais, vinculando os arquivos
+    Parquet de cada partição (prefixados pelo nome do shard) e gravando o manifesto.
+    """
+    diretorio_tmp = diretorio + ".tmp"
+    shutil.rmtree(diretorio_tmp, ignore_errors=True)
+    os.makedirs(diretorio_tmp)
+
+    for nome in sorted(manifestos):
+        diretorio_shard = os.path.join(diretorio_shards, nome)
+        for raiz, _, arquivos in os.walk(diretorio_shard):
+            destino = os.path.join(diretorio_tmp, os.path.relpath(raiz, diretorio_shard))
+            for arquivo in arquivos:
+                if arquivo == ARQUIVO_MANIFESTO:
+                    continue
+                os.makedirs(destino, exist_ok=True)
+                _vincular(os.path.join(raiz, arquivo), os.path.join(destino, f"{nome}-{arquivo}"))
+
+    ordenados = [manifestos[nome] for nome in sorted(manifestos)]
+    return publicar_base_colunar(diretorio_tmp, diretorio, {
+        "origem": [m["origem"] for m in ordenados],
+        "formato_origem": FORMATO_ORIGEM_ZIP,
+        "fingerprint": {m["origem"]: {**m["fingerprint"], "checksum": m["checksum"]} for m in ordenados},
+        "linhas": sum(m["linhas"] for m in ordenados),
+        "shards": {nome: {"checksum": m["checksum"], "linhas": m["linhas"], "ingestao": m["ingestao"]}
+                   for nome, m in zip(sorted(manifestos), ordenados)}
+    })
+
+
+def ingerir_estabelecimentos(arquivos: Optional[List[str]] = None,
+                             diretorio_origem: str = DIRETORIO_ORIGEM,
+                             diretorio: str = DIRETORIO_BASE_COLUNAR,
+                             tamanho_bloco: int = TAMANHO_BLOCO_BYTES,
+                             processos: Optional[int] = None) -> Dict:
+    """
+    Converte os ZIPs de estabelecimentos na base colunar particionada,
+    um ZIP por processo.
+
+    Args:
+        arquivos: ZIPs a ingerir (None = todos os Estabelecimentos*.zip de diretorio_origem)
+        diretorio_origem: Diretório onde os ZIPs foram baixados
+        diretorio: Diretório de destino da base colunar
+        tamanho_bloco: Bytes de CSV lidos por lote (a memória de cada processo é proporcional)
+        processos: Quantidade de processos (None = um por ZIP, limitado à quantidade de CPUs;
+            1 = sem pool, no processo atual)
+
+    Returns:
+        Manifesto da base gerada (inclui as estatísticas de cada shard)
+    """
+    arquivos = arquivos or listar_arquivos(diretorio_origem)
+    if not arquivos:
+        raise FileNotFoundError(f"Nenhum arquivo {PADRAO_ARQUIVOS} encontrado em {diretorio_origem}")
+
+    processos = processos or min(len(arquivos), os.cpu_count() or 1)
+    diretorio_shards = diretorio + ".shards"
+    print(f"🔄 Ingerindo {len(arquivos)} arquivo(s) de estabelecimentos em {diretorio} ({processos} processo(s))...")
+    inicio = time.time()
+
+    tarefas = {nome_shard(a): (a, os.path.join(diretorio_shards, nome_shard(a)), tamanho_bloco) for a in arquivos}
+    manifestos = {}
+    if processos == 1:
+        for nome, tarefa in tarefas.items():
+            manifestos[nome] = ingerir_shard(*tarefa)
+    else:
+        # Shards concluídos ficam gravados mesmo que outro falhe (retomados na próxima execução)
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            futuros = {executor.submit(ingerir_shard, *tarefa): nome for nome, tarefa in tarefas.items()}
+            for futuro in as_completed(futuros):
+                manifestos[futuros[futuro]] = futuro.result()
+
+    manifesto = mesclar_shards(manifestos, diretorio_shards, diretorio)
+
+    lidas = sum(m["ingestao"]["linhas_lidas"] for m in manifestos.values())
+    invalidas = sum(m["ingestao"]["linhas_invalidas"] for m in manifestos.values())
+    pico = max(m["ingestao"]["pico_rss_bytes"] for m in manifestos.values())
+    reaproveitados = sum(m["reaproveitado"] for m in manifestos.values())
+    print(f"✅ Base colunar gerada em {diretorio}: {manifesto['linhas']:,} estabelecimentos ativos "
+          f"de {lidas:,} lidos ({invalidas:,} linhas inválidas, {reaproveitados} shard(s) reaproveitado(s))")
+    print(f"⏱️ Tempo: {time.time() - inicio:,.1f}s | 🧠 Pico de memória por processo (RSS): {pico / 1024 ** 2:,.0f} MB")
+    return manifesto
+
+
+def main(argv: Optional[List[str]] = None):
+    from domain.servicos.atualizacao_receita import atualizar_base
+    from domain.servicos.base_mapeada import exportar_base_mapeada
+    from domain.servicos.cubo_mercado import construir_cubo_mercado
+    from domain.servicos.indice_cnpj import construir_indice_mercado
+
+    parser = argparse.ArgumentParser(description="Ingestão dos estabelecimentos da Receita Federal")
+    parser.add_argument("--origem", default=DIRETORIO_ORIGEM, help="Diretório com os Estabelecimentos*.zip")
+    parser.add_argument("--destino", default=DIRETORIO_BASE_COLUNAR, help="Diretório da base colunar")
+    parser.add_argument("--bloco-mb", type=int, default=TAMANHO_BLOCO_BYTES // 1024 ** 2,
+                        help="Tamanho de cada bloco lido, em MB")
+    parser.add_argument("--processos", type=int, default=None,
+                        help="Processos em paralelo (padrão: um por ZIP, até a quantidade de CPUs)")
+    parser.add_argument("--sem-derivados", action="store_true",
+                        help="Não reconstruir o cubo, o índice de CNPJs e a base mapeada")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Aplicar o dump como nova versão da base existente (ver atualizacao_receita)")
+    args = parser.parse_args(argv)
+
+    if args.incremental:
+        atualizar_base(diretorio_origem=args.origem, diretorio=args.destino,
+                       tamanho_bloco=args.bloco_mb * 1024 ** 2, derivados=not args.sem_derivados)
+        if not args.sem_derivados:
+            exportar_base_mapeada(diretorio_base=args.destino)
+        return
+
+    ingerir_estabelecimentos(diretorio_origem=args.origem, diretorio=args.destino,
+                             tamanho_bloco=args.bloco_mb * 1024 ** 2, processos=args.processos)
+    if not args.sem_derivados:
+        construir_cubo_mercado(diretorio_base=args.destino)
+        construir_indice_mercado(diretorio_base=args.destino)
+        exportar_base_mapeada(diretorio_base=args.destino)
+
+
+if __name__ == "__main__":
+    main()
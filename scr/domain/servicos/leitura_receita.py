@@ -0,0 +1,152 @@
+"""
+Leitura filtrada do CSV da Receita Federal.
+
+Os filtros são convertidos em expressões do pyarrow e avaliados sobre cada
+lote logo após o parsing, antes de qualquer conversão para objetos Python.
+Apenas as colunas pedidas (mais as usadas nos filtros) são materializadas.
+
+Especificação de filtros (dicionário coluna -> valor):
+    {'uf': ['SP', 'RJ']}      -> isin
+    {'situacao': '02'}        -> igualdade
+    {'cnae': ['62', '4781']}  -> prefixo (qualquer um dos prefixos)
+"""
+
+from typing import Optional, Dict, List, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.dataset as ds
+
+COLUNAS_RECEITA = ["cnpj", "cnae", "razao_social", "uf", "municipio", "situacao"]
+
+# Colunas efetivamente usadas pelos cálculos de TAM/SAM/SOM
+COLUNAS_TAM_SAM_SOM = ["cnpj", "cnae", "uf", "municipio", "situacao"]
+
+# Colunas padrão do DataFrame de mercado (razao_social é carregada sob demanda)
+COLUNAS_MERCADO = [c for c in COLUNAS_RECEITA if c != "razao_social"]
+
+# Colunas cujo filtro é por prefixo em vez de igualdade
+COLUNAS_PREFIXO = ["cnae"]
+
+# Bytes por linha usados para converter chunk_size (linhas) em tamanho de bloco do leitor
+BYTES_POR_LINHA = 128
+
+
+def como_lista(valores) -> List[str]:
+    if isinstance(valores, (list, tuple, set)):
+        return [str(v) for v in valores]
+    return [str(valores)]
+
+
+def expressao_filtros(filtros: Optional[Dict], colunas_disponiveis: Optional[List[str]] = None) -> Optional[ds.Expression]:
+    """
+    Converte o dicionário de filtros em uma expressão do pyarrow.
+
+    Args:
+        filtros: Dicionário de filtros (ver docstring do módulo)
+        colunas_disponiveis: Se informado, filtros de colunas inexistentes são ignorados
+    """
+    if not filtros:
+        return None
+    expressao = None
+    for coluna, valores in filtros.items():
+        if colunas_disponiveis is not None and coluna not in colunas_disponiveis:
+            continue
+        valores = como_lista(valores)
+        if coluna in COLUNAS_PREFIXO:
+            expr = None
+            for prefixo in valores:
+                e = pc.starts_with(ds.field(coluna), prefixo)
+                expr = e if expr is None else expr | e
+        elif len(valores) == 1:
+            expr = ds.field(coluna) == valores[0]
+        else:
+            expr = ds.field(coluna).isin(valores)
+        expressao = expr if expressao is None else expressao & expr
+    return expressao
+
+
+def colunas_necessarias(colunas: Optional[List[str]], filtros: Optional[Dict],
+                        colunas_disponiveis: List[str]) -> List[str]:
+    """
+    Retorna as colunas a ler: as pedidas mais as referenciadas pelos filtros.
+    """
+    if colunas is None:
+        return list(colunas_disponiveis)
+    leitura = [c for c in colunas if c in colunas_disponiveis]
+    for coluna in (filtros or {}):
+        if coluna in colunas_disponiveis and coluna not in leitura:
+            leitura.append(coluna)
+    return leitura
+
+
+def novas_estatisticas(origem: str) -> Dict:
+    return {"origem": origem, "linhas_lidas": 0, "linhas_mantidas": 0, "lotes_lidos": 0}
+
+
+def finalizar_estatisticas(estatisticas: Dict) -> Dict:
+    """Calcula a seletividade e imprime o resumo da leitura."""
+    lidas = estatisticas["linhas_lidas"]
+    estatisticas["seletividade"] = estatisticas["linhas_mantidas"] / lidas if lidas else 0.0
+    print(f"🔎 Linhas lidas: {lidas:,} | mantidas: {estatisticas['linhas_mantidas']:,} "
+          f"({estatisticas['seletividade']:.2%})")
+    return estatisticas
+
+
+def ler_csv_receita(caminho: str,
+                    filtros: Optional[Dict] = None,
+                    colunas: Optional[List[str]] = None,
+                    chunk_size: int = 10000,
+                    max_chunks: Optional[int] = None) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Lê o CSV da Receita Federal em lotes, com projeção de colunas e filtros
+    avaliados durante a leitura.
+
+    Args:
+        caminho: Caminho do CSV
+        filtros: Dicionário de filtros (ver docstring do módulo)
+        colunas: Colunas a retornar (None = todas)
+        chunk_size: Quantidade aproximada de linhas por lote
+        max_chunks: Número máximo de lotes lidos do arquivo, com ou sem linhas mantidas (None = todos)
+
+    Returns:
+        Tupla (DataFrame filtrado, estatísticas da leitura)
+    """
+    cabecalho = pd.read_csv(caminho, nrows=0).columns.tolist()
+    leitura = colunas_necessarias(colunas, filtros, cabecalho)
+    expressao = expressao_filtros(filtros, cabecalho)
+
+    formato = ds.CsvFileFormat(
+        read_options=pcsv.ReadOptions(block_size=max(1 << 20, chunk_size * BYTES_POR_LINHA)),
+        convert_options=pcsv.ConvertOptions(column_types={c: pa.string() for c in cabecalho})
+    )
+    scanner = ds.dataset(caminho, format=formato).scanner(columns=leitura, batch_size=chunk_size)
+
+    estatisticas = novas_estatisticas("csv")
+    tabelas = []
+    for lote in scanner.to_batches():
+        tabela = pa.Table.from_batches([lote])
+        estatisticas["linhas_lidas"] += tabela.num_rows
+        estatisticas["lotes_lidos"] += 1
+        if expressao is not None:
+            tabela = tabela.filter(expressao)
+        if tabela.num_rows > 0:
+            tabelas.append(tabela)
+            estatisticas["linhas_mantidas"] += tabela.num_rows
+
+        if max_chunks and estatisticas["lotes_lidos"] >= max_chunks:
+            break
+
+        if estatisticas["lotes_lidos"] % 10 == 0:
+            print(f"📊 Processados {estatisticas['lotes_lidos']} chunks...")
+
+    finalizar_estatisticas(estatisticas)
+    if not tabelas:
+        return pd.DataFrame(), estatisticas
+
+    df = pa.concat_tables(tabelas).to_pandas()
+    if colunas is not None:
+        df = df[[c for c in colunas if c in df.columns]]
+    return df, estatisticas
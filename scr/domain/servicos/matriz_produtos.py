@@ -0,0 +1,104 @@
+"""
+Matriz esparsa clientes x produtos.
+
+A coluna 'produtos' chega como texto ('A;B;C'). MatrizProdutos separa esse
+texto uma única vez (str.split/explode + factorize, sem laço por linha) em uma
+matriz CSR (linha = cliente, coluna = produto, valor = quantidade de menções)
+e um vocabulário em ordem alfabética. As análises de produtos (correlações do
+ICP, cestas/coocorrência) usam a matriz diretamente em vez de reprocessar o
+texto.
+
+carregar_e_preprocessar_dados monta a matriz e a anexa ao DataFrame em
+df.attrs[ATRIBUTO_MATRIZ_PRODUTOS]. Os attrs acompanham df.copy() e as
+seleções do pandas; como a cópia profunda da matriz devolve o próprio objeto,
+copiar o DataFrame não duplica a matriz. obter_matriz_produtos só reaproveita
+a matriz anexada se o índice do DataFrame for o mesmo em que ela foi montada
+(filtros e ordenações mudam as linhas); senão monta outra a partir da coluna.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+ATRIBUTO_MATRIZ_PRODUTOS = "matriz_produtos"
+SEPARADOR_PRODUTOS = ";"
+
+
+class MatrizProdutos:
+    def __init__(self, matriz: sparse.csr_matrix, vocabulario: List[str], indice: Optional[pd.Index] = None):
+        self.matriz = matriz
+        self.vocabulario = list(vocabulario)
+        # Índice das linhas do DataFrame de origem (para validar a matriz anexada)
+        self.indice = indice if indice is not None else pd.RangeIndex(matriz.shape[0])
+
+    @classmethod
+    def de_serie(cls, produtos: pd.Series, binaria: bool = False) -> "MatrizProdutos":
+        """
+        Monta a matriz a partir da coluna de produtos separados por ';'.
+
+        Args:
+            produtos: Uma linha por cliente (nulos e itens vazios são ignorados)
+            binaria: Contar cada produto uma vez por cliente (indicador 0/1)
+        """
+        itens = (pd.Series(produtos.fillna("").astype(str).to_numpy())
+                 .str.split(SEPARADOR_PRODUTOS).explode().str.strip())
+        itens = itens[itens != ""]
+        codigos, vocabulario = pd.factorize(itens, sort=True)
+        # coo -> csr soma as menções repetidas de um mesmo produto no cliente
+        matriz = sparse.csr_matrix(
+            (np.ones(len(codigos), dtype=np.float64), (itens.index.to_numpy(), codigos)),
+            shape=(len(produtos), len(vocabulario))
+        )
+        if binaria:
+            matriz.data[:] = 1.0
+        return cls(matriz, list(vocabulario), produtos.index)
+
+    def __len__(self) -> int:
+        return self.matriz.shape[0]
+
+    def __deepcopy__(self, memo) -> "MatrizProdutos":
+        # Imutável na prática: df.copy() copia os attrs em profundidade e não deve duplicar a matriz
+        return self
+
+    def alinhada(self, df: pd.DataFrame) -> bool:
+        """Indica se a matriz corresponde às linhas atuais de df."""
+        return len(self) == len(df) and self.indice.equals(df.index)
+
+    def mencoes_por_cliente(self) -> np.ndarray:
+        return np.asarray(self.matriz.sum(axis=1)).ravel()
+
+    def mencoes_por_produto(self) -> np.ndarray:
+        return np.asarray(self.matriz.sum(axis=0)).ravel()
+
+    def clientes_por_produto(self) -> pd.Series:
+        """Quantidade de clientes que têm cada produto."""
+        return pd.Series(np.diff(self.matriz.tocsc().indptr), index=self.vocabulario, name="clientes")
+
+    def coocorrencia(self) -> pd.DataFrame:
+        """Clientes que têm cada par de produtos (a diagonal é o total de clientes do produto)."""
+        indicador = self.matriz.copy()
+        indicador.data[:] = 1.0
+        return pd.DataFrame((indicador.T @ indicador).toarray(), index=self.vocabulario, columns=self.vocabulario)
+
+    def como_texto(self) -> pd.Series:
+        """Produtos de cada cliente em ordem alfabética, unidos por ';' ('' para quem não tem)."""
+        self.matriz.sort_indices()  # Colunas de cada linha em ordem = ordem alfabética do vocabulário
+        nomes = np.asarray(self.vocabulario, dtype=object)[self.matriz.indices].tolist()
+        limites = self.matriz.indptr.tolist()
+        texto = [SEPARADOR_PRODUTOS.join(nomes[inicio:fim]) for inicio, fim in zip(limites[:-1], limites[1:])]
+        return pd.Series(texto, index=self.indice, dtype=object)
+
+
+def obter_matriz_produtos(df: pd.DataFrame, coluna: str = "produtos") -> Optional[MatrizProdutos]:
+    """
+    Matriz de produtos de df: a anexada no pré-processamento, se ainda corresponder
+    às linhas, ou uma nova montada a partir da coluna. None se não houver a coluna.
+    """
+    matriz = df.attrs.get(ATRIBUTO_MATRIZ_PRODUTOS)
+    if isinstance(matriz, MatrizProdutos) and matriz.alinhada(df):
+        return matriz
+    if coluna not in df.columns:
+        return None
+    return MatrizProdutos.de_serie(df[coluna])
@@ -1,5 +1,12 @@
 import pandas as pd
 
+from domain.servicos.tiers import (
+    limiares_por_percentuais,
+    tiers_por_limiar,
+    tiers_por_participacao,
+    tiers_por_posicao
+)
+
 class Segmentacao:
     def aplicar_segmentacao_8020(self, df: pd.DataFrame, campo: str, percentual_a: float = 20) -> pd.DataFrame:
         """
@@ -11,46 +18,38 @@ class Segmentacao:
             campo: Campo base para segmentação (ltv ou ticket_medio)
             percentual_a: Percentual do valor total que o Grupo A deve representar (default: 20)
         """
-        df = df.copy()
         df = df.sort_values(by=campo, ascending=False).reset_index(drop=True)
-        total = df[campo].sum()
-        acumulado = df[campo].cumsum()
-        df["acumulado_pct"] = acumulado / total
+        acumulado_pct = df[campo].cumsum().to_numpy() / df[campo].sum()
 
-        df["tier"] = df["acumulado_pct"].apply(lambda x: "A" if x <= percentual_a/100 else "B")
-        return df.drop(columns=["acumulado_pct"])
+        df["tier"] = tiers_por_participacao(acumulado_pct, [percentual_a / 100], ["A", "B"])
+        return df
 
-    def aplicar_segmentacao_20_30_30_20(self, df: pd.DataFrame, campo: str, percentuais: list = [20, 30, 30, 20]) -> pd.DataFrame:
+    def aplicar_segmentacao_20_30_30_20(self, df: pd.DataFrame, campo: str, percentuais: list = [20, 30, 30, 20],
+                                        modo: str = "ordenado", somente_tier: bool = False):
         """
-        Segmenta os clientes em Tier 1, Tier 2, Tier 3 e Tier 4 com base na ordem decrescente do campo
+        Segmenta os clientes em Tier 1, Tier 2, ..., Tier N com base na ordem decrescente do campo
         e nos percentuais especificados.
         
         Args:
             df: DataFrame com os dados dos clientes
             campo: Campo base para segmentação (ltv ou ticket_medio)
-            percentuais: Lista com 4 percentuais [tier1, tier2, tier3, tier4] (default: [20, 30, 30, 20])
+            percentuais: Lista com o percentual de clientes de cada tier (default: [20, 30, 30, 20])
+            modo: "ordenado" ordena o DataFrame e corta por posição; "parcial" calcula apenas
+                os valores de corte com seleção parcial (O(n)) e mantém a ordem original das linhas.
+                No modo parcial, empates no valor de corte ficam no melhor tier.
+            somente_tier: No modo parcial, retorna apenas a Series 'tier' (mesmo índice do df),
+                sem copiar o DataFrame
         """
-        df = df.copy()
-        df = df.sort_values(by=campo, ascending=False).reset_index(drop=True)
-        total = len(df)
+        if modo == "parcial":
+            valores = pd.to_numeric(df[campo], errors='coerce').to_numpy(dtype=float)
+            limiares = limiares_por_percentuais(valores, percentuais)
+            tier = pd.Series(tiers_por_limiar(valores, limiares), index=df.index, name="tier")
+            if somente_tier:
+                return tier
+            return df.assign(tier=tier)
+        if modo != "ordenado":
+            raise ValueError(f"Modo de segmentação inválido: {modo}")
         
-        # Calcula os limites baseado nos percentuais
-        limites = [
-            int(percentuais[0]/100 * total),
-            int((percentuais[0] + percentuais[1])/100 * total),
-            int((percentuais[0] + percentuais[1] + percentuais[2])/100 * total),
-            total
-        ]
-        
-        tiers = []
-        for i in range(total):
-            if i < limites[0]:
-                tiers.append("Tier 1")
-            elif i < limites[1]:
-                tiers.append("Tier 2")
-            elif i < limites[2]:
-                tiers.append("Tier 3")
-            else:
-                tiers.append("Tier 4")
-        df["tier"] = tiers
+        df = df.sort_values(by=campo, ascending=False).reset_index(drop=True)
+        df["tier"] = tiers_por_posicao(len(df), percentuais)
         return df
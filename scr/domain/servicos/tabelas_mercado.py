@@ -0,0 +1,154 @@
+"""
+Tabelas de referência compartilhadas pelos serviços de mercado.
+"""
+
+# Região de cada UF
+REGIAO_POR_UF = {
+    'SP': 'Sudeste', 'RJ': 'Sudeste', 'MG': 'Sudeste', 'ES': 'Sudeste',
+    'RS': 'Sul', 'SC': 'Sul', 'PR': 'Sul',
+    'GO': 'Centro-Oeste', 'MT': 'Centro-Oeste', 'MS': 'Centro-Oeste', 'DF': 'Centro-Oeste',
+    'BA': 'Nordeste', 'PE': 'Nordeste', 'CE': 'Nordeste', 'MA': 'Nordeste',
+    'PB': 'Nordeste', 'RN': 'Nordeste', 'AL': 'Nordeste', 'SE': 'Nordeste', 'PI': 'Nordeste',
+    'AM': 'Norte', 'PA': 'Norte', 'AC': 'Norte', 'RO': 'Norte', 'RR': 'Norte', 'AP': 'Norte', 'TO': 'Norte'
+}
+
+# UFs de cada região
+UFS_POR_REGIAO = {}
+for _uf, _regiao in REGIAO_POR_UF.items():
+    UFS_POR_REGIAO.setdefault(_regiao, []).append(_uf)
+
+# Descrição de cada divisão do CNAE (2 primeiros dígitos), baseada na classificação
+# oficial da Receita Federal
+DESCRICAO_POR_DIVISAO_CNAE = {
+    # Seção A - Agricultura, Pecuária e Serviços Relacionados
+    '01': 'Agricultura, Pecuária e Serviços Relacionados',
+    '02': 'Produção Florestal',
+    '03': 'Pesca e Aquicultura',
+
+    # Seção B - Indústrias Extrativas
+    '05': 'Extração de Carvão Mineral',
+    '06': 'Extração de Petróleo e Gás Natural',
+    '07': 'Extração de Minerais Metálicos',
+    '08': 'Extração de Minerais Não-Metálicos',
+    '09': 'Atividades de Apoio à Extração',
+
+    # Seção C - Indústrias de Transformação
+    '10': 'Fabricação de Produtos Alimentícios',
+    '11': 'Fabricação de Bebidas',
+    '12': 'Fabricação de Produtos do Fumo',
+    '13': 'Fabricação de Produtos Têxteis',
+    '14': 'Confecção de Artigos do Vestuário',
+    '15': 'Curtimento e Fabricação de Artigos de Couro',
+    '16': 'Fabricação de Produtos de Madeira',
+    '17': 'Fabricação de Papel e Produtos de Papel',
+    '18': 'Impressão e Reprodução de Gravações',
+    '19': 'Fabricação de Produtos de Petróleo',
+    '20': 'Fabricação de Produtos Químicos',
+    '21': 'Fabricação de Produtos Farmacêuticos',
+    '22': 'Fabricação de Produtos de Borracha e Plástico',
+    '23': 'Fabricação de Produtos de Minerais Não-Metálicos',
+    '24': 'Metalurgia',
+    '25': 'Fabricação de Produtos de Metal',
+    '26': 'Fabricação de Equipamentos de Informática',
+    '27': 'Fabricação de Equipamentos Elétricos',
+    '28': 'Fabricação de Máquinas e Equipamentos',
+    '29': 'Fabricação de Veículos Automotores',
+    '30': 'Fabricação de Outros Equipamentos de Transporte',
+    '31': 'Fabricação de Móveis',
+    '32': 'Fabricação de Produtos Diversos',
+    '33': 'Manutenção e Reparação de Máquinas',
+
+    # Seção D - Eletricidade, Gás e Outras Utilidades
+    '35': 'Eletricidade, Gás e Outras Utilidades',
+
+    # Seção E - Água, Esgoto e Gestão de Resíduos
+    '36': 'Captação, Tratamento e Distribuição de Água',
+    '37': 'Esgoto',
+    '38': 'Coleta, Tratamento e Disposição de Resíduos',
+    '39': 'Descontaminação e Outros Serviços',
+
+    # Seção F - Construção
+    '41': 'Construção de Edifícios',
+    '42': 'Obras de Infraestrutura',
+    '43': 'Serviços Especializados para Construção',
+
+    # Seção G - Comércio e Reparação
+    '45': 'Comércio e Reparação de Veículos',
+    '46': 'Comércio por Atacado',
+    '47': 'Comércio Varejista',
+
+    # Seção H - Transporte e Armazenagem
+    '49': 'Transporte Terrestre',
+    '50': 'Transporte Aquaviário',
+    '51': 'Transporte Aéreo',
+    '52': 'Armazenagem e Atividades Auxiliares',
+    '53': 'Correio e Outras Atividades de Entrega',
+
+    # Seção I - Hospedagem e Alimentação
+    '55': 'Hospedagem',
+    '56': 'Alimentação',
+
+    # Seção J - Informação e Comunicação
+    '58': 'Edição',
+    '59': 'Atividades Cinematográficas',
+    '60': 'Atividades de Rádio e Televisão',
+    '61': 'Telecomunicações',
+    '62': 'Atividades dos Serviços de TI',
+    '63': 'Atividades de Prestação de Serviços de Informação',
+
+    # Seção K - Atividades Financeiras e Seguros
+    '64': 'Atividades de Serviços Financeiros',
+    '65': 'Seguros, Previdência e Planos de Saúde',
+    '66': 'Atividades Auxiliares dos Serviços Financeiros',
+
+    # Seção L - Atividades Imobiliárias
+    '68': 'Atividades Imobiliárias',
+
+    # Seção M - Atividades Profissionais e Técnicas
+    '69': 'Atividades Jurídicas e Contabilidade',
+    '70': 'Atividades de Consultoria em Gestão',
+    '71': 'Serviços de Arquitetura e Engenharia',
+    '72': 'Pesquisa e Desenvolvimento',
+    '73': 'Publicidade e Pesquisa de Mercado',
+    '74': 'Outras Atividades Profissionais',
+    '75': 'Atividades Veterinárias',
+
+    # Seção N - Atividades Administrativas
+    '77': 'Aluguel de Máquinas e Equipamentos',
+    '78': 'Seleção e Agenciamento de Mão de Obra',
+    '79': 'Agências de Viagens e Organizadores de Eventos',
+    '80': 'Atividades de Vigilância e Segurança',
+    '81': 'Serviços para Edifícios e Paisagismo',
+    '82': 'Serviços de Escritório e Apoio Administrativo',
+
+    # Seção O - Administração Pública
+    '84': 'Administração Pública',
+
+    # Seção P - Educação
+    '85': 'Educação',
+
+    # Seção Q - Saúde Humana e Serviços Sociais
+    '86': 'Atividades de Atenção à Saúde Humana',
+    '87': 'Atividades de Atenção à Saúde Integrada',
+    '88': 'Atividades de Assistência Social',
+
+    # Seção R - Artes, Cultura e Recreação
+    '90': 'Atividades Criativas, Artísticas e Espetáculos',
+    '91': 'Atividades Culturais',
+    '92': 'Atividades de Lazer e Esporte',
+    '93': 'Atividades Associativas',
+
+    # Seção S - Outras Atividades de Serviços
+    '94': 'Atividades de Organizações Associativas',
+    '95': 'Reparação de Computadores e Objetos Pessoais',
+    '96': 'Outras Atividades de Serviços Pessoais',
+
+    # Seção T - Serviços Domésticos
+    '97': 'Serviços Domésticos',
+
+    # Seção U - Organizações Internacionais
+    '99': 'Organizações Internacionais'
+}
+
+# Descrição usada para divisões fora da tabela
+DESCRICAO_CNAE_PADRAO = 'Outros'
@@ -1,6 +1,9 @@
 # domain/servicos/tam_sam_som.py
+import numpy as np
 import pandas as pd
 
+from domain.servicos.tiers import rotulos_padrao, tiers_por_participacao
+
 def cruzar_dados_mercado(df_clientes: pd.DataFrame, df_mercado: pd.DataFrame) -> pd.DataFrame:
     df_mercado['é_cliente'] = df_mercado['cnpj'].isin(df_clientes['cnpj'])
     return df_mercado
@@ -10,28 +13,63 @@ def aplicar_segmentacao_20_30_30_20(df: pd.DataFrame, campo: str) -> pd.DataFram
     df['acumulado'] = df[campo].cumsum()
     total = df[campo].sum()
     df['percentual'] = df['acumulado'] / total
-
-    def classificar(p):
-        if p <= 0.2:
-            return 'Tier 1'
-        elif p <= 0.5:
-            return 'Tier 2'
-        elif p <= 0.8:
-            return 'Tier 3'
-        else:
-            return 'Tier 4'
-
-    df['Tier'] = df['percentual'].apply(classificar)
+    df['Tier'] = tiers_por_participacao(df['percentual'].to_numpy(), [0.2, 0.5, 0.8])
     return df
 
+def contar_por_grupo(df: pd.DataFrame, grupo_por: list, coluna_cliente: str, coluna_tier: str,
+                     rotulos_tier: list, coluna_contagem: str = 'cnpj') -> pd.DataFrame:
+    """
+    Agrega em uma única passada, sem funções Python por grupo: as chaves de cada
+    agrupador são fatorizadas, combinadas em um código de grupo e contadas com np.bincount.
+
+    Retorna as colunas de grupo + 'total' (não nulos de coluna_contagem),
+    'clientes' (soma de coluna_cliente), 'cliente_preenchido' (não nulos de
+    coluna_cliente) e uma coluna de contagem por rótulo de tier.
+    """
+    codigos_cols, uniques_cols = [], []
+    for col in grupo_por:
+        codigos, uniques = pd.factorize(df[col], sort=True)
+        codigos_cols.append(codigos)
+        uniques_cols.append(uniques)
+
+    # Linhas com chave nula ficam fora dos grupos (mesmo comportamento do groupby)
+    validos = np.logical_and.reduce([c >= 0 for c in codigos_cols])
+    dimensoes = [max(len(u), 1) for u in uniques_cols]
+    combinado = np.ravel_multi_index([c[validos] for c in codigos_cols], dimensoes)
+    grupo, combinacoes = pd.factorize(combinado, sort=True)
+    n_grupos = len(combinacoes)
+
+    indices_chave = np.unravel_index(combinacoes, dimensoes)
+    resultado = pd.DataFrame({
+        col: uniques.take(idx) for col, uniques, idx in zip(grupo_por, uniques_cols, indices_chave)
+    })
+
+    cliente = df[coluna_cliente][validos]
+    resultado['total'] = np.bincount(grupo, weights=df[coluna_contagem][validos].notna(), minlength=n_grupos)
+    resultado['clientes'] = np.bincount(grupo, weights=cliente.fillna(False).astype(bool), minlength=n_grupos)
+    resultado['cliente_preenchido'] = np.bincount(grupo, weights=cliente.notna(), minlength=n_grupos)
+
+    # Contagem por tier: bincount sobre (grupo, tier) achatado em um único código
+    tier_codigos = pd.Categorical(df[coluna_tier][validos], categories=rotulos_tier).codes
+    com_tier = tier_codigos >= 0
+    n_tiers = len(rotulos_tier)
+    contagem_tiers = np.bincount(
+        grupo[com_tier] * n_tiers + tier_codigos[com_tier], minlength=n_grupos * n_tiers
+    ).reshape(n_grupos, n_tiers)
+    for i, rotulo in enumerate(rotulos_tier):
+        resultado[rotulo] = contagem_tiers[:, i]
+
+    contagens = ['total', 'clientes', 'cliente_preenchido']
+    resultado[contagens] = resultado[contagens].astype('int64')
+    return resultado
+
 def gerar_matriz_tam_sam_som(df: pd.DataFrame, grupo_por: list) -> pd.DataFrame:
-    matriz = df.groupby(grupo_por).agg(
-        TAM=('cnpj', 'count'),
-        SAM=('é_cliente', lambda x: x.count()),
-        SOM=('é_cliente', lambda x: x.sum()),
-        Tier1=('Tier', lambda x: (x == 'Tier 1').sum()),
-        Tier2=('Tier', lambda x: (x == 'Tier 2').sum()),
-        Tier3=('Tier', lambda x: (x == 'Tier 3').sum()),
-        Tier4=('Tier', lambda x: (x == 'Tier 4').sum()),
-    ).reset_index()
+    rotulos = rotulos_padrao(4)
+    contagens = contar_por_grupo(df, grupo_por, 'é_cliente', 'Tier', rotulos)
+    matriz = contagens[grupo_por].assign(
+        TAM=contagens['total'],
+        SAM=contagens['cliente_preenchido'],
+        SOM=contagens['clientes'],
+        **{rotulo.replace(' ', ''): contagens[rotulo] for rotulo in rotulos}
+    )
     return matriz
@@ -0,0 +1,115 @@
+"""
+Atribuição vetorizada de tiers.
+
+Funções compartilhadas pelas segmentações de clientes (Segmentacao) e de
+mercado (DadosMercado / tamsamsom). Os tiers são calculados com
+np.searchsorted sobre os pontos de corte, sem laços em Python, e retornados
+como pd.Categorical ordenado (um código inteiro por linha).
+
+Quando só os limites dos tiers importam, limiares_por_percentuais +
+tiers_por_limiar evitam a ordenação completa (seleção parcial em O(n)).
+"""
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def rotulos_padrao(quantidade: int) -> List[str]:
+    """Retorna ['Tier 1', ..., 'Tier N']."""
+    return [f"Tier {i}" for i in range(1, quantidade + 1)]
+
+
+def _categorico(codigos: np.ndarray, rotulos: Sequence[str]) -> pd.Categorical:
+    return pd.Categorical.from_codes(codigos, categories=list(rotulos), ordered=True)
+
+
+def cortes_por_percentuais(total: int, percentuais: Sequence[float]) -> np.ndarray:
+    """
+    Converte percentuais de cada tier (ex: [20, 30, 30, 20]) nas posições de corte
+    acumuladas (ex: para 10 itens, [2, 5, 8]). O último tier recebe o restante.
+    """
+    acumulados = np.cumsum(percentuais[:-1], dtype=float)
+    return np.array([int(p / 100 * total) for p in acumulados], dtype=np.int64)
+
+
+def tiers_por_posicao(total: int,
+                      percentuais: Sequence[float],
+                      rotulos: Optional[Sequence[str]] = None) -> pd.Categorical:
+    """
+    Atribui tiers a linhas já ordenadas (posição 0 = melhor) de acordo com
+    a quantidade de linhas em cada tier.
+
+    Args:
+        total: Quantidade de linhas
+        percentuais: Percentual de linhas em cada tier (qualquer quantidade de tiers)
+        rotulos: Nome de cada tier (default: Tier 1..N)
+    """
+    rotulos = rotulos if rotulos is not None else rotulos_padrao(len(percentuais))
+    cortes = cortes_por_percentuais(total, percentuais)
+    codigos = np.searchsorted(cortes, np.arange(total), side="right")
+    return _categorico(codigos, rotulos)
+
+
+def tiers_por_participacao(participacao_acumulada: np.ndarray,
+                           cortes: Sequence[float],
+                           rotulos: Optional[Sequence[str]] = None) -> pd.Categorical:
+    """
+    Atribui tiers pela participação acumulada no valor total (0 a 1).
+    Uma linha fica no tier i se sua participação acumulada for <= cortes[i].
+
+    Args:
+        participacao_acumulada: Participação acumulada de cada linha (já ordenada)
+        cortes: Limites superiores de cada tier, exceto o último (ex: [0.2, 0.5, 0.8])
+        rotulos: Nome de cada tier (default: Tier 1..N)
+    """
+    rotulos = rotulos if rotulos is not None else rotulos_padrao(len(cortes) + 1)
+    codigos = np.searchsorted(np.asarray(cortes, dtype=float),
+                              np.asarray(participacao_acumulada, dtype=float),
+                              side="left")
+    return _categorico(codigos, rotulos)
+
+
+def limiares_por_percentuais(valores: np.ndarray, percentuais: Sequence[float]) -> np.ndarray:
+    """
+    Calcula o valor mínimo de cada tier (exceto o último) sem ordenar os dados,
+    usando seleção parcial (np.partition, O(n)).
+
+    O limiar do tier i é o k-ésimo maior valor, onde k é a posição de corte
+    acumulada (ver cortes_por_percentuais). Tiers vazios recebem +inf.
+    Valores NaN não participam da seleção.
+    """
+    valores = np.asarray(valores, dtype=float)
+    validos = valores[~np.isnan(valores)]
+    cortes = cortes_por_percentuais(len(valores), percentuais)
+
+    limiares = np.full(len(cortes), np.inf)
+    limiares[cortes > len(validos)] = -np.inf
+    selecionaveis = (cortes > 0) & (cortes <= len(validos))
+    if selecionaveis.any():
+        # k-ésimo maior = posição len - k na ordem crescente
+        posicoes = len(validos) - cortes[selecionaveis]
+        particionado = np.partition(validos, np.unique(posicoes))
+        limiares[selecionaveis] = particionado[posicoes]
+    return limiares
+
+
+def tiers_por_limiar(valores: np.ndarray,
+                     limiares: Sequence[float],
+                     rotulos: Optional[Sequence[str]] = None) -> pd.Categorical:
+    """
+    Atribui tiers comparando cada valor com os limiares decrescentes de cada tier,
+    sem reordenar as linhas. Empates no limiar ficam sempre no melhor tier, então
+    a atribuição é determinística (um tier pode ficar maior que o percentual nominal
+    quando há valores repetidos no corte). Valores NaN vão para o último tier.
+    """
+    valores = np.asarray(valores, dtype=float)
+    limiares = np.asarray(limiares, dtype=float)
+    rotulos = rotulos if rotulos is not None else rotulos_padrao(len(limiares) + 1)
+
+    # Código = quantidade de limiares estritamente maiores que o valor
+    crescentes = limiares[::-1]
+    codigos = len(limiares) - np.searchsorted(crescentes, valores, side="right")
+    codigos[np.isnan(valores)] = len(limiares)
+    return _categorico(codigos, rotulos)
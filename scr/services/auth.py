@@ -5,12 +5,19 @@ import os
 # Caminho do arquivo de usuários relativo ao diretório do script
 USUARIOS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'usuarios.json')
 
+# Usuários já lidos neste processo: (mtime, usuários)
+_usuarios_cache = None
+
 def carregar_usuarios() -> dict:
-    """Carrega usuários do arquivo JSON."""
-    if os.path.exists(USUARIOS_PATH):
+    """Carrega usuários do arquivo JSON (relido só quando o arquivo muda)."""
+    global _usuarios_cache
+    if not os.path.exists(USUARIOS_PATH):
+        return {}
+    mtime = os.path.getmtime(USUARIOS_PATH)
+    if _usuarios_cache is None or _usuarios_cache[0] != mtime:
         with open(USUARIOS_PATH, 'r') as f:
-            return json.load(f)
-    return {}
+            _usuarios_cache = (mtime, json.load(f))
+    return dict(_usuarios_cache[1])
 
 def salvar_usuario(usuario: str, senha: str) -> None:
     """
@@ -1 +1,272 @@
- 
\ No newline at end of file
+"""
+Registro em memória dos modelos de churn.
+
+Cada modelo é registrado com um nome (ex: 'weibull', futuramente 'rsf') e o
+caminho dos seus artefatos. O carregamento acontece uma vez por processo, na
+primeira consulta (ou no pré-carregamento da aplicação), e é refeito
+automaticamente quando o arquivo do modelo é regravado (mtime diferente), sem
+reiniciar o servidor. Versões diferentes convivem lado a lado no registro.
+
+Cada modelo tem um codificador de features (ver codificador_churn): o gravado
+junto do modelo no treino (atributo codificador_ do pickle), o JSON ao lado do
+modelo ou, para modelos antigos, um reconstruído da lista de features. As
+predições recebem os dados brutos dos clientes e o codificador é aplicado
+antes do modelo. Modelos Weibull AFT ganham na carga um motor de pontuação
+NumPy (ver pontuacao_churn); predict_median/predict_expectation passam por ele
+em vez do lifelines.
+
+Se o treino exportou o artefato leve do Weibull (CAMINHO_ARTEFATO, ver
+MotorWeibull.salvar), o modelo padrão é servido por ele: coeficientes abertos
+por mmap e codificador no manifesto, sem lifelines nem pickle na carga. Sem o
+artefato, o padrão continua sendo o pickle (modelo_final.pkl), que também fica
+disponível para diagnóstico. A escolha entre os dois é refeita a cada
+verificação de atualização: se um novo treino publica outro tipo de modelo e
+apaga o artefato, o registro passa a servir o pickle sem reiniciar.
+
+Para cada modelo ficam disponíveis (RegistroModelos.metricas):
+    - tempo de carregamento (sem instrumentação de memória) e tamanho em disco
+    - quantidade de predições, linhas e latência (média, última e máxima)
+"""
+
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.codificador_churn import CAMINHO_CODIFICADOR, CodificadorChurn
+from services.pontuacao_churn import ARQUIVO_MANIFESTO_ARTEFATO, MotorWeibull
+
+CAMINHO_DADOS = os.path.join(os.path.dirname(__file__), '..', 'data')
+CAMINHO_MODELO = os.path.join(CAMINHO_DADOS, 'modelo_final.pkl')
+CAMINHO_FEATURES = os.path.join(CAMINHO_DADOS, 'features_weibull.pkl')
+CAMINHO_ARTEFATO = os.path.join(CAMINHO_DADOS, 'modelo_churn')
+
+MODELO_PADRAO = 'weibull'
+
+# Métodos do lifelines atendidos pelo motor vetorizado
+METODOS_MOTOR = {'predict_median': 'mediana', 'predict_expectation': 'esperanca'}
+
+
+def carregar_pickle(caminho: str) -> Any:
+    with open(caminho, 'rb') as f:
+        return pickle.load(f)
+
+
+def artefato_disponivel(diretorio: str = CAMINHO_ARTEFATO) -> bool:
+    return os.path.exists(os.path.join(diretorio, ARQUIVO_MANIFESTO_ARTEFATO))
+
+
+def tamanho_em_disco(caminho: str) -> Optional[int]:
+    """Tamanho do arquivo do modelo ou, para o artefato leve, dos .npy e do manifesto."""
+    if os.path.isdir(caminho):
+        return sum(os.path.getsize(os.path.join(caminho, nome)) for nome in os.listdir(caminho)
+                   if nome.endswith('.npy') or nome == ARQUIVO_MANIFESTO_ARTEFATO)
+    return os.path.getsize(caminho) if os.path.exists(caminho) else None
+
+
+class ModeloRegistrado:
+    def __init__(self, nome: str, caminho_modelo: str, caminho_features: Optional[str] = None,
+                 carregador: Callable[[str], Any] = carregar_pickle,
+                 caminho_codificador: Optional[str] = None, caminho_artefato: Optional[str] = None):
+        self.nome = nome
+        self.caminho_modelo = caminho_modelo
+        self.caminho_features = caminho_features
+        self.caminho_codificador = caminho_codificador
+        self.carregador = carregador
+        self.caminho_artefato = caminho_artefato
+        self.caminho_carregado: Optional[str] = None
+        self.modelo = None
+        self.features: Optional[List[str]] = None
+        self.codificador: Optional[CodificadorChurn] = None
+        self.motor: Optional[MotorWeibull] = None
+        self._mtimes = None
+        self.carregado_em = None
+        self.segundos_carga = None
+        self.cargas = 0
+        self._zerar_latencias()
+
+    def _zerar_latencias(self):
+        self.predicoes = 0
+        self.linhas = 0
+        self.segundos_predicao = 0.0
+        self.ultima_latencia = None
+        self.maior_latencia = 0.0
+
+    def _fonte(self):
+        """
+        De onde carregar agora: o artefato leve, se registrado e presente, ou o
+        modelo registrado. Retorna (caminho_modelo, caminho_features, carregador,
+        caminho_codificador).
+        """
+        if self.caminho_artefato and artefato_disponivel(self.caminho_artefato):
+            return self.caminho_artefato, None, MotorWeibull.carregar, None
+        return self.caminho_modelo, self.caminho_features, self.carregador, self.caminho_codificador
+
+    def _mtimes_atuais(self, fonte=None):
+        caminho_modelo, caminho_features, _, caminho_codificador = fonte or self._fonte()
+        if os.path.isdir(caminho_modelo):
+            # Artefato leve: regravado inteiro, o manifesto muda a cada exportação
+            mtimes = [caminho_modelo, os.path.getmtime(os.path.join(caminho_modelo, ARQUIVO_MANIFESTO_ARTEFATO))]
+        else:
+            mtimes = [caminho_modelo, os.path.getmtime(caminho_modelo)]
+        if caminho_features:
+            mtimes.append(os.path.getmtime(caminho_features))
+        if caminho_codificador:
+            # O codificador é opcional (modelos antigos não têm)
+            mtimes.append(os.path.getmtime(caminho_codificador) if os.path.exists(caminho_codificador) else None)
+        return tuple(mtimes)
+
+    def carregado(self) -> bool:
+        return self.modelo is not None
+
+    def desatualizado(self) -> bool:
+        """Indica se algum artefato foi regravado (ou nunca foi carregado)."""
+        return not self.carregado() or self._mtimes_atuais() != self._mtimes
+
+    def carregar(self):
+        """Carrega (ou recarrega) o modelo e a lista de features, medindo o tempo."""
+        fonte = self._fonte()
+        caminho_modelo, caminho_features, carregador, _ = fonte
+        mtimes = self._mtimes_atuais(fonte)
+        inicio = time.perf_counter()
+        modelo = carregador(caminho_modelo)
+        features = carregar_pickle(caminho_features) if caminho_features else None
+        if isinstance(modelo, MotorWeibull):
+            # Artefato leve: o próprio motor traz features e codificador
+            motor, features, codificador = modelo, modelo.features, modelo.codificador
+        else:
+            codificador = self._carregar_codificador(modelo, features)
+            motor = (MotorWeibull.de_lifelines(modelo, features, codificador)
+                     if type(modelo).__name__ == 'WeibullAFTFitter' else None)
+        segundos = time.perf_counter() - inicio
+
+        self.modelo, self.features, self.motor, self._mtimes = modelo, features, motor, mtimes
+        self.codificador = codificador
+        self.caminho_carregado = caminho_modelo
+        self.segundos_carga = segundos
+        self.carregado_em = datetime.now().isoformat(timespec='seconds')
+        self.cargas += 1
+        self._zerar_latencias()  # Latências passam a ser da versão nova
+        print(f"🧠 Modelo '{self.nome}' ({os.path.basename(caminho_modelo)}) carregado em {segundos:.2f}s "
+              f"({(tamanho_em_disco(caminho_modelo) or 0) / 1024 ** 2:,.1f} MB em disco)")
+
+    def _carregar_codificador(self, modelo, features: Optional[List[str]]) -> Optional[CodificadorChurn]:
+        """Codificador gravado no modelo > JSON ao lado do modelo > reconstruído das features."""
+        if getattr(modelo, 'codificador_', None) is not None:
+            codificador = CodificadorChurn.de_dict(modelo.codificador_)
+        elif self.caminho_codificador and os.path.exists(self.caminho_codificador):
+            codificador = CodificadorChurn.carregar(self.caminho_codificador)
+        else:
+            return CodificadorChurn.de_features(features) if features is not None else None
+        if features is not None and codificador.features != list(features):
+            raise ValueError(f"Codificador do modelo '{self.nome}' não corresponde às features do modelo")
+        return codificador
+
+    def registrar_predicao(self, segundos: float, linhas: int):
+        self.predicoes += 1
+        self.linhas += linhas
+        self.segundos_predicao += segundos
+        self.ultima_latencia = segundos
+        self.maior_latencia = max(self.maior_latencia, segundos)
+
+    def metricas(self) -> Dict:
+        caminho = self.caminho_carregado or self._fonte()[0]
+        return {
+            'caminho_modelo': caminho,
+            'carregado': self.carregado(),
+            'carregado_em': self.carregado_em,
+            'cargas': self.cargas,
+            'tipo': type(self.modelo).__name__ if self.carregado() else None,
+            'motor_vetorizado': self.motor is not None,
+            'features': len(self.features) if self.features is not None else None,
+            'padronizacao': self.codificador is not None and bool(np.any(self.codificador.medias)),
+            'segundos_carga': self.segundos_carga,
+            'tamanho_arquivo_bytes': tamanho_em_disco(caminho),
+            'predicoes': self.predicoes,
+            'linhas_preditas': self.linhas,
+            'latencia_media_ms': 1000 * self.segundos_predicao / self.predicoes if self.predicoes else None,
+            'latencia_ultima_ms': 1000 * self.ultima_latencia if self.ultima_latencia is not None else None,
+            'latencia_max_ms': 1000 * self.maior_latencia if self.predicoes else None,
+        }
+
+
+class RegistroModelos:
+    def __init__(self):
+        self._modelos: Dict[str, ModeloRegistrado] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, nome: str, caminho_modelo: str, caminho_features: Optional[str] = None,
+                  carregador: Callable[[str], Any] = carregar_pickle,
+                  caminho_codificador: Optional[str] = None,
+                  caminho_artefato: Optional[str] = None) -> ModeloRegistrado:
+        """
+        Registra (ou substitui) um modelo pelo nome. O carregamento é feito na primeira consulta.
+
+        Args:
+            nome: Nome da versão (ex: 'weibull', 'rsf')
+            caminho_modelo: Arquivo do modelo (ou diretório do artefato leve, com carregador=MotorWeibull.carregar)
+            caminho_features: Pickle com a lista de features, na ordem esperada pelo modelo
+            carregador: Função que lê o arquivo do modelo (padrão: pickle)
+            caminho_codificador: JSON do codificador de features gravado no treino (opcional)
+            caminho_artefato: Artefato leve preferido enquanto existir (MotorWeibull.salvar);
+                sem ele, vale caminho_modelo
+        """
+        with self._lock:
+            self._modelos[nome] = ModeloRegistrado(nome, caminho_modelo, caminho_features, carregador,
+                                                   caminho_codificador, caminho_artefato)
+            return self._modelos[nome]
+
+    def nomes(self) -> List[str]:
+        return list(self._modelos)
+
+    def obter(self, nome: str = MODELO_PADRAO) -> ModeloRegistrado:
+        """
+        Retorna o modelo carregado, carregando-o na primeira vez ou se o arquivo mudou.
+        Levanta KeyError para nomes não registrados e FileNotFoundError se o arquivo não existir.
+        """
+        if nome not in self._modelos:
+            raise KeyError(f"Modelo não registrado: {nome} (disponíveis: {', '.join(self.nomes())})")
+        registrado = self._modelos[nome]
+        if registrado.desatualizado():
+            with self._lock:
+                if registrado.desatualizado():
+                    registrado.carregar()
+        return registrado
+
+    def prever(self, X, metodo: str = 'predict_median', nome: str = MODELO_PADRAO, **kwargs):
+        """
+        Chama um método de predição do modelo (ex: predict_median, predict_survival_function)
+        registrando a latência. X pode ser o DataFrame bruto dos clientes (o codificador
+        do modelo é aplicado) ou a matriz de features já codificada.
+        Se o modelo tiver motor vetorizado, os métodos que ele implementa
+        (METODOS_MOTOR ou os próprios: mediana, esperanca, sobrevivencia,
+        preditores_lineares) são atendidos por ele.
+        """
+        registrado = self.obter(nome)
+        alvo = registrado.modelo
+        if registrado.motor is not None and hasattr(registrado.motor, METODOS_MOTOR.get(metodo, metodo)):
+            alvo, metodo = registrado.motor, METODOS_MOTOR.get(metodo, metodo)
+        elif registrado.codificador is not None:
+            # O lifelines espera as colunas nomeadas, já codificadas
+            if isinstance(X, np.ndarray):
+                X = pd.DataFrame(X, columns=registrado.features or registrado.codificador.features)
+            elif not set(registrado.codificador.features).issubset(X.columns):
+                X = registrado.codificador.transformar_df(X)
+        inicio = time.perf_counter()
+        resultado = getattr(alvo, metodo)(X, **kwargs)
+        registrado.registrar_predicao(time.perf_counter() - inicio, len(X))
+        return resultado
+
+    def metricas(self) -> Dict[str, Dict]:
+        return {nome: registrado.metricas() for nome, registrado in self._modelos.items()}
+
+
+# Registro compartilhado pelo processo
+registro_modelos = RegistroModelos()
+registro_modelos.registrar(MODELO_PADRAO, CAMINHO_MODELO, CAMINHO_FEATURES,
+                           caminho_codificador=CAMINHO_CODIFICADOR, caminho_artefato=CAMINHO_ARTEFATO)
@@ -0,0 +1,141 @@
+"""
+Codificação das features do modelo de churn, compartilhada por treino e inferência.
+
+O vocabulário de cada coluna categórica é fixo; o primeiro valor é a categoria
+de referência (sem coluna própria, como no treino original). As colunas
+numéricas são padronizadas com média e desvio calculados no treino
+(equivalente ao StandardScaler). transformar escreve direto em uma matriz
+float32 pré-alocada a partir dos códigos das categorias, sem get_dummies nem
+DataFrames intermediários.
+
+Valores fora do vocabulário ficam como a categoria de referência; números
+ausentes ou inválidos recebem a média do treino (0 depois da padronização).
+O codificador é gravado em JSON ao lado do modelo (CAMINHO_CODIFICADOR).
+"""
+
+import os
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+CAMINHO_CODIFICADOR = os.path.join(os.path.dirname(__file__), '..', 'data', 'codificador_churn.json')
+
+VOCABULARIO = {
+    'perfil': [
+        'Básico Jovem', 'Básico Adulto', 'Básico Sênior',
+        'Intermediário Jovem', 'Intermediário Adulto', 'Intermediário Sênior',
+        'Premium Jovem', 'Premium Adulto', 'Premium Sênior'
+    ],
+    'canal_aquisicao': ['Orgânico', 'Indicação', 'Ads', 'Evento'],
+    'regiao': ['Sul', 'Sudeste', 'Centro-Oeste', 'Norte', 'Nordeste'],
+}
+
+COLUNAS_NUMERICAS = ['idade', 'tempo_casa', 'score_engajamento']
+
+
+class CodificadorChurn:
+    def __init__(self, vocabulario: Optional[Dict[str, List[str]]] = None,
+                 numericas: Optional[List[str]] = None,
+                 medias: Optional[List[float]] = None,
+                 desvios: Optional[List[float]] = None):
+        self.vocabulario = {coluna: list(valores) for coluna, valores in (vocabulario or VOCABULARIO).items()}
+        self.numericas = list(numericas or COLUNAS_NUMERICAS)
+        # Sem estatísticas (codificador ainda não ajustado) os números passam sem padronização
+        self.medias = np.asarray(medias if medias is not None else np.zeros(len(self.numericas)), dtype=np.float64)
+        self.desvios = np.asarray(desvios if desvios is not None else np.ones(len(self.numericas)), dtype=np.float64)
+
+    @property
+    def features(self) -> List[str]:
+        """Nomes das colunas da matriz, na ordem do modelo."""
+        nomes = []
+        for coluna, valores in self.vocabulario.items():
+            nomes += [f'{coluna}_{valor}' for valor in valores[1:]]
+        return nomes + self.numericas
+
+    @classmethod
+    def de_features(cls, features: List[str]) -> "CodificadorChurn":
+        """
+        Reconstrói o codificador a partir de uma lista de features antiga
+        (features_weibull.pkl), sem estatísticas de padronização.
+        """
+        categoricas = [c for c in VOCABULARIO]
+        vocabulario = {coluna: [None] for coluna in categoricas}
+        numericas = []
+        for nome in features:
+            coluna = next((c for c in categoricas if nome.startswith(f'{c}_')), None)
+            if coluna is None:
+                numericas.append(nome)
+            else:
+                vocabulario[coluna].append(nome[len(coluna) + 1:])
+        codificador = cls({c: v for c, v in vocabulario.items() if len(v) > 1}, numericas)
+        if codificador.features != list(features):
+            raise ValueError("Lista de features fora da ordem categóricas -> numéricas; "
+                             "não é possível reconstruir o codificador")
+        return codificador
+
+    def _numeros(self, df: pd.DataFrame) -> np.ndarray:
+        valores = np.empty((len(df), len(self.numericas)), dtype=np.float64)
+        for j, coluna in enumerate(self.numericas):
+            if coluna in df.columns:
+                valores[:, j] = pd.to_numeric(df[coluna], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                valores[:, j] = np.nan
+        return np.where(np.isnan(valores), self.medias, valores)
+
+    def ajustar(self, df: pd.DataFrame) -> "CodificadorChurn":
+        """Calcula média e desvio (populacional, como o StandardScaler) das colunas numéricas."""
+        self.medias = np.full(len(self.numericas), np.nan)  # Mantém os ausentes fora das estatísticas
+        valores = self._numeros(df)
+        self.medias = np.nan_to_num(np.nanmean(valores, axis=0))
+        desvios = np.nanstd(valores, axis=0)
+        self.desvios = np.where(np.nan_to_num(desvios) > 0, desvios, 1.0)
+        return self
+
+    def transformar(self, df: pd.DataFrame, dtype=np.float32) -> np.ndarray:
+        """
+        Monta a matriz de features (linhas de df x self.features).
+
+        Args:
+            df: Clientes com as colunas categóricas e numéricas (ausentes são toleradas)
+            dtype: Dtype da matriz (float32 por padrão)
+        """
+        X = np.zeros((len(df), len(self.features)), dtype=dtype)
+        inicio = 0
+        linhas = np.arange(len(df))
+        for coluna, valores in self.vocabulario.items():
+            largura = len(valores) - 1
+            if coluna in df.columns:
+                codigos = pd.Categorical(df[coluna], categories=valores[1:]).codes
+                marcadas = codigos >= 0
+                X[linhas[marcadas], inicio + codigos[marcadas]] = 1
+            inicio += largura
+        X[:, inicio:] = (self._numeros(df) - self.medias) / self.desvios
+        return X
+
+    def transformar_df(self, df: pd.DataFrame) -> pd.DataFrame:
+        """transformar como DataFrame com os nomes das features (para o lifelines)."""
+        return pd.DataFrame(self.transformar(df), columns=self.features, index=df.index)
+
+    def para_dict(self) -> Dict:
+        return {
+            'vocabulario': self.vocabulario,
+            'numericas': self.numericas,
+            'medias': self.medias.tolist(),
+            'desvios': self.desvios.tolist(),
+        }
+
+    @classmethod
+    def de_dict(cls, dados: Dict) -> "CodificadorChurn":
+        return cls(dados['vocabulario'], dados['numericas'], dados.get('medias'), dados.get('desvios'))
+
+    def salvar(self, caminho: str = CAMINHO_CODIFICADOR):
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        with open(caminho, 'w') as f:
+            json.dump(self.para_dict(), f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def carregar(cls, caminho: str = CAMINHO_CODIFICADOR) -> "CodificadorChurn":
+        with open(caminho, 'r') as f:
+            return cls.de_dict(json.load(f))
@@ -0,0 +1,315 @@
+"""
+Pontuação vetorizada de churn para o modelo Weibull AFT, sem lifelines na inferência.
+
+O WeibullAFTFitter ajustado é só um par de regressões lineares:
+
+    log λ(x) = x·β_λ + b_λ        log ρ(x) = x·β_ρ + b_ρ
+
+    S(t | x) = exp(-(t / λ)^ρ)
+    mediana  = λ · (ln 2)^(1/ρ)
+    E[T | x] = λ · Γ(1 + 1/ρ)
+
+Os coeficientes são extraídos uma vez (MotorWeibull.de_lifelines) em arrays
+NumPy alinhados à lista de features do modelo; a pontuação de N clientes vira
+um produto matriz-vetor por parâmetro, processado em lotes de tamanho fixo para
+limitar a memória. verificar_paridade compara o resultado com o lifelines.
+
+Com o codificador do treino (ver codificador_churn), o motor aceita os dados
+brutos dos clientes e aplica o mesmo one-hot e a mesma padronização do treino;
+verificar_preditores_lineares confirma que pontuar o conjunto de treino bruto
+reproduz os preditores lineares (log λ) vistos pelo lifelines no ajuste.
+
+MotorWeibull.salvar grava o motor como artefato leve, um diretório com os
+coeficientes em .npy e um manifesto JSON (interceptos, features, codificador e
+metadados do treino). MotorWeibull.carregar abre os .npy com
+np.load(mmap_mode='r'), sem lifelines nem pickle: a carga leva milissegundos.
+O pickle do modelo continua sendo gravado para diagnóstico.
+
+EsbocoQuantis resume as predições de vários lotes (contagem, média, mínimo,
+máximo e quantis aproximados) em memória constante, para pontuação em fluxo.
+"""
+
+import os
+import json
+import math
+import shutil
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from services.codificador_churn import CodificadorChurn
+
+# Linhas por lote (limita as matrizes intermediárias)
+TAMANHO_LOTE = 100000
+
+INTERCEPTO = 'Intercept'
+
+# Artefato leve do motor (ver MotorWeibull.salvar)
+ARQUIVO_MANIFESTO_ARTEFATO = 'manifesto.json'
+VERSAO_ARTEFATO = 1
+COEFICIENTES_ARTEFATO = ('coef_lambda', 'coef_rho')
+
+
+class MotorWeibull:
+    def __init__(self, features: List[str],
+                 coef_lambda: np.ndarray, intercepto_lambda: float,
+                 coef_rho: np.ndarray, intercepto_rho: float,
+                 codificador: Optional[CodificadorChurn] = None):
+        self.features = list(features)
+        self.codificador = codificador
+        self.coef_lambda = np.asarray(coef_lambda, dtype=np.float64)
+        self.intercepto_lambda = float(intercepto_lambda)
+        self.coef_rho = np.asarray(coef_rho, dtype=np.float64)
+        self.intercepto_rho = float(intercepto_rho)
+        self.metadados: Dict = {}
+        # ρ sem covariáveis (o padrão do lifelines) é uma constante
+        self._rho_constante = not np.any(self.coef_rho)
+
+    @classmethod
+    def de_lifelines(cls, modelo, features: Optional[List[str]] = None,
+                     codificador: Optional[CodificadorChurn] = None) -> "MotorWeibull":
+        """
+        Extrai os coeficientes de um WeibullAFTFitter ajustado.
+
+        Args:
+            modelo: WeibullAFTFitter ajustado
+            features: Ordem das colunas da matriz de entrada (None = as do codificador
+                ou as covariáveis de λ do modelo)
+            codificador: Codificador do treino, para pontuar dados brutos
+        """
+        if features is None and codificador is not None:
+            features = codificador.features
+        params = modelo.params_
+        lambda_ = params.loc['lambda_']
+        rho_ = params.loc['rho_']
+        if features is None:
+            features = [c for c in lambda_.index if c != INTERCEPTO]
+        desconhecidas = [c for c in list(lambda_.index) + list(rho_.index)
+                         if c != INTERCEPTO and c not in features]
+        if desconhecidas:
+            raise ValueError(f"Covariáveis do modelo ausentes da lista de features: {desconhecidas}")
+        return cls(
+            features,
+            lambda_.reindex(features, fill_value=0.0).to_numpy(),
+            lambda_.get(INTERCEPTO, 0.0),
+            rho_.reindex(features, fill_value=0.0).to_numpy(),
+            rho_.get(INTERCEPTO, 0.0),
+            codificador
+        )
+
+    def salvar(self, diretorio: str, metadados: Optional[Dict] = None):
+        """
+        Grava o motor como artefato: <coeficiente>.npy + manifesto JSON.
+        A troca é atômica (diretório temporário + rename).
+
+        Args:
+            diretorio: Diretório do artefato
+            metadados: Informações do treino (origem, métricas, versões...)
+        """
+        diretorio_tmp = diretorio + ".tmp"
+        shutil.rmtree(diretorio_tmp, ignore_errors=True)
+        os.makedirs(diretorio_tmp)
+        for nome in COEFICIENTES_ARTEFATO:
+            np.save(os.path.join(diretorio_tmp, nome + ".npy"), np.asarray(getattr(self, nome), dtype=np.float64))
+        manifesto = {
+            "versao": VERSAO_ARTEFATO,
+            "tipo": "WeibullAFT",
+            "gerado_em": datetime.now().isoformat(timespec="seconds"),
+            "features": self.features,
+            "intercepto_lambda": self.intercepto_lambda,
+            "intercepto_rho": self.intercepto_rho,
+            "codificador": self.codificador.para_dict() if self.codificador is not None else None,
+            "metadados": metadados or {},
+        }
+        with open(os.path.join(diretorio_tmp, ARQUIVO_MANIFESTO_ARTEFATO), "w") as f:
+            json.dump(manifesto, f, indent=2, ensure_ascii=False)
+        shutil.rmtree(diretorio, ignore_errors=True)
+        os.replace(diretorio_tmp, diretorio)
+
+    @classmethod
+    def carregar(cls, diretorio: str) -> "MotorWeibull":
+        """Abre um artefato gravado por salvar (coeficientes mapeados em memória, somente leitura)."""
+        with open(os.path.join(diretorio, ARQUIVO_MANIFESTO_ARTEFATO), "r") as f:
+            manifesto = json.load(f)
+        if manifesto.get("versao") != VERSAO_ARTEFATO:
+            raise ValueError(f"Versão de artefato não suportada: {manifesto.get('versao')}")
+        coeficientes = {nome: np.load(os.path.join(diretorio, nome + ".npy"), mmap_mode="r")
+                        for nome in COEFICIENTES_ARTEFATO}
+        codificador = CodificadorChurn.de_dict(manifesto["codificador"]) if manifesto["codificador"] else None
+        motor = cls(manifesto["features"], coeficientes["coef_lambda"], manifesto["intercepto_lambda"],
+                    coeficientes["coef_rho"], manifesto["intercepto_rho"], codificador)
+        motor.metadados = manifesto["metadados"]
+        return motor
+
+    def _matriz(self, X) -> np.ndarray:
+        """
+        Matriz (n, features) na ordem do modelo. DataFrames com as colunas das
+        features são reordenados; os demais (dados brutos) passam pelo codificador.
+        """
+        if isinstance(X, pd.DataFrame):
+            if self.codificador is not None and not set(self.features).issubset(X.columns):
+                X = self.codificador.transformar(X)
+            else:
+                X = X[self.features]
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != len(self.features):
+            raise ValueError(f"Esperadas {len(self.features)} colunas, recebido formato {X.shape}")
+        return X
+
+    def _lotes(self, X: np.ndarray, tamanho_lote: int):
+        for inicio in range(0, len(X), tamanho_lote):
+            yield inicio, np.asarray(X[inicio:inicio + tamanho_lote], dtype=np.float64)
+
+    def parametros(self, X, tamanho_lote: int = TAMANHO_LOTE):
+        """Retorna (λ, ρ) de cada linha."""
+        X = self._matriz(X)
+        lambda_ = np.empty(len(X))
+        rho_ = np.empty(len(X))
+        with np.errstate(over='ignore'):
+            for inicio, lote in self._lotes(X, tamanho_lote):
+                fim = inicio + len(lote)
+                lambda_[inicio:fim] = np.exp(lote @ self.coef_lambda + self.intercepto_lambda)
+                if self._rho_constante:
+                    rho_[inicio:fim] = math.exp(self.intercepto_rho)
+                else:
+                    rho_[inicio:fim] = np.exp(lote @ self.coef_rho + self.intercepto_rho)
+        return lambda_, rho_
+
+    def preditores_lineares(self, X, tamanho_lote: int = TAMANHO_LOTE) -> np.ndarray:
+        """log λ de cada linha (o preditor linear do AFT)."""
+        X = self._matriz(X)
+        resultado = np.empty(len(X))
+        for inicio, lote in self._lotes(X, tamanho_lote):
+            resultado[inicio:inicio + len(lote)] = lote @ self.coef_lambda + self.intercepto_lambda
+        return resultado
+
+    def mediana(self, X, tamanho_lote: int = TAMANHO_LOTE) -> np.ndarray:
+        """Tempo mediano até o churn."""
+        lambda_, rho_ = self.parametros(X, tamanho_lote)
+        with np.errstate(over='ignore'):
+            return lambda_ * np.log(2) ** (1 / rho_)
+
+    def esperanca(self, X, tamanho_lote: int = TAMANHO_LOTE) -> np.ndarray:
+        """Tempo esperado até o churn, E[T | x]."""
+        lambda_, rho_ = self.parametros(X, tamanho_lote)
+        # Γ(1 + 1/ρ) avaliada só nos valores distintos de ρ (normalmente um único)
+        distintos, posicoes = np.unique(rho_, return_inverse=True)
+        fator = np.array([math.gamma(1 + 1 / r) for r in distintos])[posicoes]
+        with np.errstate(over='ignore', invalid='ignore'):
+            return lambda_ * fator
+
+    def sobrevivencia(self, X, tempos: Sequence[float], tamanho_lote: int = TAMANHO_LOTE,
+                      dtype=np.float64) -> np.ndarray:
+        """
+        Probabilidade de continuar cliente em cada horizonte.
+
+        Args:
+            X: Matriz de features (n linhas)
+            tempos: Horizontes, na unidade de tempo do treino (ex: [30, 90, 180, 365] dias)
+            tamanho_lote: Linhas por lote
+            dtype: Dtype do resultado (float32 reduz a memória pela metade)
+
+        Returns:
+            Matriz (n, horizontes)
+        """
+        X = self._matriz(X)
+        tempos = np.asarray(tempos, dtype=np.float64).reshape(1, -1)
+        resultado = np.empty((len(X), tempos.shape[1]), dtype=dtype)
+        for inicio in range(0, len(X), tamanho_lote):
+            lambda_, rho_ = self.parametros(X[inicio:inicio + tamanho_lote], tamanho_lote)
+            with np.errstate(over='ignore', divide='ignore'):
+                resultado[inicio:inicio + len(lambda_)] = np.exp(-(tempos / lambda_[:, None]) ** rho_[:, None])
+        return resultado
+
+
+class EsbocoQuantis:
+    """
+    Histograma com bins em escala logarítmica para quantis em fluxo.
+    O erro relativo de um quantil é no máximo a largura relativa de um bin
+    ((maximo / minimo) ** (1 / bins) - 1, ~0,6% com os valores padrão); valores
+    fora do intervalo (incluindo infinito) caem nos bins das pontas e são
+    representados pelo menor/maior valor visto. NaN é ignorado.
+    """
+
+    def __init__(self, minimo: float = 1e-3, maximo: float = 1e7, bins: int = 4096):
+        self.limites = np.geomspace(minimo, maximo, bins + 1)
+        self.contagens = np.zeros(bins + 2, dtype=np.int64)  # [abaixo, bins..., acima]
+        self.quantidade = 0
+        self.soma = 0.0
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    def adicionar(self, valores: np.ndarray):
+        valores = np.asarray(valores, dtype=np.float64)
+        valores = valores[~np.isnan(valores)]
+        if len(valores) == 0:
+            return
+        posicoes = np.searchsorted(self.limites, valores, side='right')
+        self.contagens += np.bincount(posicoes, minlength=len(self.contagens))
+        self.quantidade += len(valores)
+        self.soma += float(valores.sum())
+        self.minimo = min(self.minimo, float(valores.min()))
+        self.maximo = max(self.maximo, float(valores.max()))
+
+    def quantil(self, q: float) -> float:
+        if self.quantidade == 0:
+            return float('nan')
+        alvo = q * (self.quantidade - 1)
+        posicao = int(np.searchsorted(np.cumsum(self.contagens), alvo, side='right'))
+        if posicao == 0:
+            return self.minimo
+        if posicao == len(self.contagens) - 1:
+            return self.maximo
+        # Centro geométrico do bin, limitado aos extremos observados
+        centro = float(np.sqrt(self.limites[posicao - 1] * self.limites[posicao]))
+        return min(max(centro, self.minimo), self.maximo)
+
+    def media(self) -> float:
+        return self.soma / self.quantidade if self.quantidade else float('nan')
+
+
+def verificar_preditores_lineares(modelo, codificador: CodificadorChurn,
+                                  df_bruto: pd.DataFrame, X_treino: pd.DataFrame) -> float:
+    """
+    Confere que o caminho de inferência (dados brutos -> codificador -> motor)
+    reproduz os preditores lineares do treino.
+
+    Args:
+        modelo: WeibullAFTFitter ajustado com X_treino
+        codificador: Codificador persistido com o modelo
+        df_bruto: Linhas de treino antes da codificação
+        X_treino: Matriz de features usada no ajuste (mesmas linhas de df_bruto)
+
+    Returns:
+        Maior diferença absoluta de log λ
+    """
+    # S(λ) = e^-1, então o percentil e^-1 do lifelines é o próprio λ
+    esperado = np.log(np.asarray(modelo.predict_percentile(X_treino, p=math.exp(-1)), dtype=np.float64))
+    obtido = MotorWeibull.de_lifelines(modelo, codificador=codificador).preditores_lineares(df_bruto)
+    return float(np.max(np.abs(esperado - obtido))) if len(obtido) else 0.0
+
+
+def verificar_paridade(modelo, X: pd.DataFrame, tempos: Sequence[float] = (30, 90, 180, 365),
+                       features: Optional[List[str]] = None) -> Dict[str, float]:
+    """
+    Compara o motor com o lifelines nas mesmas linhas e retorna o maior erro
+    relativo de mediana, esperança e sobrevivência (linhas com valores finitos).
+    """
+    motor = MotorWeibull.de_lifelines(modelo, features or list(X.columns))
+
+    def erro(esperado, obtido) -> float:
+        esperado, obtido = np.asarray(esperado, dtype=np.float64), np.asarray(obtido, dtype=np.float64)
+        finitos = np.isfinite(esperado) & np.isfinite(obtido)
+        if not finitos.any():
+            return 0.0
+        escala = np.maximum(np.abs(esperado[finitos]), np.finfo(np.float64).tiny)
+        return float(np.max(np.abs(esperado[finitos] - obtido[finitos]) / escala))
+
+    sobrevivencia_lifelines = modelo.predict_survival_function(X, times=list(tempos)).T.to_numpy()
+    return {
+        'mediana': erro(modelo.predict_median(X), motor.mediana(X)),
+        'esperanca': erro(modelo.predict_expectation(X), motor.esperanca(X)),
+        'sobrevivencia': erro(sobrevivencia_lifelines, motor.sobrevivencia(X, tempos)),
+    }
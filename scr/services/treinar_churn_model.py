@@ -1,111 +1,397 @@
-import pandas as pd
-import numpy as np
-import pickle
-from lifelines import WeibullAFTFitter
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import accuracy_score, roc_auc_score
-from sksurv.ensemble import RandomSurvivalForest
-from sksurv.metrics import concordance_index_censored
+"""
+Treino e comparação dos modelos de churn.
+
+Weibull AFT e Cox PH (lifelines) e Random Survival Forest (scikit-survival,
+n_jobs=-1) são treinados em paralelo, cada um em um processo novo. Para cada
+modelo são medidos, no próprio processo:
+    - tempo de treino (parede) e pico de memória (RSS máximo do processo)
+    - tamanho do modelo em disco (pickle)
+    - latência de pontuação de 1 linha (mediana de várias repetições) e de 100 mil linhas
+    - índice de concordância (C-index) e ROC-AUC de churn no conjunto de teste
+
+O vencedor é o de maior C-index. Ele é gravado em modelo_final.pkl (com a lista
+de features e o codificador, ver codificador_churn) se a aplicação souber
+servi-lo; senão é publicado o melhor entre os que ela serve, e o JSON registra
+os dois. Todos os candidatos ficam em scr/data/modelos_churn/ para diagnóstico.
+Quando o publicado é o Weibull, também é exportado o artefato leve
+(scr/data/modelo_churn/, ver MotorWeibull.salvar) que a aplicação carrega sem
+lifelines; o pickle continua gravado para diagnóstico.
+
+O treino é reprodutível: a semente fixa o split, a floresta e a amostra usada na
+latência, e o JSON de métricas registra a semente, o SHA-256 do CSV e as
+versões das bibliotecas. Com vários processos os tempos sofrem concorrência
+pela CPU; use --processos 1 para medir cada modelo isolado.
+
+Uso (a partir da raiz do projeto):
+    PYTHONPATH=scr python -m services.treinar_churn_model
+    PYTHONPATH=scr python -m services.treinar_churn_model --csv tests/clientes_historico.csv --candidatos weibull cox
+"""
+
+import os
+import sys
 import json
+import time
+import pickle
+import shutil
+import hashlib
+import argparse
+import resource
+import multiprocessing
+from datetime import datetime
+from importlib import metadata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from services.churn_model import CAMINHO_ARTEFATO, CAMINHO_DADOS, CAMINHO_FEATURES, CAMINHO_MODELO
+from services.codificador_churn import CAMINHO_CODIFICADOR, CodificadorChurn
+from services.pontuacao_churn import MotorWeibull, verificar_paridade, verificar_preditores_lineares
 
 # Caminho do arquivo de clientes históricos
-csv_path = 'tests/clientes_historico.csv'  # ou 'scr/data/clientes_historico.csv'
-
-print('Lendo base de clientes históricos...')
-clientes = pd.read_csv(csv_path, parse_dates=['data_entrada', 'data_churn'])
-print(f'Base carregada: {len(clientes)} clientes')
-
-# Feature engineering
-print('Calculando duração e variável churned...')
-clientes['duracao'] = (clientes['data_churn'].fillna(pd.Timestamp('today')) - clientes['data_entrada']).dt.days
-clientes['churned'] = clientes['data_churn'].notnull().astype(int)
-
-# One-hot encoding igual ao app
-print('Fazendo one-hot encoding...')
-perfis = [
-    'Básico Jovem', 'Básico Adulto', 'Básico Sênior',
-    'Intermediário Jovem', 'Intermediário Adulto', 'Intermediário Sênior',
-    'Premium Jovem', 'Premium Adulto', 'Premium Sênior'
-]
-canais = ['Orgânico', 'Indicação', 'Ads', 'Evento']
-regioes = ['Sul', 'Sudeste', 'Centro-Oeste', 'Norte', 'Nordeste']
-
-for p in perfis[1:]:
-    clientes[f'perfil_{p}'] = (clientes['perfil'] == p).astype(int)
-for c in canais[1:]:
-    clientes[f'canal_aquisicao_{c}'] = (clientes['canal_aquisicao'] == c).astype(int)
-for r in regioes[1:]:
-    clientes[f'regiao_{r}'] = (clientes['regiao'] == r).astype(int)
-
-num_features = ['idade', 'tempo_casa', 'score_engajamento']
-print('Normalizando variáveis numéricas...')
-clientes[num_features] = StandardScaler().fit_transform(clientes[num_features])
-
-# Features finais (iguais ao app)
-print('Montando features finais...')
-features = []
-features += [f'perfil_{p}' for p in perfis[1:]]
-features += [f'canal_aquisicao_{c}' for c in canais[1:]]
-features += [f'regiao_{r}' for r in regioes[1:]]
-features += num_features
-print(f'Features finais: {features}')
-
-X = clientes[features]
-y = clientes[['duracao', 'churned']]
-
-# Separar treino/teste
-print('Separando treino e teste...')
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-print(f'Treino: {len(X_train)} | Teste: {len(X_test)}')
-
-# WeibullAFT
-print('Treinando modelo WeibullAFT...')
-train_weibull = X_train.copy()
-train_weibull['duracao'] = y_train['duracao']
-train_weibull['churned'] = y_train['churned']
-weibull = WeibullAFTFitter()
-weibull.fit(train_weibull, duration_col='duracao', event_col='churned')
-print('Modelo WeibullAFT treinado.')
-
-# Avaliação: previsão de churn em até 12 meses (365 dias)
-def avaliar_modelo(model, X, y, tipo='weibull'):
-    if tipo == 'weibull':
-        y_pred_dias = model.predict_expectation(X)
-    else:
-        return 0, 0
-    y_pred_churn = (y_pred_dias < 365).astype(int)
-    acc = accuracy_score(y['churned'], y_pred_churn)
-    try:
-        roc = roc_auc_score(y['churned'], -y_pred_dias)  # quanto menor o tempo, maior o risco
-    except:
-        roc = float('nan')
-    return acc, roc
-
-acc_w, roc_w = avaliar_modelo(weibull, X_test, y_test, tipo='weibull')
-
-print('--- Avaliação do Modelo WeibullAFT ---')
-print(f'WeibullAFT:    Acurácia={acc_w:.2%}  ROC-AUC={roc_w:.2%}')
-
-melhor_modelo = weibull
-melhor_nome = 'WeibullAFT'
-
-# Salvar modelo e features
-with open('scr/data/modelo_final.pkl', 'wb') as f:
-    pickle.dump(melhor_modelo, f)
-with open('scr/data/features_weibull.pkl', 'wb') as f:
-    pickle.dump(features, f)
-
-print(f'Melhor modelo: {melhor_nome}')
-print('Modelo treinado e salvo em scr/data/modelo_final.pkl')
-print('Features salvas em scr/data/features_weibull.pkl')
-
-# Salvar métricas do melhor modelo
-metrics = {
-    'modelo': melhor_nome,
-    'acuracia': float(acc_w),
-    'roc_auc': float(roc_w)
+CAMINHO_CSV = 'tests/clientes_historico.csv'  # ou 'scr/data/clientes_historico.csv'
+CAMINHO_METRICAS = os.path.join(CAMINHO_DADOS, 'churn_model_metrics.json')
+DIRETORIO_CANDIDATOS = os.path.join(CAMINHO_DADOS, 'modelos_churn')
+
+SEMENTE = 42
+FRACAO_TESTE = 0.2
+LINHAS_LATENCIA = 100000
+REPETICOES_LATENCIA = 20
+# Erro máximo aceito entre os preditores lineares do treino e os da inferência
+TOLERANCIA_PREDITORES = 1e-4
+# Erro relativo máximo aceito entre o motor NumPy e o lifelines (mediana, esperança, sobrevivência)
+TOLERANCIA_PARIDADE = 1e-9
+
+BIBLIOTECAS = ['numpy', 'pandas', 'lifelines', 'scikit-learn', 'scikit-survival']
+
+
+def _tabela_lifelines(X: pd.DataFrame, y: pd.DataFrame) -> pd.DataFrame:
+    tabela = X.copy()
+    tabela['duracao'] = y['duracao']
+    tabela['churned'] = y['churned']
+    return tabela
+
+
+def _treinar_weibull(X: pd.DataFrame, y: pd.DataFrame, semente: int):
+    from lifelines import WeibullAFTFitter
+    return WeibullAFTFitter().fit(_tabela_lifelines(X, y), duration_col='duracao', event_col='churned')
+
+
+def _treinar_cox(X: pd.DataFrame, y: pd.DataFrame, semente: int):
+    from lifelines import CoxPHFitter
+    # Penalização leve: sem ela o Newton-Raphson não converge com as dummies quase separáveis
+    return CoxPHFitter(penalizer=0.01).fit(_tabela_lifelines(X, y), duration_col='duracao', event_col='churned')
+
+
+def _treinar_rsf(X: pd.DataFrame, y: pd.DataFrame, semente: int):
+    from sksurv.ensemble import RandomSurvivalForest
+    from sksurv.util import Surv
+    # low_memory: as folhas guardam só o risco (predict), não as curvas de sobrevivência,
+    # o que reduz o pickle de GBs para MBs
+    modelo = RandomSurvivalForest(n_estimators=100, min_samples_split=10, min_samples_leaf=15,
+                                  n_jobs=-1, random_state=semente, low_memory=True)
+    return modelo.fit(X, Surv.from_arrays(y['churned'].astype(bool), y['duracao']))
+
+
+# Pontuadores: recebem o modelo e o codificador e devolvem uma função X -> risco
+# (maior = churn mais cedo). É o caminho medido na latência.
+def _risco_weibull(modelo, codificador: CodificadorChurn) -> Callable:
+    motor = MotorWeibull.de_lifelines(modelo, codificador=codificador)
+    return lambda X: -motor.mediana(X)
+
+
+def _risco_cox(modelo, codificador: CodificadorChurn) -> Callable:
+    return lambda X: np.asarray(modelo.predict_partial_hazard(X))
+
+
+def _risco_rsf(modelo, codificador: CodificadorChurn) -> Callable:
+    return lambda X: modelo.predict(X)
+
+
+# nome: treino, pontuador e se a aplicação (services.churn_model) consegue servir o modelo.
+# Cox não é servível: predict_median dá inf quando a sobrevivência não cai abaixo
+# de 0,5 no horizonte observado, e a página de churn mostraria médias infinitas.
+CANDIDATOS: Dict[str, Dict] = {
+    'weibull': {'treinar': _treinar_weibull, 'risco': _risco_weibull, 'servivel': True},
+    'cox': {'treinar': _treinar_cox, 'risco': _risco_cox, 'servivel': False},
+    'rsf': {'treinar': _treinar_rsf, 'risco': _risco_rsf, 'servivel': False},
 }
-with open('scr/data/churn_model_metrics.json', 'w') as f:
-    json.dump(metrics, f, indent=2)
-print(f'Métricas salvas em scr/data/churn_model_metrics.json') 
\ No newline at end of file
+
+
+def _pico_memoria_mb() -> float:
+    """RSS máximo do processo até agora (ru_maxrss é em KB no Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def carregar_clientes(caminho_csv: str = CAMINHO_CSV) -> pd.DataFrame:
+    """Lê os clientes históricos e calcula duração (dias) e a variável churned."""
+    clientes = pd.read_csv(caminho_csv, parse_dates=['data_entrada', 'data_churn'])
+    clientes['duracao'] = (clientes['data_churn'].fillna(pd.Timestamp('today')) - clientes['data_entrada']).dt.days
+    clientes['churned'] = clientes['data_churn'].notnull().astype(int)
+    return clientes
+
+
+def treinar_candidato(nome: str, dados: Dict, codificador_dict: Dict, semente: int, diretorio: str) -> Dict:
+    """
+    Treina, grava e avalia um candidato. Roda em um processo próprio.
+
+    Args:
+        nome: Chave de CANDIDATOS
+        dados: X_treino, y_treino, X_teste, y_teste e brutos_treino (linhas de treino não codificadas)
+        codificador_dict: Codificador ajustado (CodificadorChurn.para_dict)
+        semente: Semente do modelo e da amostra de latência
+        diretorio: Onde gravar <nome>.pkl
+
+    Returns:
+        Métricas do candidato
+    """
+    from sksurv.metrics import concordance_index_censored
+    from sklearn.metrics import roc_auc_score
+
+    candidato = CANDIDATOS[nome]
+    codificador = CodificadorChurn.de_dict(codificador_dict)
+    X_treino, y_treino = dados['X_treino'], dados['y_treino']
+    X_teste, y_teste = dados['X_teste'], dados['y_teste']
+
+    memoria_inicial = _pico_memoria_mb()
+    inicio = time.perf_counter()
+    modelo = candidato['treinar'](X_treino, y_treino, semente)
+    segundos_treino = time.perf_counter() - inicio
+    pico_treino = _pico_memoria_mb()
+
+    # O pipeline de features (vocabulário, médias/desvios e ordem das colunas) vai dentro do modelo
+    modelo.codificador_ = codificador_dict
+    metricas = {'tipo': type(modelo).__name__, 'servivel': candidato['servivel']}
+
+    if nome == 'weibull':
+        # Pontuar o treino bruto pelo caminho de inferência deve reproduzir os preditores lineares do ajuste
+        erro = verificar_preditores_lineares(modelo, codificador, dados['brutos_treino'], X_treino)
+        if erro > TOLERANCIA_PREDITORES:
+            raise RuntimeError(f'Inferência não reproduz o treino (erro máximo de log λ = {erro:.2e})')
+        metricas['erro_preditores_lineares'] = erro
+        # O motor que serve o modelo deve reproduzir o lifelines nas linhas de teste
+        paridade = verificar_paridade(modelo, X_teste, features=codificador.features)
+        if max(paridade.values()) > TOLERANCIA_PARIDADE:
+            raise RuntimeError('Motor vetorizado diverge do lifelines (erro relativo máximo: '
+                               + ', '.join(f'{k} = {v:.2e}' for k, v in paridade.items()) + ')')
+        metricas['erro_paridade_motor'] = paridade
+
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f'{nome}.pkl')
+    with open(caminho, 'wb') as f:
+        pickle.dump(modelo, f)
+
+    risco = candidato['risco'](modelo, codificador)
+    risco_teste = np.asarray(risco(X_teste), dtype=np.float64)
+    eventos = y_teste['churned'].to_numpy().astype(bool)
+    c_index = concordance_index_censored(eventos, y_teste['duracao'].to_numpy(dtype=np.float64), risco_teste)[0]
+    try:
+        roc_auc = roc_auc_score(eventos, risco_teste)
+    except ValueError:
+        roc_auc = float('nan')
+
+    uma_linha = X_teste.iloc[:1]
+    tempos = []
+    for _ in range(REPETICOES_LATENCIA):
+        inicio = time.perf_counter()
+        risco(uma_linha)
+        tempos.append(time.perf_counter() - inicio)
+    amostra = X_teste.sample(LINHAS_LATENCIA, replace=True, random_state=semente).reset_index(drop=True)
+    inicio = time.perf_counter()
+    risco(amostra)
+    segundos_lote = time.perf_counter() - inicio
+
+    metricas.update({
+        'arquivo': caminho,
+        'segundos_treino': segundos_treino,
+        'pico_memoria_treino_mb': pico_treino,
+        'memoria_treino_mb': pico_treino - memoria_inicial,
+        'pico_memoria_mb': _pico_memoria_mb(),
+        'tamanho_bytes': os.path.getsize(caminho),
+        'latencia_1_linha_ms': 1000 * float(np.median(tempos)),
+        f'latencia_{LINHAS_LATENCIA}_linhas_ms': 1000 * segundos_lote,
+        'c_index': float(c_index),
+        'roc_auc': float(roc_auc),
+    })
+    return metricas
+
+
+def _sha256(caminho: str) -> str:
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _versoes() -> Dict[str, Optional[str]]:
+    versoes = {'python': sys.version.split()[0]}
+    for nome in BIBLIOTECAS:
+        try:
+            versoes[nome] = metadata.version(nome)
+        except metadata.PackageNotFoundError:
+            versoes[nome] = None
+    return versoes
+
+
+def _gravar_atomico(caminho: str, conteudo: bytes):
+    temporario = f'{caminho}.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(conteudo)
+    os.replace(temporario, caminho)
+
+
+def publicar_modelo(caminho_candidato: str, codificador: CodificadorChurn,
+                    caminho_modelo: str = CAMINHO_MODELO, caminho_features: str = CAMINHO_FEATURES,
+                    caminho_codificador: str = CAMINHO_CODIFICADOR):
+    """
+    Grava o modelo escolhido onde a aplicação o carrega. Features e codificador
+    vão antes do modelo; o registro recarrega quando os arquivos mudam.
+    """
+    _gravar_atomico(caminho_features, pickle.dumps(codificador.features))
+    codificador.salvar(caminho_codificador)
+    with open(caminho_candidato, 'rb') as f:
+        _gravar_atomico(caminho_modelo, f.read())
+
+
+def exportar_artefato(modelo, codificador: CodificadorChurn, metadados: Dict,
+                      diretorio: str = CAMINHO_ARTEFATO):
+    """Exporta o Weibull publicado como artefato leve (coeficientes .npy + manifesto JSON)."""
+    MotorWeibull.de_lifelines(modelo, codificador=codificador).salvar(diretorio, metadados)
+
+
+def treinar_modelos(caminho_csv: str = CAMINHO_CSV, candidatos: Optional[List[str]] = None,
+                    processos: Optional[int] = None, semente: int = SEMENTE,
+                    diretorio: str = DIRETORIO_CANDIDATOS, caminho_metricas: str = CAMINHO_METRICAS,
+                    publicar: bool = True) -> Dict:
+    """
+    Treina os candidatos em paralelo, escolhe o vencedor e grava modelo e métricas.
+
+    Args:
+        caminho_csv: Clientes históricos
+        candidatos: Nomes de CANDIDATOS (padrão: todos)
+        processos: Processos em paralelo (padrão: um por candidato)
+        semente: Semente do split, dos modelos e da amostra de latência
+        diretorio: Onde ficam os pickles de todos os candidatos
+        caminho_metricas: JSON de métricas
+        publicar: Gravar o modelo escolhido em modelo_final.pkl
+
+    Returns:
+        Conteúdo do JSON de métricas
+    """
+    from sklearn.model_selection import train_test_split
+
+    candidatos = list(candidatos or CANDIDATOS)
+    desconhecidos = [c for c in candidatos if c not in CANDIDATOS]
+    if desconhecidos:
+        raise ValueError(f"Candidatos desconhecidos: {desconhecidos} (disponíveis: {', '.join(CANDIDATOS)})")
+
+    print('📂 Lendo base de clientes históricos...')
+    clientes = carregar_clientes(caminho_csv)
+    print(f'   {len(clientes)} clientes')
+
+    # One-hot + padronização com o mesmo codificador usado pelo app (vocabulário fixo)
+    codificador = CodificadorChurn().ajustar(clientes)
+    X = codificador.transformar_df(clientes)
+    y = clientes[['duracao', 'churned']]
+    X_treino, X_teste, y_treino, y_teste = train_test_split(X, y, test_size=FRACAO_TESTE, random_state=semente)
+    print(f'   Treino: {len(X_treino)} | Teste: {len(X_teste)} | Features: {len(codificador.features)}')
+    dados = {
+        'X_treino': X_treino, 'y_treino': y_treino, 'X_teste': X_teste, 'y_teste': y_teste,
+        'brutos_treino': clientes.loc[X_treino.index],
+    }
+
+    processos = processos or len(candidatos)
+    print(f'🚀 Treinando {", ".join(candidatos)} em {processos} processo(s)...')
+    inicio = time.perf_counter()
+    resultados = {}
+    # spawn + um processo por tarefa: cada modelo mede a própria memória, sem herdar a do pai
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto, max_tasks_per_child=1) as executor:
+        futuros = {
+            executor.submit(treinar_candidato, nome, dados, codificador.para_dict(), semente, diretorio): nome
+            for nome in candidatos
+        }
+        for futuro in as_completed(futuros):
+            nome = futuros[futuro]
+            resultados[nome] = futuro.result()
+            m = resultados[nome]
+            print(f"   ✅ {nome}: C-index {m['c_index']:.4f} | treino {m['segundos_treino']:.1f}s | "
+                  f"pico {m['pico_memoria_treino_mb']:,.0f} MB | {m['tamanho_bytes'] / 1024 ** 2:,.1f} MB em disco | "
+                  f"1 linha {m['latencia_1_linha_ms']:.2f} ms | "
+                  f"{LINHAS_LATENCIA:,} linhas {m[f'latencia_{LINHAS_LATENCIA}_linhas_ms']:,.0f} ms")
+    segundos = time.perf_counter() - inicio
+    sha256_csv = _sha256(caminho_csv)
+
+    ordem = sorted(resultados, key=lambda nome: resultados[nome]['c_index'], reverse=True)
+    vencedor = ordem[0]
+    publicado = next((nome for nome in ordem if resultados[nome]['servivel']), None)
+    print(f'🏆 Vencedor (C-index): {vencedor}')
+    if publicado != vencedor:
+        print(f'⚠️ {vencedor} não é servido pela aplicação; publicando {publicado}')
+
+    if publicar and publicado is not None:
+        publicar_modelo(resultados[publicado]['arquivo'], codificador)
+        print(f'💾 Modelo {publicado} salvo em {CAMINHO_MODELO}')
+        if publicado == 'weibull':
+            with open(resultados[publicado]['arquivo'], 'rb') as f:
+                modelo = pickle.load(f)
+            exportar_artefato(modelo, codificador, {
+                'origem': os.path.basename(CAMINHO_MODELO),
+                'c_index': resultados[publicado]['c_index'],
+                'semente': semente,
+                'sha256_csv': sha256_csv,
+                'versoes': _versoes(),
+            })
+            print(f'💾 Artefato leve salvo em {CAMINHO_ARTEFATO}')
+        elif os.path.exists(CAMINHO_ARTEFATO):
+            # O artefato é só do Weibull; um antigo passaria na frente do modelo novo
+            shutil.rmtree(CAMINHO_ARTEFATO)
+            print(f'🗑️ Artefato leve antigo removido ({CAMINHO_ARTEFATO})')
+
+    metricas = {
+        'modelo': resultados[publicado]['tipo'] if publicado else None,
+        'vencedor': vencedor,
+        'modelo_publicado': publicado if publicar else None,
+        'criterio': 'c_index',
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'segundos_total': segundos,
+        'processos': processos,
+        'semente': semente,
+        'csv': caminho_csv,
+        'sha256_csv': sha256_csv,
+        'linhas_treino': len(X_treino),
+        'linhas_teste': len(X_teste),
+        'features': codificador.features,
+        'versoes': _versoes(),
+        'modelos': {nome: resultados[nome] for nome in ordem},
+    }
+    os.makedirs(os.path.dirname(caminho_metricas) or '.', exist_ok=True)
+    with open(caminho_metricas, 'w') as f:
+        json.dump(metricas, f, indent=2, ensure_ascii=False)
+    print(f'📊 Métricas salvas em {caminho_metricas}')
+    return metricas
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Treino e comparação dos modelos de churn")
+    parser.add_argument("--csv", default=CAMINHO_CSV, help="CSV de clientes históricos")
+    parser.add_argument("--candidatos", nargs="+", default=list(CANDIDATOS), choices=list(CANDIDATOS),
+                        help="Modelos a treinar")
+    parser.add_argument("--processos", type=int, default=None,
+                        help="Processos em paralelo (padrão: um por candidato; 1 mede cada modelo isolado)")
+    parser.add_argument("--semente", type=int, default=SEMENTE, help="Semente de split, modelos e amostras")
+    parser.add_argument("--diretorio", default=DIRETORIO_CANDIDATOS, help="Diretório dos pickles dos candidatos")
+    parser.add_argument("--metricas", default=CAMINHO_METRICAS, help="JSON de métricas")
+    parser.add_argument("--sem-publicar", action="store_true",
+                        help="Não substituir o modelo servido pela aplicação")
+    args = parser.parse_args(argv)
+
+    treinar_modelos(args.csv, args.candidatos, args.processos, args.semente,
+                    args.diretorio, args.metricas, publicar=not args.sem_publicar)
+
+
+if __name__ == "__main__":
+    main()
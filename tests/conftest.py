@@ -0,0 +1,61 @@
+"""
+Configuração dos testes (pytest a partir da raiz do projeto).
+
+Os módulos da aplicação são importados a partir de scr/, como na execução com
+PYTHONPATH=scr. As fixtures geram uma base pequena e sintética de clientes no
+formato de clientes_historico.csv e ajustam sobre ela o codificador e o Weibull
+AFT do treino (ver services/treinar_churn_model.py).
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scr'))
+
+from services.codificador_churn import VOCABULARIO, CodificadorChurn  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def clientes_sinteticos() -> pd.DataFrame:
+    """Clientes brutos com duração (dias) e churned, com sobrevivência Weibull dependente das features."""
+    rng = np.random.default_rng(42)
+    n = 600
+    clientes = pd.DataFrame({
+        'perfil': rng.choice(VOCABULARIO['perfil'], n),
+        'canal_aquisicao': rng.choice(VOCABULARIO['canal_aquisicao'], n),
+        'regiao': rng.choice(VOCABULARIO['regiao'], n),
+        'idade': rng.integers(18, 70, n).astype(float),
+        'tempo_casa': rng.integers(0, 120, n).astype(float),
+        'score_engajamento': rng.uniform(0, 100, n),
+    })
+    escala = np.exp(5.5 + 0.01 * (clientes['score_engajamento'] - 50) + 0.2 * (clientes['canal_aquisicao'] == 'Indicação'))
+    duracao = escala * rng.weibull(1.3, n)
+    censura = rng.uniform(0, 900, n)
+    clientes['duracao'] = np.maximum(np.minimum(duracao, censura), 1.0)
+    clientes['churned'] = (duracao <= censura).astype(int)
+    return clientes
+
+
+@pytest.fixture(scope='session')
+def codificador_ajustado(clientes_sinteticos) -> CodificadorChurn:
+    return CodificadorChurn().ajustar(clientes_sinteticos)
+
+
+@pytest.fixture(scope='session')
+def matriz_treino(clientes_sinteticos, codificador_ajustado) -> pd.DataFrame:
+    """Features codificadas, como o X_treino do treino."""
+    return codificador_ajustado.transformar_df(clientes_sinteticos)
+
+
+@pytest.fixture(scope='session', params=[False, True], ids=['rho_constante', 'rho_com_covariaveis'])
+def modelo_weibull(request, clientes_sinteticos, matriz_treino):
+    """WeibullAFTFitter ajustado como no treino (e também com ρ dependente das features)."""
+    lifelines = pytest.importorskip('lifelines')
+    tabela = matriz_treino.assign(duracao=clientes_sinteticos['duracao'], churned=clientes_sinteticos['churned'])
+    return lifelines.WeibullAFTFitter(penalizer=0.01 if request.param else 0.0).fit(
+        tabela, duration_col='duracao', event_col='churned', ancillary=request.param
+    )
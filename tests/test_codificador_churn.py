@@ -0,0 +1,55 @@
+"""Codificador de features do churn: treino e inferência devem ver a mesma matriz."""
+
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+from services.codificador_churn import CodificadorChurn
+from services.pontuacao_churn import MotorWeibull, verificar_preditores_lineares
+from services.treinar_churn_model import TOLERANCIA_PREDITORES
+
+
+def preditores_do_treino(modelo, X_treino: pd.DataFrame) -> np.ndarray:
+    # S(λ) = e^-1, então o percentil e^-1 do lifelines é o próprio λ
+    return np.log(np.asarray(modelo.predict_percentile(X_treino, p=math.exp(-1)), dtype=np.float64))
+
+
+def test_para_dict_de_dict_preserva_codificador(codificador_ajustado, clientes_sinteticos):
+    copia = CodificadorChurn.de_dict(json.loads(json.dumps(codificador_ajustado.para_dict())))
+    assert copia.features == codificador_ajustado.features
+    np.testing.assert_array_equal(copia.transformar(clientes_sinteticos),
+                                  codificador_ajustado.transformar(clientes_sinteticos))
+
+
+def test_artefato_reproduz_preditores_lineares_do_treino(modelo_weibull, codificador_ajustado,
+                                                         clientes_sinteticos, matriz_treino, tmp_path):
+    # Codificador como o treino grava no modelo (para_dict) e no artefato leve
+    codificador = CodificadorChurn.de_dict(codificador_ajustado.para_dict())
+    MotorWeibull.de_lifelines(modelo_weibull, codificador=codificador).salvar(str(tmp_path / 'modelo_churn'))
+    motor = MotorWeibull.carregar(str(tmp_path / 'modelo_churn'))
+
+    obtido = motor.preditores_lineares(clientes_sinteticos)  # Dados brutos, como na inferência
+    esperado = preditores_do_treino(modelo_weibull, matriz_treino)
+    assert np.max(np.abs(obtido - esperado)) <= TOLERANCIA_PREDITORES
+    assert verificar_preditores_lineares(modelo_weibull, codificador, clientes_sinteticos,
+                                         matriz_treino) <= TOLERANCIA_PREDITORES
+
+
+def test_numero_ausente_recebe_media_do_treino(modelo_weibull, codificador_ajustado, clientes_sinteticos, tmp_path):
+    MotorWeibull.de_lifelines(modelo_weibull, codificador=codificador_ajustado).salvar(str(tmp_path / 'modelo_churn'))
+    motor = MotorWeibull.carregar(str(tmp_path / 'modelo_churn'))
+    j = codificador_ajustado.numericas.index('idade')
+    media_idade = codificador_ajustado.medias[j]
+    assert abs(media_idade - clientes_sinteticos['idade'].mean()) < 1e-9
+
+    linhas = clientes_sinteticos.head(3).drop(columns=['duracao', 'churned'])
+    ausentes = linhas.assign(idade=[np.nan, 'inválido', None])
+    na_media = linhas.assign(idade=media_idade)
+    sem_coluna = linhas.drop(columns=['idade'])
+
+    X = codificador_ajustado.transformar(ausentes)
+    np.testing.assert_array_equal(X[:, len(X[0]) - len(codificador_ajustado.numericas) + j], 0.0)
+    np.testing.assert_allclose(motor.preditores_lineares(ausentes), motor.preditores_lineares(na_media), atol=1e-6)
+    np.testing.assert_allclose(motor.preditores_lineares(sem_coluna), motor.preditores_lineares(na_media), atol=1e-6)
@@ -0,0 +1,53 @@
+"""Paridade do motor NumPy (MotorWeibull) com o lifelines."""
+
+import numpy as np
+import pytest
+
+from services.pontuacao_churn import MotorWeibull, verificar_paridade
+from services.treinar_churn_model import TOLERANCIA_PARIDADE
+
+TEMPOS = (30, 90, 180, 365)
+
+
+def erro_relativo(esperado, obtido) -> float:
+    esperado, obtido = np.asarray(esperado, dtype=np.float64), np.asarray(obtido, dtype=np.float64)
+    assert esperado.shape == obtido.shape
+    assert np.all(np.isfinite(obtido))
+    return float(np.max(np.abs(esperado - obtido) / np.abs(esperado)))
+
+
+# None = lote padrão (tudo de uma vez); 7 não divide as 600 linhas, então o último lote é parcial
+@pytest.mark.parametrize('tamanho_lote', [None, 7], ids=['sem_lotes', 'em_lotes'])
+def test_motor_reproduz_lifelines(modelo_weibull, matriz_treino, tamanho_lote):
+    motor = MotorWeibull.de_lifelines(modelo_weibull, list(matriz_treino.columns))
+    lotes = {} if tamanho_lote is None else {'tamanho_lote': tamanho_lote}
+
+    mediana = motor.mediana(matriz_treino, **lotes)
+    esperanca = motor.esperanca(matriz_treino, **lotes)
+    sobrevivencia = motor.sobrevivencia(matriz_treino, TEMPOS, **lotes)
+
+    assert erro_relativo(modelo_weibull.predict_median(matriz_treino), mediana) <= TOLERANCIA_PARIDADE
+    assert erro_relativo(modelo_weibull.predict_expectation(matriz_treino), esperanca) <= TOLERANCIA_PARIDADE
+    esperado = modelo_weibull.predict_survival_function(matriz_treino, times=list(TEMPOS)).T.to_numpy()
+    assert erro_relativo(esperado, sobrevivencia) <= TOLERANCIA_PARIDADE
+
+
+def test_lotes_nao_alteram_resultado(modelo_weibull, matriz_treino):
+    motor = MotorWeibull.de_lifelines(modelo_weibull, list(matriz_treino.columns))
+    # Só o arredondamento do produto matricial (BLAS) pode mudar com o tamanho do lote
+    np.testing.assert_allclose(motor.mediana(matriz_treino, tamanho_lote=7), motor.mediana(matriz_treino),
+                               rtol=1e-12)
+    np.testing.assert_allclose(motor.sobrevivencia(matriz_treino, TEMPOS, tamanho_lote=7),
+                               motor.sobrevivencia(matriz_treino, TEMPOS), rtol=1e-12)
+
+
+def test_verificar_paridade_dentro_da_tolerancia(modelo_weibull, matriz_treino):
+    erros = verificar_paridade(modelo_weibull, matriz_treino, TEMPOS)
+    assert set(erros) == {'mediana', 'esperanca', 'sobrevivencia'}
+    assert max(erros.values()) <= TOLERANCIA_PARIDADE
+
+
+def test_colunas_fora_de_ordem_sao_reordenadas(modelo_weibull, matriz_treino):
+    motor = MotorWeibull.de_lifelines(modelo_weibull, list(matriz_treino.columns))
+    invertida = matriz_treino[matriz_treino.columns[::-1]]
+    np.testing.assert_array_equal(motor.mediana(invertida), motor.mediana(matriz_treino))